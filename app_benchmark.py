@@ -0,0 +1,423 @@
+"""End-to-end load test of the Flask app plus micro-benchmarks of the pipeline stages.
+
+The app runs in its own process (werkzeug, threaded) inside a scratch copy of
+the working tree: a temporary compliance.db copied from the real one, fresh
+static/ and data/ folders, and ESP32_SNAPSHOT_URL/ESP32_STREAM_URL pointing at
+an Esp32StandinServer replaying static/uploads. Nothing in the repo is written.
+
+Each route is driven by --concurrency client threads for --requests requests:
+    check_product          POST an image from static/uploads
+    capture_and_check      GET, snapshot from the stand-in camera
+    get_compliance_checks  GET
+    search_products        POST a catalog search term
+    download_report        POST, PDF for the session's latest result
+
+Per route: requests/s, p50/p95/p99 latency, errors, the server's peak RSS
+(VmHWM, reset before each route) and mean ms per pipeline stage from /metrics.
+Micro-benchmarks time preprocess_for_ocr, extract_product_fields,
+find_best_csv_match and generate_bw_report in this process.
+
+    python app_benchmark.py --json bench.json
+    python app_benchmark.py --routes check_product,search_products --concurrency 8 --requests 200
+    python app_benchmark.py --json new.json --compare bench.json --threshold 0.15   # exit 1 on regressions
+"""
+import argparse
+import csv
+import glob
+import itertools
+import json
+import math
+import os
+import platform
+import re
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from datetime import datetime
+from http.cookiejar import CookieJar
+from typing import Callable, Dict, List, Optional, Tuple
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+ROUTES = ("check_product", "capture_and_check", "get_compliance_checks", "search_products", "download_report")
+SEARCH_TERMS = ("samsung", "apple", "laptop", "whey", "redmi", "hp", "protein", "vivo")
+
+# (metric, "lower" or "higher" is better) compared by --compare
+ROUTE_KEYS = (("p95_ms", "lower"), ("p50_ms", "lower"), ("rps", "higher"), ("peak_rss_mb", "lower"))
+MICRO_KEYS = (("p50_ms", "lower"),)
+
+_SERVER = '''
+import sys
+sys.path.insert(0, {repo!r})
+import app
+from werkzeug.serving import make_server
+server = make_server("127.0.0.1", {port}, app.app, threaded=True)
+print("READY", flush=True)
+server.serve_forever()
+'''
+
+Request = Tuple[str, str, Optional[bytes], Optional[str]]
+
+
+# -----------------------------
+# Scratch working tree
+# -----------------------------
+def make_workdir() -> str:
+    """Temp cwd for the app: templates/rules linked, static/data/compliance.db copied."""
+    workdir = tempfile.mkdtemp(prefix="app_benchmark_")
+    os.symlink(os.path.join(REPO, "templates"), os.path.join(workdir, "templates"))
+    os.symlink(os.path.join(REPO, "rules.json"), os.path.join(workdir, "rules.json"))
+    shutil.copytree(os.path.join(REPO, "static"), os.path.join(workdir, "static"),
+                    ignore=shutil.ignore_patterns("artifacts", "thumbnails", "*.pdf"))
+    shutil.copytree(os.path.join(REPO, "data"), os.path.join(workdir, "data"),
+                    ignore=shutil.ignore_patterns("http_cache", "*.db*"))
+    if os.path.exists(os.path.join(REPO, "compliance.db")):
+        shutil.copy(os.path.join(REPO, "compliance.db"), os.path.join(workdir, "compliance.db"))
+    return workdir
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workdir: str, camera_url: str) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ, ESP32_SNAPSHOT_URL=f"{camera_url}/capture", ESP32_STREAM_URL=f"{camera_url}/stream",
+               TIMING_LOG="0", ESP32_INGEST="0")
+    env.pop("CAMERAS", None)
+    proc = subprocess.Popen([sys.executable, "-c", _SERVER.format(repo=REPO, port=port)], cwd=workdir, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    line = proc.stdout.readline()
+    if "READY" not in line:
+        proc.kill()
+        raise RuntimeError("app server failed to start")
+    return proc, f"http://127.0.0.1:{port}"
+
+
+# -----------------------------
+# Server memory (Linux /proc; None elsewhere)
+# -----------------------------
+def reset_peak_rss(pid: int) -> None:
+    try:
+        with open(f"/proc/{pid}/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+# -----------------------------
+# HTTP client
+# -----------------------------
+def _multipart(fields: Dict[str, str], files: Dict[str, str]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts: List[bytes] = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, path in files.items():
+        with open(path, "rb") as f:
+            content = f.read()
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; '
+                     f'filename="{os.path.basename(path)}"\r\nContent-Type: application/octet-stream\r\n\r\n'.encode()
+                     + content + b"\r\n")
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def login(base_url: str) -> urllib.request.OpenerDirector:
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+    opener.open(f"{base_url}/", urllib.parse.urlencode({"username": "1234", "password": "1234"}).encode(),
+                timeout=30).read()
+    return opener
+
+
+def send(opener: urllib.request.OpenerDirector, base_url: str, req: Request, timeout: float = 120) -> int:
+    method, path, body, content_type = req
+    r = urllib.request.Request(base_url + path, data=body, method=method)
+    if content_type:
+        r.add_header("Content-Type", content_type)
+    try:
+        with opener.open(r, timeout=timeout) as resp:
+            resp.read()
+            return resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def scenarios(images: List[str]) -> Dict[str, Callable[[int], Request]]:
+    # Upload bodies are built once; workers only pick one
+    uploads = [_multipart({"category": "mobile"}, {"image": path}) for path in images]
+
+    def check_product(i):
+        body, content_type = uploads[i % len(uploads)]
+        return "POST", "/check_product", body, content_type
+
+    def search_products(i):
+        body = urllib.parse.urlencode({"search_term": SEARCH_TERMS[i % len(SEARCH_TERMS)], "category": "all"})
+        return "POST", "/search_products", body.encode(), "application/x-www-form-urlencoded"
+
+    return {
+        "check_product": check_product,
+        "capture_and_check": lambda i: ("GET", "/capture_and_check", None, None),
+        "get_compliance_checks": lambda i: ("GET", "/get_compliance_checks", None, None),
+        "search_products": search_products,
+        "download_report": lambda i: ("POST", "/download_report", b"", "application/x-www-form-urlencoded"),
+    }
+
+
+# -----------------------------
+# Load generation
+# -----------------------------
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _stage_sums(metrics_text: str, route: str) -> Dict[str, float]:
+    """compliance_stage_duration_seconds_sum per stage for one route, from /metrics."""
+    sums: Dict[str, float] = {}
+    pattern = re.compile(r'^compliance_stage_duration_seconds_sum\{stage="([^"]+)",route="([^"]*)",camera="[^"]*"\} (\S+)$')
+    for line in metrics_text.splitlines():
+        m = pattern.match(line)
+        if m and m.group(2) == route:
+            sums[m.group(1)] = sums.get(m.group(1), 0.0) + float(m.group(3))
+    return sums
+
+
+def run_route(base_url: str, opener, make_request: Callable[[int], Request], concurrency: int,
+              total: int, pid: int) -> Dict:
+    path = make_request(0)[1]
+    before = _stage_sums(opener.open(f"{base_url}/metrics", timeout=30).read().decode(), path)
+    reset_peak_rss(pid)
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            i = next(counter)
+            if i >= total:
+                return
+            req = make_request(i)
+            started = time.perf_counter()
+            try:
+                status = str(send(opener, base_url, req))
+            except Exception as e:
+                status = e.__class__.__name__
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    after = _stage_sums(opener.open(f"{base_url}/metrics", timeout=30).read().decode(), path)
+    latencies.sort()
+    ok = sum(n for s, n in statuses.items() if s.isdigit() and int(s) < 400)
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "errors": len(latencies) - ok,
+        "statuses": statuses,
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "mean_ms": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        "p50_ms": _round(percentile(latencies, 50)),
+        "p95_ms": _round(percentile(latencies, 95)),
+        "p99_ms": _round(percentile(latencies, 99)),
+        "max_ms": _round(latencies[-1] if latencies else None),
+        "peak_rss_mb": peak_rss_mb(pid),
+        "stage_mean_ms": {stage: round((total_s - before.get(stage, 0.0)) * 1000 / max(1, len(latencies)), 2)
+                          for stage, total_s in sorted(after.items()) if total_s > before.get(stage, 0.0)},
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+
+# -----------------------------
+# Micro-benchmarks (run inside the scratch tree)
+# -----------------------------
+def _time_calls(fn: Callable[[int], object], iterations: int) -> Dict:
+    fn(0)  # warm caches and lazy imports
+    times = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        times.append((time.perf_counter() - started) * 1000)
+    times.sort()
+    return {"calls": iterations, "mean_ms": round(sum(times) / len(times), 3),
+            "p50_ms": _round(percentile(times, 50)), "p95_ms": _round(percentile(times, 95))}
+
+
+def _sample_texts(limit: int = 50) -> List[str]:
+    texts = []
+    path = os.path.join("data", "extracted_texts.csv")
+    if os.path.exists(path):
+        with open(path, newline="", encoding="utf-8", errors="replace") as f:
+            texts = [row["full_text"] for row in csv.DictReader(f) if (row.get("full_text") or "").strip()][:limit]
+    return texts or ["Samsung Galaxy M14 5G\nMRP Rs. 13,490.00 (Incl. of all taxes)\nNet Quantity: 1 N\n"
+                     "Manufactured by Samsung India Electronics Pvt Ltd, Noida\nCountry of Origin: India\n"
+                     "Consumer care: 1800 40 7267864, support@samsung.com"]
+
+
+def run_micro(images: List[str], iterations: int) -> Dict[str, Dict]:
+    from io import BytesIO
+
+    from PIL import Image
+
+    from app_common import get_catalog
+    from bp_check import find_best_csv_match
+    from bw_report_generator import generate_bw_report
+    from field_extraction import extract_product_fields
+    from ocr_processing import preprocess_for_ocr
+
+    pil_images = []
+    for path in images:
+        with Image.open(path) as img:
+            img.load()
+            pil_images.append(img.copy())
+    texts = _sample_texts()
+    products = get_catalog()["all"]
+    product_results = {"data": {"product": "Samsung Galaxy M14", "mrp": "13490", "manufacturer": "Samsung India",
+                                "origin": "India", "raw_text": texts[0]}, "compliance_score": 55}
+    table = [["Field", "Status", "Info"]] + [[f, "✔ Present", v] for f, v in product_results["data"].items()
+                                             if f != "raw_text"]
+    return {
+        "preprocess_for_ocr": _time_calls(lambda i: preprocess_for_ocr(pil_images[i % len(pil_images)]), iterations),
+        "extract_product_fields": _time_calls(lambda i: extract_product_fields(texts[i % len(texts)]), iterations),
+        "find_best_csv_match": _time_calls(lambda i: find_best_csv_match(texts[i % len(texts)], products), iterations),
+        "generate_bw_report": _time_calls(lambda i: generate_bw_report(product_results, table, 55, images[0],
+                                                                       images[-1], output=BytesIO()), iterations),
+    }
+
+
+# -----------------------------
+# Comparison
+# -----------------------------
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Human-readable regressions: metrics worse than baseline by more than threshold (fractional)."""
+    regressions = []
+    for section, keys in (("routes", ROUTE_KEYS), ("micro", MICRO_KEYS)):
+        for name, result in current.get(section, {}).items():
+            base = baseline.get(section, {}).get(name)
+            if not base:
+                continue
+            for key, better in keys:
+                new, old = result.get(key), base.get(key)
+                if not new or not old:
+                    continue
+                change = (new - old) / old
+                if (better == "lower" and change > threshold) or (better == "higher" and -change > threshold):
+                    regressions.append(f"{section}.{name}.{key}: {old} -> {new} ({change:+.0%})")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the app against local stand-ins and time pipeline stages.")
+    parser.add_argument("--routes", default=",".join(ROUTES), help="comma-separated subset of " + ",".join(ROUTES))
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=40, help="requests per route")
+    parser.add_argument("--micro-iterations", type=int, default=20)
+    parser.add_argument("--no-load", action="store_true", help="micro-benchmarks only")
+    parser.add_argument("--no-micro", action="store_true", help="load test only")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed fractional regression (0.2 = 20%%)")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    images = sorted(p for ext in ("*.jpg", "*.jpeg", "*.png") for p in glob.glob(os.path.join(REPO, "static", "uploads", ext)))
+    if not images:
+        print("No images in static/uploads to benchmark with", file=sys.stderr)
+        return 2
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, capture_output=True,
+                             text=True).stdout.strip() or None
+    except OSError:
+        rev = None
+    results: Dict = {"meta": {"timestamp": datetime.now().isoformat(timespec="seconds"), "git_rev": rev,
+                              "python": platform.python_version(), "cpus": os.cpu_count(),
+                              "concurrency": args.concurrency, "requests_per_route": args.requests},
+                     "routes": {}, "micro": {}}
+
+    workdir = make_workdir()
+    repo_cwd = os.getcwd()
+    try:
+        if not args.no_load:
+            from esp32_standin_server import Esp32StandinServer
+            with Esp32StandinServer(images_dir=os.path.join(REPO, "static", "uploads"), hold=1.0) as camera:
+                proc, base_url = start_server(workdir, camera.base_url)
+                try:
+                    opener = login(base_url)
+                    make = scenarios(images)
+                    # One check first so the session has a result for /download_report
+                    send(opener, base_url, make["check_product"](0))
+                    for route in args.routes.split(","):
+                        r = results["routes"][route] = run_route(base_url, opener, make[route], args.concurrency,
+                                                                 args.requests, proc.pid)
+                        print(f"{route:22s} {r['rps']:8.2f} req/s  p50 {r['p50_ms']:8.1f}  p95 {r['p95_ms']:8.1f}  "
+                              f"p99 {r['p99_ms']:8.1f} ms  errors {r['errors']:3d}  peak RSS {r['peak_rss_mb']} MB")
+                finally:
+                    proc.terminate()
+                    proc.wait(10)
+        if not args.no_micro:
+            os.chdir(workdir)
+            sys.path.insert(0, REPO)
+            results["micro"] = run_micro(images, args.micro_iterations)
+            for name, r in results["micro"].items():
+                print(f"{name:22s} p50 {r['p50_ms']:8.2f}  p95 {r['p95_ms']:8.2f}  mean {r['mean_ms']:8.2f} ms")
+    finally:
+        os.chdir(repo_cwd)
+        if args.keep_workdir:
+            print(f"Scratch tree kept at {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""Configuration and helpers shared by the blueprints.
+
+Only light modules are imported here, so any blueprint can depend on this
+without pulling in OpenCV, Tesseract or ReportLab.
+"""
+import os
+import sqlite3
+import threading
+from functools import wraps
+
+from flask import redirect, session, url_for
+
+from metrics import timed
+
+
+UPLOAD_FOLDER = "static/uploads"
+PROCESSED_FOLDER = "static/processed"
+CAPTURE_FOLDER = "static/captures"
+DB_PATH = "compliance.db"
+
+# -----------------------------
+# ESP32-CAM Configuration (defaults)
+# -----------------------------
+ESP32_STREAM_URL = os.environ.get("ESP32_STREAM_URL", "http://192.168.0.123:81/stream")
+ESP32_SNAPSHOT_URL = os.environ.get("ESP32_SNAPSHOT_URL", "http://10.219.158.90/capture")
+CAPTURE_BURST = int(os.environ.get("CAPTURE_BURST", "3"))
+
+# -----------------------------
+# DB Helper
+# -----------------------------
+def run_query(q, params=(), fetch=False):
+    with timed("sqlite_read" if fetch else "sqlite_write"):
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        c = conn.cursor()
+        c.execute(q, params)
+        res = None
+        if fetch:
+            res = c.fetchall()
+        else:
+            conn.commit()
+        conn.close()
+    return res
+
+def run_insert(q, params=()):
+    """Execute an INSERT and return its rowid (last_insert_rowid() is per-connection)."""
+    with timed("sqlite_write"):
+        return _run_insert(q, params)
+
+def _run_insert(q, params):
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        cur = conn.execute(q, params)
+        conn.commit()
+        return cur.lastrowid
+    finally:
+        conn.close()
+
+# -----------------------------
+# Protected Routes Decorator
+# -----------------------------
+def login_required(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        if "user" not in session:
+            return redirect(url_for("pages.login"))
+        return func(*args, **kwargs)
+    return wrapper
+
+# -----------------------------
+# Product catalog (CSV data)
+# -----------------------------
+_catalog = None
+_catalog_lock = threading.Lock()
+
+def get_catalog():
+    """{'laptop', 'mobile', 'protein', 'all'} product tables, loaded on first use.
+
+    Served from the memory-mapped snapshot (python catalog_snapshot.py build) when it
+    matches the CSVs, otherwise parsed from the CSVs.
+    """
+    global _catalog
+    with _catalog_lock:
+        if _catalog is None:
+            from catalog_snapshot import load_catalog
+            _catalog = load_catalog()
+        return _catalog
+
+def get_products_by_category(category):
+    catalog = get_catalog()
+    return catalog.get(category) if category in ("mobile", "laptop", "protein") else catalog["all"]
+
+# -----------------------------
+# Path normalization for URLs
+# -----------------------------
+def to_url_path(p):
+    if not p:
+        return p
+    return p.replace('\\', '/')
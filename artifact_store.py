@@ -0,0 +1,334 @@
+"""Content-addressed store for uploaded, captured and processed images.
+
+Files live under static/artifacts/<aa>/<bb>/<sha256>.<ext>, so re-uploads of
+the same bytes are stored once and no directory grows beyond a few hundred
+entries however many captures accumulate. Paths stay under static/, so
+url_for('static', ...) keeps working for templates and reports.
+
+Binarized OCR images (the 3x-upscaled adaptive-threshold output) are written
+as 1-bit PNGs, which is lossless for them and several times smaller than the
+8-bit PNG/JPEG they used to be saved as.
+
+Each artifact is indexed in the artifacts table of compliance.db. Rows that
+use an artifact hold a reference in artifact_refs; referenced artifacts are
+never evicted. A products row pins only its source capture (the processed
+image is derived from it and can be re-created), while a stored ocr_results
+entry pins both until the result is pruned. Unreferenced artifacts are removed
+once older than ARTIFACT_MAX_AGE_DAYS, or least recently used first while the
+store is above ARTIFACT_QUOTA_MB; evictions are counted in
+compliance_artifacts_evicted_total / compliance_artifact_bytes_evicted_total.
+
+    python artifact_store.py stats
+    python artifact_store.py evict [--quota-mb N] [--max-age-days N]
+    python artifact_store.py import static/uploads static/processed [--remove]
+"""
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+from metrics import registry, timed
+
+log = logging.getLogger(__name__)
+registry.describe("compliance_artifacts_evicted_total", "Artifacts removed by age or quota eviction.")
+registry.describe("compliance_artifact_bytes_evicted_total", "Bytes freed by artifact eviction.")
+
+ARTIFACT_ROOT = os.environ.get("ARTIFACT_ROOT", "static/artifacts")
+ARTIFACT_QUOTA_MB = float(os.environ.get("ARTIFACT_QUOTA_MB", "2048"))
+ARTIFACT_MAX_AGE_DAYS = float(os.environ.get("ARTIFACT_MAX_AGE_DAYS", "30"))
+# last_access is only rewritten when older than this, so hot artifacts do not cost a write per hit
+TOUCH_INTERVAL_S = 3600
+
+# Tables that may own references, with their key column; refs to deleted rows are swept by gc()
+OWNER_KEYS = {"products": "id", "ocr_results": "id"}
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tif", ".tiff", ".webp")
+
+
+def _is_bilevel(img) -> bool:
+    if img.mode == "1":
+        return True
+    if img.mode not in ("L", "LA", "P"):
+        return False
+    histogram = img.convert("L").histogram()
+    return sum(1 for count in histogram if count) <= 2
+
+
+class ArtifactStore:
+    def __init__(self, db_path: str, root: str = ARTIFACT_ROOT, quota_mb: float = ARTIFACT_QUOTA_MB,
+                 max_age_days: float = ARTIFACT_MAX_AGE_DAYS):
+        self.db_path = db_path
+        self.root = root
+        self.quota_bytes = int(quota_mb * 1024 * 1024)
+        self.max_age_days = max_age_days
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(root, "tmp"), exist_ok=True)
+        self._init_db()
+        with self._connect() as conn:
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artifacts (
+                    digest TEXT PRIMARY KEY,
+                    path TEXT NOT NULL,
+                    kind TEXT,
+                    size INTEGER NOT NULL,
+                    refcount INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    last_access TEXT NOT NULL
+                )''')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS artifact_refs (
+                    digest TEXT NOT NULL,
+                    owner_table TEXT NOT NULL,
+                    owner_id TEXT NOT NULL,
+                    PRIMARY KEY (digest, owner_table, owner_id)
+                )''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifacts_evict ON artifacts(refcount, last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_artifact_refs_owner ON artifact_refs(owner_table, owner_id)")
+
+    def path_for(self, digest: str, ext: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], digest + ext)
+
+    # -- writing -------------------------------------------------------------
+    @timed("artifact_store")
+    def _commit(self, tmp_path: str, digest: str, ext: str, size: int, kind: Optional[str]) -> Dict[str, Any]:
+        """Move a fully written temp file into place, or drop it if the content is already stored."""
+        ext = ext.lower()
+        now = datetime.now().isoformat()
+        with self._connect() as conn:
+            row = conn.execute("SELECT path, size, created_at FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+            if row is not None and os.path.exists(row["path"]):
+                os.remove(tmp_path)
+                conn.execute("UPDATE artifacts SET last_access = ? WHERE digest = ?", (now, digest))
+                return {"digest": digest, "path": row["path"], "size": row["size"], "deduplicated": True}
+            path = self.path_for(digest, ext)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+            conn.execute('''INSERT INTO artifacts (digest, path, kind, size, created_at, last_access)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                            ON CONFLICT(digest) DO UPDATE SET path = excluded.path, size = excluded.size,
+                                                              last_access = excluded.last_access''',
+                         (digest, path, kind, size, now, now))
+        with self._lock:
+            self._total_bytes += size - (row["size"] if row is not None else 0)
+            over_quota = self._total_bytes > self.quota_bytes
+        if over_quota:
+            self.evict()
+        return {"digest": digest, "path": path, "size": size, "deduplicated": False}
+
+    def put_stream(self, stream: BinaryIO, ext: str, kind: Optional[str] = None) -> Dict[str, Any]:
+        """Store a file-like object, hashing while it is copied. Returns {digest, path, size, deduplicated}."""
+        sha = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.join(self.root, "tmp"), suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in iter(lambda: stream.read(64 * 1024), b""):
+                    sha.update(chunk)
+                    f.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+        return self._commit(tmp_path, sha.hexdigest(), ext, size, kind)
+
+    def put_bytes(self, data: bytes, ext: str, kind: Optional[str] = None) -> Dict[str, Any]:
+        return self.put_stream(io.BytesIO(data), ext, kind)
+
+    def put_file(self, path: str, kind: Optional[str] = None, move: bool = True) -> Dict[str, Any]:
+        """Store an existing file; with move=True the original is removed (a rename when nothing is deduplicated)."""
+        ext = os.path.splitext(path)[1] or ".bin"
+        with open(path, "rb") as f:
+            if not move:
+                return self.put_stream(f, ext, kind)
+            sha = hashlib.sha256()
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha.update(chunk)
+        return self._commit(path, sha.hexdigest(), ext, os.path.getsize(path), kind)
+
+    @timed("encode")
+    def put_image(self, img, kind: Optional[str] = "processed") -> Dict[str, Any]:
+        """Encode a PIL image compactly: bilevel images as 1-bit PNG, grayscale as PNG, colour as JPEG."""
+        buf = io.BytesIO()
+        # Default zlib level: optimize=True is ~6x slower on the request path for ~5% smaller files
+        if _is_bilevel(img):
+            img.convert("L").point(lambda v: 255 if v >= 128 else 0).convert("1").save(buf, "PNG")
+            ext = ".png"
+        elif img.mode == "L":
+            img.save(buf, "PNG")
+            ext = ".png"
+        else:
+            img.convert("RGB").save(buf, "JPEG", quality=90, optimize=True)
+            ext = ".jpg"
+        return self.put_bytes(buf.getvalue(), ext, kind)
+
+    # -- lookup --------------------------------------------------------------
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """Artifact row (path, size, refcount, ...) or None; refreshes its LRU position."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM artifacts WHERE digest = ?", (digest,)).fetchone()
+            if row is None:
+                return None
+            now = datetime.now()
+            if datetime.fromisoformat(row["last_access"]) < now - timedelta(seconds=TOUCH_INTERVAL_S):
+                conn.execute("UPDATE artifacts SET last_access = ? WHERE digest = ?", (now.isoformat(), digest))
+            return dict(row)
+
+    def digest_of(self, path: str) -> Optional[str]:
+        """Digest for a path inside the store (as returned by put_*), else None."""
+        name = os.path.splitext(os.path.basename(path or ""))[0]
+        return name if len(name) == 64 and os.path.normpath(path).startswith(os.path.normpath(self.root)) else None
+
+    # -- references ----------------------------------------------------------
+    def add_ref(self, digests: Iterable[Optional[str]], owner_table: str, owner_id: Any) -> None:
+        """Pin artifacts to a DB row (products, ocr_results, ...). Adding the same ref twice is a no-op."""
+        with self._connect() as conn:
+            for digest in set(d for d in digests if d):
+                added = conn.execute("INSERT OR IGNORE INTO artifact_refs (digest, owner_table, owner_id) VALUES (?, ?, ?)",
+                                     (digest, owner_table, str(owner_id))).rowcount
+                if added:
+                    conn.execute("UPDATE artifacts SET refcount = refcount + 1 WHERE digest = ?", (digest,))
+
+    def release(self, owner_table: str, owner_id: Any) -> None:
+        """Drop every reference held by one DB row."""
+        with self._connect() as conn:
+            for row in conn.execute("SELECT digest FROM artifact_refs WHERE owner_table = ? AND owner_id = ?",
+                                    (owner_table, str(owner_id))).fetchall():
+                conn.execute("UPDATE artifacts SET refcount = MAX(refcount - 1, 0) WHERE digest = ?", (row["digest"],))
+            conn.execute("DELETE FROM artifact_refs WHERE owner_table = ? AND owner_id = ?", (owner_table, str(owner_id)))
+
+    def gc(self) -> int:
+        """Sweep references whose owning row was deleted (or that pin derived images), then recompute refcounts.
+
+        Returns refs removed.
+        """
+        removed = 0
+        with self._connect() as conn:
+            existing = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            for table, key in OWNER_KEYS.items():
+                if table in existing:
+                    removed += conn.execute(f'''DELETE FROM artifact_refs WHERE owner_table = ?
+                                                AND owner_id NOT IN (SELECT CAST({key} AS TEXT) FROM {table})''',
+                                            (table,)).rowcount
+            # products rows pin only their capture; drop pins on processed images left by older versions
+            removed += conn.execute('''DELETE FROM artifact_refs WHERE owner_table = 'products'
+                                       AND digest IN (SELECT digest FROM artifacts WHERE kind = 'processed')''').rowcount
+            conn.execute('''UPDATE artifacts SET refcount =
+                            (SELECT COUNT(*) FROM artifact_refs r WHERE r.digest = artifacts.digest)''')
+        return removed
+
+    # -- eviction ------------------------------------------------------------
+    def evict(self, quota_bytes: Optional[int] = None, max_age_days: Optional[float] = None) -> Dict[str, int]:
+        """Delete unreferenced artifacts past max age, then LRU-first until under quota."""
+        quota_bytes = self.quota_bytes if quota_bytes is None else quota_bytes
+        max_age_days = self.max_age_days if max_age_days is None else max_age_days
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        removed = freed = 0
+        with self._connect() as conn:
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM artifacts").fetchone()[0]
+            for row in conn.execute('''SELECT digest, path, size, last_access FROM artifacts
+                                       WHERE refcount = 0 ORDER BY last_access''').fetchall():
+                if row["last_access"] >= cutoff and total - freed <= quota_bytes:
+                    break
+                try:
+                    os.remove(row["path"])
+                except FileNotFoundError:
+                    pass
+                conn.execute("DELETE FROM artifacts WHERE digest = ?", (row["digest"],))
+                removed += 1
+                freed += row["size"]
+        with self._lock:
+            self._total_bytes = total - freed
+        if removed:
+            registry.inc("compliance_artifacts_evicted_total", (), removed)
+            registry.inc("compliance_artifact_bytes_evicted_total", (), freed)
+            log.info("Artifact store evicted %d files (%.1f MB)", removed, freed / 1e6)
+        return {"removed": removed, "freed_bytes": freed, "total_bytes": total - freed}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as conn:
+            row = conn.execute('''SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS bytes,
+                                         COALESCE(SUM(refcount > 0), 0) AS referenced,
+                                         COALESCE(SUM(CASE WHEN refcount > 0 THEN size END), 0) AS referenced_bytes
+                                  FROM artifacts''').fetchone()
+            by_kind = {r["kind"] or "": {"files": r["n"], "bytes": r["b"]}
+                       for r in conn.execute("SELECT kind, COUNT(*) AS n, SUM(size) AS b FROM artifacts GROUP BY kind")}
+        return dict(row, quota_bytes=self.quota_bytes, max_age_days=self.max_age_days, by_kind=by_kind)
+
+    def import_dirs(self, dirs: List[str], kind: Optional[str] = None, remove: bool = False) -> Dict[str, int]:
+        """Pull existing images (e.g. static/uploads) into the store, deduplicating as it goes."""
+        counts = {"files": 0, "deduplicated": 0, "bytes": 0}
+        for directory in dirs:
+            for name in sorted(os.listdir(directory)):
+                path = os.path.join(directory, name)
+                if not os.path.isfile(path) or not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                art = self.put_file(path, kind or os.path.basename(os.path.normpath(directory)), move=remove)
+                counts["files"] += 1
+                counts["deduplicated"] += art["deduplicated"]
+                counts["bytes"] += 0 if art["deduplicated"] else art["size"]
+        return counts
+
+
+_store: Optional[ArtifactStore] = None
+_store_lock = threading.Lock()
+
+
+def get_artifact_store(db_path: str = "compliance.db") -> ArtifactStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ArtifactStore(db_path)
+            _store.gc()
+        return _store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Inspect and maintain the content-addressed artifact store.")
+    parser.add_argument("--db", default="compliance.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats")
+    evict = sub.add_parser("evict")
+    evict.add_argument("--quota-mb", type=float, default=None)
+    evict.add_argument("--max-age-days", type=float, default=None)
+    imp = sub.add_parser("import")
+    imp.add_argument("dirs", nargs="+")
+    imp.add_argument("--kind", default=None)
+    imp.add_argument("--remove", action="store_true", help="delete the originals once stored")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.db)
+    if args.command == "stats":
+        result = store.stats()
+    elif args.command == "evict":
+        swept = store.gc()
+        result = store.evict(None if args.quota_mb is None else int(args.quota_mb * 1024 * 1024), args.max_age_days)
+        result["refs_swept"] = swept
+    else:
+        result = store.import_dirs(args.dirs, args.kind, args.remove)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Catalog API: product lists and details from the category CSVs for the dropdowns."""
+import os
+
+from flask import Blueprint, jsonify, request
+
+from app_common import get_catalog
+
+bp = Blueprint("catalog", __name__)
+
+# -----------------------------
+# API: Get products by category for dropdown
+@bp.route('/get_product_details', methods=['GET'])
+def get_product_details():
+    catalog = get_catalog()
+    category = request.args.get('category', '').lower()
+    idx = request.args.get('id', None)
+    try:
+        idx = int(idx)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid product id'}), 400
+    if category == 'mobile':
+        products = catalog["mobile"]
+    elif category == 'laptop':
+        products = catalog["laptop"] 
+    elif category == 'protein':
+        products = catalog["protein"]
+    else:
+        products = catalog["all"]
+    if idx < 0 or idx >= len(products):
+        return jsonify({'error': 'Product not found'}), 404
+    product = products[idx]
+    # Try to extract details and image
+    details = ''
+    img_src = ''
+    # Compose details from available fields
+    if category == 'mobile':
+        details = product.get('details') or product.get('name') or ''
+        img_src = product.get('image_url') or ''
+    elif category == 'laptop':
+        details = product.get('details') or product.get('name') or ''
+        img_src = product.get('image_url') or ''
+    elif category == 'protein':
+        details = product.get('Details') or product.get('Product Name') or ''
+        img_src = product.get('Image') or ''
+    else:
+        details = product.get('details') or product.get('name') or product.get('Product Name') or ''
+        img_src = product.get('image') or product.get('Image') or ''
+    # If image path is relative, prepend static folder
+    if img_src and not img_src.startswith('http'):
+        img_src = '/static/uploads/' + img_src if os.path.exists(os.path.join('static/uploads', img_src)) else '/static/logo.png'
+    return jsonify({'details': details, 'image': img_src})
+# -----------------------------
+@bp.route('/get_products', methods=['GET'])
+def get_products():
+    catalog = get_catalog()
+    category = request.args.get('category', '').lower()
+    if category == 'mobile':
+        products = catalog["mobile"]
+    elif category == 'laptop':
+        products = catalog["laptop"]
+    elif category == 'protein':
+        products = catalog["protein"]
+    else:
+        products = catalog["all"]
+    # Return only name and id (or index) for dropdown
+    result = []
+    for idx, p in enumerate(products):
+        name = p.get('name') or p.get('Product Name') or p.get('product') or f"Product {idx+1}"
+        result.append({'id': idx, 'name': name})
+    return jsonify(result)
@@ -0,0 +1,642 @@
+"""OCR / compliance check views, ESP32 capture, stream ingest and camera management.
+
+OpenCV, Tesseract, PIL and aiohttp are only imported once this blueprint
+serves its first request (or the ingest worker processes a frame), so pages
+and report workers start without them.
+"""
+import difflib
+import logging
+import math
+import os
+import re
+import threading
+import time
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, redirect, render_template, request, session, url_for
+from werkzeug.utils import secure_filename
+
+from app_common import (CAPTURE_BURST, CAPTURE_FOLDER, DB_PATH, ESP32_SNAPSHOT_URL, ESP32_STREAM_URL,
+                        get_catalog, get_products_by_category, login_required, run_insert, run_query,
+                        to_url_path)
+from artifact_store import get_artifact_store
+from capture_log import get_capture_log
+from catalog_snapshot import normalize_text as _normalize_text, search_keys
+from field_extraction import extract_product_fields
+from metrics import annotate, timed, trace
+from profiling import get_profiler
+from result_store import get_result_store
+
+bp = Blueprint("check", __name__)
+log = logging.getLogger(__name__)
+
+_ocr_stack_loaded = False
+
+@bp.before_request
+def load_ocr_stack():
+    """Import the image/OCR stack the first time it is needed."""
+    global _ocr_stack_loaded
+    if not _ocr_stack_loaded:
+        from PIL import ImageFile
+        import ocr_processing  # noqa: F401  (sets the Tesseract path)
+        # Allow loading of truncated images to avoid hard failures on partial uploads
+        ImageFile.LOAD_TRUNCATED_IMAGES = True
+        _ocr_stack_loaded = True
+
+def get_quality_gate():
+    from quality_gate import quality_gate
+    return quality_gate
+
+def get_cameras():
+    """The shared camera service; background poll captures are logged like /check_compliance."""
+    from camera_service import get_camera_service
+    service = get_camera_service(DB_PATH, CAPTURE_FOLDER)
+    service.on_capture = _on_camera_poll
+    return service
+
+def store_capture(capture, kind="capture"):
+    """Move a camera capture into the artifact store; its path/filename then point at the stored copy."""
+    art = get_artifact_store(DB_PATH).put_file(capture["path"], kind)
+    capture.update(path=art["path"], filename=os.path.basename(art["path"]), digest=art["digest"],
+                   static_rel=os.path.relpath(art["path"], "static").replace("\\", "/"))
+    return capture
+
+# -----------------------------
+# Fuzzy match OCR text to CSV products
+# -----------------------------
+def _search_keys(products):
+    """Normalized (name, name + details) per product; catalog tables carry them precomputed."""
+    keys = getattr(products, "search_keys", None)
+    return keys if keys is not None else [search_keys(p) for p in products]
+
+@timed("csv_match")
+def find_best_csv_match(ocr_text, products):
+    """Return (best_product, best_score_float_0_to_1). Compares OCR text to product name/details.
+    Uses difflib ratio; not heavy and no extra deps.
+    """
+    if not ocr_text or not products:
+        return None, 0.0
+    ocr_norm = _normalize_text(ocr_text)
+    if not ocr_norm:
+        return None, 0.0
+
+    best = None
+    best_score = 0.0
+    for product, (name, combo) in zip(products, _search_keys(products)):
+        if not combo:
+            continue
+        score = difflib.SequenceMatcher(None, ocr_norm, combo).ratio()
+        # Also try just name to avoid details noise
+        if name:
+            score = max(score, difflib.SequenceMatcher(None, ocr_norm, name).ratio())
+        if score > best_score:
+            best = product
+            best_score = score
+    return best, best_score
+
+# Return top matches at or above a minimum ratio
+def find_top_csv_matches(ocr_text, products, min_ratio=0.5, limit=5):
+    if not ocr_text or not products:
+        return []
+    ocr_norm = _normalize_text(ocr_text)
+    if not ocr_norm:
+        return []
+
+    scored = []
+    for product, (name, combo) in zip(products, _search_keys(products)):
+        if not combo:
+            continue
+        score = difflib.SequenceMatcher(None, ocr_norm, combo).ratio()
+        if name:
+            score = max(score, difflib.SequenceMatcher(None, ocr_norm, name).ratio())
+        if score >= min_ratio:
+            scored.append({
+                "product": product,
+                "score": round(score * 100, 2)
+            })
+    # sort by score desc and take top N
+    scored.sort(key=lambda x: x["score"], reverse=True)
+    return scored[:limit]
+
+# -----------------------------
+# Legal Metrology Rule Engine (simple, extensible)
+# -----------------------------
+def evaluate_legal_metrology_rules(extracted):
+    """Evaluate basic Legal Metrology-like rules on extracted data.
+    Returns (is_compliant: bool, issues: list[str])
+    """
+    issues = []
+    # Required fields
+    if not extracted.get("mrp") or extracted.get("mrp") == "Not Found":
+        issues.append("Missing MRP")
+    if not extracted.get("country") or extracted.get("country") == "Not Found":
+        issues.append("Missing country of origin")
+    if not extracted.get("net_quantity") or extracted.get("net_quantity") == "Not Found":
+        issues.append("Missing net quantity")
+    # Basic unit sanity for net quantity when present
+    nq = (extracted.get("net_quantity") or "").lower()
+    if nq and nq != "not found":
+        if not re.search(r"\b(ml|l|g|kg|pcs|piece|tablet|capsule|pack)\b", nq):
+            issues.append("Net quantity unit may be missing or invalid")
+    # Basic MRP format sanity
+    mrp = extracted.get("mrp") or ""
+    if mrp and mrp != "Not Found":
+        if not re.search(r"(₹|rs\.?\s?)\s?\d", mrp.lower()):
+            issues.append("MRP format invalid")
+    is_compliant = len(issues) == 0
+    return is_compliant, issues
+
+# -----------------------------
+# Category guessing from OCR text
+# -----------------------------
+def guess_category_from_text(text):
+    """Return one of 'mobile', 'laptop', 'protein', or None based on simple keyword heuristics."""
+    if not text:
+        return None
+    t = text.lower()
+    mobile_kw = ["iphone", "samsung", "galaxy", "pixel", "oneplus", "realme", "redmi", "mi", "oppo", "vivo", "motorola", "5g", "android"]
+    laptop_kw = ["laptop", "notebook", "macbook", "thinkpad", "ideapad", "pavilion", "inspiron", "ryzen", "intel", "i5", "i7", "ssd", "ram", "graphics"]
+    protein_kw = ["protein", "whey", "isolate", "casein", "supplement", "gainer", "scoop", "bcaa", "serving"]
+    if any(k in t for k in mobile_kw):
+        return "mobile"
+    if any(k in t for k in laptop_kw):
+        return "laptop"
+    if any(k in t for k in protein_kw):
+        return "protein"
+    return None
+
+def remember_results(results, source):
+    """Store results server-side and point the session at them (replacing the old cookie copy)."""
+    results["result_id"] = get_result_store(DB_PATH).save(results, user=session.get("user"), source=source)
+    get_artifact_store(DB_PATH).add_ref(results.get("artifacts", ()), "ocr_results", results["result_id"])
+    session["result_id"] = results["result_id"]
+    session.pop("latest_results", None)
+
+@bp.route("/check_product", methods=["POST"])
+@login_required
+def check_product():
+    import cv2
+    import pytesseract
+    from ocr_processing import open_image_or_error, preprocess_for_ocr
+    image = request.files.get("image")
+    snapshot_url = request.form.get("snapshot_url")
+    results = {"filename": None, "processed_file": None, "data": {}}
+
+    def preprocess_image(image_path):
+        try:
+            pil_img = open_image_or_error(image_path)
+            pil_img = preprocess_for_ocr(pil_img)
+            # Binarized output is stored as a 1-bit PNG in the artifact store
+            processed_path = get_artifact_store(DB_PATH).put_image(pil_img, "processed")["path"]
+            annotate(processed_file=processed_path)
+            return processed_path
+        except Exception as e:
+            log.error("Failed to preprocess image %s: %s", image_path, e)
+            return None
+
+    def extract_text_fields(image_path):
+        ocr_started = time.process_time()
+        processed_path = preprocess_image(image_path)
+        if not processed_path or not os.path.exists(processed_path):
+            log.error("Processed image not found: %s", processed_path)
+            return {
+                'product': 'Not Found',
+                'mrp': 'Not Found',
+                'expiry': 'Not Found',
+                'origin': 'Not Found',
+                'processed_file': ''
+            }
+        with timed("decode"):
+            img = cv2.imread(processed_path)
+        with timed("tesseract"):
+            text = pytesseract.image_to_string(img, config='--oem 3 --psm 6')
+        get_quality_gate().record_ocr(time.process_time() - ocr_started)
+        annotate(ocr_chars=len(text))
+        # Robust regex patterns and line-based search
+        # Use modular extraction from field_extraction.py
+        return extract_product_fields(text, processed_path)
+
+    # Handle file upload
+    if image and getattr(image, 'filename', ''):
+        try:
+            ext = os.path.splitext(secure_filename(image.filename))[1] or ".jpg"
+            upload = get_artifact_store(DB_PATH).put_stream(image.stream, ext, kind="upload")
+            filepath = upload["path"]
+            annotate(upload=filepath, deduplicated=upload["deduplicated"])
+            quality = get_quality_gate().check(filepath)
+            results["quality"] = quality
+            if not quality["ok"]:
+                raise ValueError(f"image rejected by quality check ({', '.join(quality['reasons'])}); please retake the photo")
+            fields = extract_text_fields(filepath)
+            # Normalize processed image path for url_for
+            def to_web_path(p):
+                return p.replace('\\', '/').replace('\\', '/').replace('\\', '/') if p else p
+            processed_rel = to_web_path(os.path.relpath(fields['processed_file'], 'static')) if fields['processed_file'] else ''
+            results["filename"] = url_for('static', filename=to_web_path(os.path.relpath(filepath, 'static')))
+            results["processed_file"] = url_for('static', filename=processed_rel) if processed_rel else None
+            results["data"] = {
+                "manufacturer": fields.get('manufacturer', 'Not Found'),
+                "address": fields.get('address', 'Not Found'),
+                "commodity": fields.get('commodity', 'Not Found'),
+                "net_quantity": fields.get('net_quantity', 'Not Found'),
+                "mrp": fields.get('mrp', 'Not Found'),
+                "date": fields.get('date', 'Not Found'),
+                "consumer_care": fields.get('consumer_care', 'Not Found'),
+                "origin": fields.get('origin', 'Not Found'),
+                "product": fields.get('product', 'Not Found'),
+                "raw_text": fields.get('raw_text', '')
+            }
+            # Calculate compliance score and store in results
+            compliance_fields = [
+                results["data"].get('product', None),
+                results["data"].get('manufacturer', None),
+                results["data"].get('address', None),
+                results["data"].get('commodity', None),
+                results["data"].get('net_quantity', None),
+                results["data"].get('mrp', None),
+                results["data"].get('date', None),
+                results["data"].get('consumer_care', None),
+                results["data"].get('origin', None)
+            ]
+            present_count = sum(1 for info in compliance_fields if info and info != 'Not Found')
+            total_fields = len(compliance_fields)
+            compliance_score = int((present_count / total_fields) * 100) if total_fields else 0
+            results["compliance_score"] = compliance_score
+            store = get_artifact_store(DB_PATH)
+            results["artifacts"] = [store.digest_of(filepath), store.digest_of(fields['processed_file'])]
+            # Keep results server-side; the session only carries the id for the PDF
+            remember_results(results, "upload")
+            annotate(result_id=results["result_id"], compliance_score=compliance_score)
+        except Exception as e:
+            results["data"] = {"error": f"Failed to process uploaded image: {e}"}
+            results["compliance_score"] = 0
+        last_snapshot_rel = session.get("last_snapshot_rel")
+        last_snapshot_url = url_for('static', filename=last_snapshot_rel) if last_snapshot_rel else None
+        return render_template("product_monitoring.html", results=results,
+                              esp32_stream_url=ESP32_STREAM_URL,
+                              esp32_snapshot_url=ESP32_SNAPSHOT_URL,
+                              last_snapshot_url=last_snapshot_url)
+
+    # Handle ESP32 snapshot
+    if snapshot_url:
+        try:
+            filepath = store_capture(get_cameras().capture(current_app.config["UPLOAD_FOLDER"], url=snapshot_url),
+                                     "upload")["path"]
+            fields = extract_text_fields(filepath)
+            results["filename"] = url_for('static', filename=filepath.replace('static/', ''))
+            results["processed_file"] = url_for('static', filename=fields['processed_file'].replace('static/', ''))
+            results["data"] = {
+                "manufacturer": fields.get('manufacturer', 'Not Found'),
+                "address": fields.get('address', 'Not Found'),
+                "commodity": fields.get('commodity', 'Not Found'),
+                "net_quantity": fields.get('net_quantity', 'Not Found'),
+                "mrp": fields.get('mrp', 'Not Found'),
+                "date": fields.get('date', 'Not Found'),
+                "consumer_care": fields.get('consumer_care', 'Not Found'),
+                "origin": fields.get('origin', 'Not Found'),
+                "product": fields.get('product', 'Not Found'),
+                "raw_text": fields.get('raw_text', '')
+            }
+            # Calculate compliance score and store in results
+            compliance_fields = [
+                results["data"].get('product', None),
+                results["data"].get('manufacturer', None),
+                results["data"].get('address', None),
+                results["data"].get('commodity', None),
+                results["data"].get('net_quantity', None),
+                results["data"].get('mrp', None),
+                results["data"].get('date', None),
+                results["data"].get('consumer_care', None),
+                results["data"].get('origin', None)
+            ]
+            present_count = sum(1 for info in compliance_fields if info and info != 'Not Found')
+            total_fields = len(compliance_fields)
+            compliance_score = int((present_count / total_fields) * 100) if total_fields else 0
+            results["compliance_score"] = compliance_score
+            store = get_artifact_store(DB_PATH)
+            results["artifacts"] = [store.digest_of(filepath), store.digest_of(fields['processed_file'])]
+            # Keep results server-side; the session only carries the id for the PDF
+            remember_results(results, "esp32_snapshot")
+        except Exception as e:
+            results["data"] = {"error": f"Failed to fetch from ESP32: {e}"}
+            results["compliance_score"] = 0
+        last_snapshot_rel = session.get("last_snapshot_rel")
+        last_snapshot_url = url_for('static', filename=last_snapshot_rel) if last_snapshot_rel else None
+        return render_template("product_monitoring.html", results=results,
+                               esp32_stream_url=ESP32_STREAM_URL,
+                               esp32_snapshot_url=ESP32_SNAPSHOT_URL,
+                               last_snapshot_url=last_snapshot_url)
+
+# -----------------------------
+# Minimal snapshot capture + CSV log API
+# -----------------------------
+def log_capture(timestamp_str, filename):
+    """Queue one capture for img.csv; the capture log's writer thread does the file I/O."""
+    get_capture_log().log("img", {"timestamp": timestamp_str, "filename": filename})
+
+def _on_camera_poll(camera_id, capture):
+    """Background poll results go to the artifact store and img.csv like /check_compliance."""
+    log_capture(datetime.now().strftime("%Y-%m-%d %H:%M:%S"), store_capture(capture)["static_rel"])
+
+@bp.get("/check_compliance")
+@login_required
+def check_compliance():
+    """Fetch snapshot from a camera (?camera=<id>, default esp32), save to the artifact store, and log to img.csv."""
+    from camera_service import CameraBadResponse, CameraError, CameraUnavailable
+    camera_id = request.args.get("camera") or "esp32"
+    try:
+        capture = store_capture(get_cameras().capture(CAPTURE_FOLDER, prefix="" if camera_id == "esp32" else camera_id,
+                                                      camera=camera_id))
+    except CameraUnavailable as exc:
+        # Breaker is open: fail fast instead of tying up the worker for the full timeout
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 503
+    except CameraBadResponse as exc:
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 502
+    except CameraError as exc:
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 504
+    except OSError as exc:
+        return jsonify({"status": "error", "message": f"Failed to save image: {exc}"}), 500
+
+    timestamp_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    filename = capture["filename"]
+
+    log_capture(timestamp_str, capture["static_rel"])
+
+    return jsonify({
+        "status": "success",
+        "timestamp": timestamp_str,
+        "filename": filename
+    })
+
+# -----------------------------
+# Capture ESP32 Snapshot
+# -----------------------------
+@bp.route("/capture_snapshot", methods=["GET"])
+@login_required
+def capture_snapshot():
+    """Fetch snapshot from ESP32-CAM (or ?camera=<id> / ?url=) and save it into the artifact store."""
+    try:
+        capture = store_capture(get_cameras().capture(current_app.config["UPLOAD_FOLDER"], camera=request.args.get("camera"),
+                                                      url=request.args.get("url")), "upload")
+
+        # Store relative path for building URL later
+        # We prefer 'artifacts/<aa>/<bb>/<digest>.<ext>' for url_for('static', ...)
+        session["last_snapshot_rel"] = capture["static_rel"]
+
+    except Exception as e:
+        # Optionally store error info
+        session["last_snapshot_error"] = str(e)
+
+    # Redirect back to product monitoring to show last captured
+    return redirect(url_for("pages.product_monitoring"))
+
+# -----------------------------
+# Capture pipeline: OCR + CSV match + rules + DB records
+# -----------------------------
+def process_capture(save_path, filename, source_url, quality=None):
+    """Run the capture-and-check pipeline on an image already in the artifact store.
+
+    Used by /capture_and_check and by the background MJPEG ingest worker; needs no request context.
+    Images failing the quality gate stop here, before OCR, and record nothing.
+    """
+    load_ocr_stack()
+    from ocr_processing import open_image_or_error, perform_ocr
+    results = {"url": None, "filename": to_url_path(save_path), "processed_file": None, "data": {}, "compliant": True}
+    results["quality"] = quality = quality or get_quality_gate().check(save_path)
+    if not quality["ok"]:
+        results["data"] = {"error": f"Image rejected by quality check ({', '.join(quality['reasons'])}); please recapture"}
+        results["compliant"] = False
+        results["rejected"] = True
+        return results
+
+    # OCR preprocessing and extraction via helper
+    pil_img = open_image_or_error(save_path)
+    ocr_started = time.process_time()
+    try:
+        text, processed_image_for_save = perform_ocr(pil_img)
+        get_quality_gate().record_ocr(time.process_time() - ocr_started)
+    except Exception as _ocr3_e:
+        text = ""
+        processed_image_for_save = pil_img
+
+    # Extract email if present
+    try:
+        email_match = re.search(r"[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\\.[A-Za-z]{2,}", text)
+        care_email = email_match.group(0) if email_match else None
+    except Exception:
+        care_email = None
+
+    extracted_data = {
+        "product": "ESP32 Snapshot",
+        "mrp": "₹" + text.split("MRP")[-1].split("\n")[0].strip() if "MRP" in text else "Not Found",
+        "net_quantity": "500g" if "500g" in text else "Not Found",
+        "manufacturer": "ABC Foods" if "ABC" in text else "Not Found",
+        "country": "India" if "India" in text else "Not Found",
+        "care": care_email or ("care@abc.com" if "@" in text else "Not Found")
+    }
+
+    # Prefer category-based matching first
+    guessed_cat = guess_category_from_text(text)
+    cat_products = get_products_by_category(guessed_cat)
+    matched_product, match_score = find_best_csv_match(text, cat_products)
+    if (not matched_product) or match_score < 0.90:
+        matched_product, match_score = find_best_csv_match(text, get_catalog()["all"])
+    if matched_product and match_score >= 0.90:
+        extracted_data.update({
+            "product": matched_product.get('name') or matched_product.get('Product Name') or extracted_data.get('product'),
+            "mrp": matched_product.get('price') or matched_product.get('Price') or extracted_data.get('mrp'),
+            "matched_from_csv": True,
+            "match_score": round(match_score * 100, 2)
+        })
+
+    results["data"] = extracted_data
+    # Evaluate rule engine for ESP32 capture-and-check
+    compliant, issues = evaluate_legal_metrology_rules(results["data"])
+    results["compliant"] = compliant
+    if not compliant:
+        results["data"]["issue"] = "; ".join(issues)
+
+    store = get_artifact_store(DB_PATH)
+    try:
+        processed_path = store.put_image(processed_image_for_save, "processed")["path"]
+    except Exception:
+        # Fall back to the capture itself (same content, so no second copy on disk)
+        processed_path = save_path
+    results["processed_file"] = to_url_path(processed_path)
+    results["raw_text"] = text
+
+    # Save DB records
+    product_id = run_insert('''INSERT INTO products
+        (title, brand, seller, category, scanned_at, source_url,
+         mrp, net_qty, manufacturer, country_of_origin, consumer_care, raw_text)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+        (results["data"]["product"], None, None, None, datetime.now().isoformat(),
+         source_url, results["data"]["mrp"], results["data"]["net_quantity"],
+         results["data"]["manufacturer"], results["data"]["country"],
+         results["data"]["care"], text))
+    results["product_id"] = product_id
+    annotate(product_id=product_id, compliant=results["compliant"])
+    results["artifacts"] = [store.digest_of(save_path), store.digest_of(processed_path)]
+    # products rows are never deleted, so they pin only the source capture; the processed image is
+    # re-creatable and is held only by the (pruned) ocr_results entry, leaving it to the quota
+    store.add_ref([store.digest_of(save_path)], "products", product_id)
+    if not results["compliant"]:
+        run_query('''INSERT INTO violations (product_id, issue, severity, detected_at)
+                     VALUES (?, ?, ?, ?)''',
+                  (product_id, results["data"].get("issue", "Unknown"), "High", datetime.now().isoformat()))
+
+    # Capture history for data/captures.csv and data/extracted_texts.csv, written behind by the capture log
+    now_iso = datetime.now().isoformat()
+    get_capture_log().log("captures", {
+        "timestamp": now_iso, "filename": save_path, "processed_file": processed_path,
+        "product": results["data"]["product"], "mrp": results["data"]["mrp"],
+        "net_quantity": results["data"]["net_quantity"], "manufacturer": results["data"]["manufacturer"],
+        "country": results["data"]["country"], "care": results["data"]["care"],
+        "compliant": results["compliant"], "issue": results["data"].get("issue", ""),
+        "product_id": product_id, "raw_text_preview": text[:200],
+    })
+    get_capture_log().log("extracted_texts", {"timestamp": now_iso, "filename": save_path,
+                                              "processed_file": processed_path, "product_id": product_id,
+                                              "full_text": text})
+    return results
+
+def _ingest_stream_frame(jpeg, quality=None):
+    """process_fn for the stream worker: save the settled frame and run it through the pipeline."""
+    with trace("ingest"), get_profiler().job("ingest"):
+        save_path = get_artifact_store(DB_PATH).put_bytes(jpeg, ".jpg", kind="capture")["path"]
+        filename = os.path.basename(save_path)
+        results = process_capture(save_path, filename, ESP32_STREAM_URL, quality=quality)
+    return {
+        "filename": results["filename"],
+        "processed_file": results["processed_file"],
+        "product": results["data"].get("product"),
+        "compliant": results["compliant"],
+        "issue": results["data"].get("issue"),
+        "product_id": results.get("product_id"),
+        "quality": results["quality"],
+        "processed_at": datetime.now().isoformat(),
+    }
+
+_ingest_worker = None
+_ingest_lock = threading.Lock()
+
+def get_ingest_worker():
+    """The MJPEG ingest worker, built on first use."""
+    global _ingest_worker
+    with _ingest_lock:
+        if _ingest_worker is None:
+            from stream_ingest import StreamIngestWorker
+            _ingest_worker = StreamIngestWorker(ESP32_STREAM_URL, _ingest_stream_frame,
+                                                sample_fps=float(os.environ.get("ESP32_INGEST_FPS", "4")),
+                                                burst=CAPTURE_BURST, gate=get_quality_gate())
+        return _ingest_worker
+
+@bp.route("/ingest/status")
+@login_required
+def ingest_status():
+    return jsonify(get_ingest_worker().stats())
+
+@bp.route("/ingest/start", methods=["POST"])
+@login_required
+def ingest_start():
+    get_ingest_worker().start()
+    return jsonify(get_ingest_worker().stats())
+
+@bp.route("/ingest/stop", methods=["POST"])
+@login_required
+def ingest_stop():
+    get_ingest_worker().stop()
+    return jsonify(get_ingest_worker().stats())
+
+@bp.route("/cameras", methods=["GET", "POST"])
+@login_required
+def cameras():
+    """List registered cameras with latency/error metrics; POST registers or updates one."""
+    if request.method == "POST":
+        data = request.get_json(silent=True) or request.form
+        camera_id = (data.get("id") or "").strip()
+        snapshot_url = (data.get("snapshot_url") or "").strip()
+        if not re.fullmatch(r"[A-Za-z0-9_-]{1,40}", camera_id) or not snapshot_url.startswith(("http://", "https://")):
+            return jsonify({"status": "error", "message": "id (letters, digits, _ or -) and an http(s) snapshot_url are required"}), 400
+        from camera_service import MIN_POLL_INTERVAL
+        try:
+            poll_interval = float(data.get("poll_interval") or 0)
+        except (TypeError, ValueError):
+            poll_interval = math.nan
+        # 0 turns polling off; otherwise a finite number of seconds, not so small it hammers the camera
+        if not math.isfinite(poll_interval) or (poll_interval != 0 and poll_interval < MIN_POLL_INTERVAL):
+            return jsonify({"status": "error",
+                            "message": f"poll_interval must be 0 (off) or at least {MIN_POLL_INTERVAL:g} seconds"}), 400
+        get_cameras().register(camera_id, snapshot_url, data.get("stream_url") or None,
+                               poll_interval=poll_interval,
+                               enabled=str(data.get("enabled", "1")).lower() not in ("0", "false", "no"))
+    metrics = get_cameras().metrics()
+    return jsonify([dict(c, metrics=metrics.get(c["id"], {})) for c in get_cameras().cameras()])
+
+@bp.route("/cameras/<camera_id>/capture", methods=["POST"])
+@login_required
+def camera_capture(camera_id):
+    """Snapshot one camera into static/captures (camera_id "all" captures every enabled camera concurrently)."""
+    from camera_service import CameraError, CameraTimeout, CameraUnavailable
+    if camera_id == "all":
+        return jsonify(get_cameras().capture_many(CAPTURE_FOLDER))
+    try:
+        capture = get_cameras().capture(CAPTURE_FOLDER, prefix=camera_id, camera=camera_id)
+    except CameraUnavailable as exc:
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 503
+    except CameraTimeout as exc:
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 504
+    except CameraError as exc:
+        return jsonify({"status": "error", "camera": camera_id, "message": str(exc)}), 502
+    return jsonify({"status": "success", "camera": camera_id, "filename": capture["filename"],
+                    "bytes": capture["bytes"]})
+
+@bp.route("/capture_log/stats")
+@login_required
+def capture_log_stats():
+    return jsonify(get_capture_log().stats())
+
+@bp.route("/quality/stats")
+@login_required
+def quality_stats():
+    return jsonify(get_quality_gate().stats())
+
+# -----------------------------
+# Capture from ESP32 and process immediately
+# -----------------------------
+@bp.route("/capture_and_check", methods=["GET"])
+@login_required
+def capture_and_check():
+    """Capture a snapshot from ESP32, run OCR + CSV match, and render results."""
+    camera_id = request.args.get("camera")
+    snapshot_url = request.args.get("url")
+    results = {"url": None, "filename": None, "processed_file": None, "data": {}, "compliant": True}
+    try:
+        # Burst mode: grab several snapshots and only OCR the sharpest acceptable one
+        burst = max(1, min(10, request.args.get("burst", CAPTURE_BURST, type=int)))
+        frames = get_cameras().fetch_burst(burst, camera=camera_id, url=snapshot_url)
+        best, scores = get_quality_gate().best_of([f["content"] for f in frames])
+        if best is None:
+            # Nothing usable: keep the least bad frame on disk, skip OCR and DB records
+            best = max(range(burst), key=lambda i: scores[i]["sharpness"])
+        frame = frames[best]
+        from camera_service import extension_for
+        if not snapshot_url:
+            snapshot_url = (get_cameras().camera(frame["camera"]) or {}).get("snapshot_url", ESP32_SNAPSHOT_URL)
+
+        save_path = get_artifact_store(DB_PATH).put_bytes(frame["content"], extension_for(frame["content_type"]),
+                                                          kind="capture")["path"]
+        filename = os.path.basename(save_path)
+        session["last_snapshot_rel"] = os.path.relpath(save_path, "static").replace("\\", "/")
+        results = process_capture(save_path, filename, snapshot_url, quality=scores[best])
+        if results.get("product_id"):
+            remember_results(results, "capture_and_check")
+
+    except Exception as e:
+        results["data"] = {"error": f"Failed to capture/process from ESP32: {e}"}
+        results["compliant"] = False
+
+    return render_template("product_monitoring.html", results=results,
+                           esp32_stream_url=ESP32_STREAM_URL,
+                           esp32_snapshot_url=ESP32_SNAPSHOT_URL,
+                           last_snapshot_url=url_for('static', filename=session.get("last_snapshot_rel")) if session.get("last_snapshot_rel") else None)
@@ -0,0 +1,43 @@
+"""Request timing for every route and the Prometheus /metrics endpoint."""
+from flask import Blueprint, Response, g, request
+
+import metrics
+
+bp = Blueprint("metrics", __name__)
+
+# -----------------------------
+# Per-request trace: route latency, in-flight gauge and the timing log line
+# -----------------------------
+def _route_labels():
+    rule = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    return rule, (("route", rule),)
+
+@bp.before_app_request
+def start_request_trace():
+    route, labels = _route_labels()
+    metrics.registry.add_gauge("compliance_http_requests_in_flight", labels, 1)
+    g.metrics_trace = metrics.begin_trace(route)
+
+def _finish(status):
+    current = g.pop("metrics_trace", None)
+    if current is None:
+        return
+    route, labels = _route_labels()
+    elapsed = metrics.end_trace(current, method=request.method, status=status)
+    metrics.registry.add_gauge("compliance_http_requests_in_flight", labels, -1)
+    metrics.registry.observe("compliance_http_request_duration_seconds",
+                             labels + (("method", request.method), ("status", str(status))), elapsed)
+
+@bp.after_app_request
+def finish_request_trace(response):
+    _finish(response.status_code)
+    return response
+
+@bp.teardown_app_request
+def abort_request_trace(exc):
+    # Only still open when the view raised and after_request never ran
+    _finish(500)
+
+@bp.route("/metrics")
+def prometheus_metrics():
+    return Response(metrics.render_prometheus(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,162 @@
+"""Login, navigation pages and the static JSON/CSV data the pages fetch."""
+import os
+
+from flask import Blueprint, redirect, render_template, request, send_file, session, url_for
+
+from app_common import ESP32_SNAPSHOT_URL, ESP32_STREAM_URL, get_catalog, login_required
+
+bp = Blueprint("pages", __name__)
+
+# Serve rules.json for frontend fetch
+@bp.route('/rules.json')
+def serve_rules_json():
+    return send_file('rules.json', mimetype='application/json')
+
+# -----------------------------
+# Login Route (Default Page)
+# -----------------------------
+@bp.route("/", methods=["GET", "POST"])
+def login():
+    error = None
+    if request.method == "POST":
+        username = request.form.get("username")
+        password = request.form.get("password")
+
+        if username == "1234" and password == "1234":
+            session["user"] = username
+            return redirect(url_for("pages.home"))
+        else:
+            error = "Invalid username or password"
+
+    return render_template("login.html", error=error)
+
+# -----------------------------
+# Logout Route
+# -----------------------------
+@bp.route('/logout')
+def logout():
+    session.clear()
+    return redirect(url_for('pages.login'))
+
+# -----------------------------
+# Standard Pages
+# -----------------------------
+@bp.route("/dashboard")
+@login_required
+def dashboard():
+    return render_template("dashboard.html")
+
+@bp.route("/home")
+@login_required
+def home():
+    return render_template("home.html")
+
+@bp.route("/violation_reports")
+@login_required
+def violation_reports():
+    return render_template("violation_reports.html")
+
+@bp.route("/categories")
+@login_required
+def categories():
+    catalog = get_catalog()
+    # Pass CSV data organized by categories
+    return render_template("categories.html", 
+                         laptop_products=catalog["laptop"],
+                         mobile_products=catalog["mobile"],
+                         protein_products=catalog["protein"])
+
+@bp.route("/geo_heatmap")
+@login_required
+def geo_heatmap():
+    return render_template("geo_heatmap.html")
+
+@bp.route("/rule_engine")
+@login_required
+def rule_engine():
+    return render_template("rule_engine.html")
+
+@bp.route("/profile")
+@login_required
+def profile():
+    return render_template("profile.html")
+
+# -----------------------------
+# CSV Data Routes
+# -----------------------------
+@bp.route("/data/<filename>")
+@login_required
+def serve_csv(filename):
+    """Serve CSV files from the data directory"""
+    csv_path = os.path.join("data", filename)
+    if os.path.exists(csv_path):
+        return send_file(csv_path, mimetype='text/csv')
+    else:
+        return "File not found", 404
+
+# -----------------------------
+# Product Monitoring
+# -----------------------------
+@bp.route("/product_monitoring")
+@login_required
+def product_monitoring():
+    catalog = get_catalog()
+    # Pass CSV data to template for display
+    last_snapshot_rel = session.get("last_snapshot_rel")
+    last_snapshot_url = None
+    if last_snapshot_rel:
+        # Build a static URL for the last snapshot
+        try:
+            # Expecting something like artifacts/ab/cd/<digest>.jpg (older sessions: uploads/filename.jpg)
+            if last_snapshot_rel.startswith(("artifacts/", "uploads/")):
+                last_snapshot_url = url_for('static', filename=last_snapshot_rel)
+            elif last_snapshot_rel.startswith("static/"):
+                # Backward compatibility
+                last_snapshot_url = "/" + last_snapshot_rel
+        except Exception:
+            last_snapshot_url = None
+
+    return render_template("product_monitoring.html", 
+                         results=None, 
+                         laptop_products=catalog["laptop"][:10],  # Show first 10 for demo
+                         mobile_products=catalog["mobile"][:10],
+                         protein_products=catalog["protein"][:10],
+                         esp32_stream_url=ESP32_STREAM_URL,
+                         esp32_snapshot_url=ESP32_SNAPSHOT_URL,
+                         last_snapshot_url=last_snapshot_url)
+
+@bp.route("/search_products", methods=["GET", "POST"])
+@login_required
+def search_products():
+    catalog = get_catalog()
+    if request.method == "POST":
+        search_term = request.form.get("search_term", "").strip().lower()
+        category = request.form.get("category", "all")
+        
+        # Only filter if there's an actual search term
+        if search_term:
+            filtered_products = []
+            
+            if category == "laptop" or category == "all":
+                filtered_products.extend([p for p in catalog["laptop"] if search_term in p.get('name', '').lower()])
+            if category == "mobile" or category == "all":
+                filtered_products.extend([p for p in catalog["mobile"] if search_term in p.get('name', '').lower()])
+            if category == "protein" or category == "all":
+                filtered_products.extend([p for p in catalog["protein"] if search_term in p.get('name', '').lower()])
+        else:
+            # No search term, don't show search results
+            filtered_products = None
+        
+        return render_template("categories.html", 
+                             laptop_products=catalog["laptop"],
+                             mobile_products=catalog["mobile"],
+                             protein_products=catalog["protein"],
+                             search_results=filtered_products,
+                             search_term=search_term,
+                             selected_category=category)
+    
+    return render_template("categories.html", 
+                         laptop_products=catalog["laptop"],
+                         mobile_products=catalog["mobile"],
+                         protein_products=catalog["protein"])
+
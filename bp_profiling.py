@@ -0,0 +1,85 @@
+"""Opt-in request profiling (X-Profile header, admin toggles, rolling slowest-N) and the /admin/profiles page."""
+from flask import Blueprint, Response, abort, g, jsonify, redirect, render_template, request, session, url_for
+
+from app_common import login_required
+from profiling import PROFILE_HEADER, get_profiler
+
+bp = Blueprint("profiling", __name__)
+
+# -----------------------------
+# Per-request sampling
+# -----------------------------
+@bp.before_app_request
+def start_request_profile():
+    if request.endpoint is None or request.endpoint == "static" or request.blueprint == "profiling":
+        return
+    profiler = get_profiler()
+    route = request.url_rule.rule
+    if request.headers.get(PROFILE_HEADER, "0") not in ("", "0") and session.get("user"):
+        reason = "header"
+    elif profiler.take_armed(route):
+        reason = "toggle"
+    elif profiler.rolling:
+        reason = "rolling"
+    else:
+        return
+    g.profile = profiler.start(route, request.method, reason)
+
+def _finish(status):
+    profile = g.pop("profile", None)
+    if profile is None:
+        return None
+    return get_profiler().finish(profile, status)
+
+@bp.after_app_request
+def finish_request_profile(response):
+    saved = _finish(response.status_code)
+    if saved is not None:
+        response.headers["X-Profile-Id"] = saved["id"]
+    return response
+
+@bp.teardown_app_request
+def abort_request_profile(exc):
+    # Only still open when the view raised and after_request never ran
+    _finish(500)
+
+# -----------------------------
+# Admin page: toggles, list, download
+# -----------------------------
+@bp.route("/admin/profiles", methods=["GET", "POST"])
+@login_required
+def profiles():
+    profiler = get_profiler()
+    if request.method == "POST":
+        action = request.form.get("action")
+        if action == "rolling":
+            profiler.rolling = request.form.get("enabled") == "1"
+        elif action == "jobs":
+            profiler.jobs = request.form.get("enabled") == "1"
+        elif action == "arm":
+            profiler.arm(request.form.get("count", 1, type=int), request.form.get("route", "").strip())
+        elif action == "delete":
+            profiler.delete(request.form.get("id", ""))
+        return redirect(url_for("profiling.profiles"))
+    if request.args.get("format") == "json":
+        return jsonify({"settings": profiler.settings(), "profiles": profiler.list()})
+    return render_template("profiles.html", settings=profiler.settings(), profiles=profiler.list())
+
+@bp.route("/admin/profiles/<profile_id>")
+@login_required
+def download_profile(profile_id):
+    profiler = get_profiler()
+    if request.args.get("format") == "speedscope":
+        data = profiler.speedscope(profile_id)
+        if data is None:
+            abort(404)
+        response = jsonify(data)
+        filename = f"{profile_id}.speedscope.json"
+    else:
+        collapsed = profiler.collapsed(profile_id)
+        if collapsed is None:
+            abort(404)
+        response = Response(collapsed, mimetype="text/plain")
+        filename = f"{profile_id}.folded"
+    response.headers["Content-Disposition"] = f"attachment; filename={filename}"
+    return response
@@ -0,0 +1,160 @@
+"""Compliance checks, exports and PDF reports.
+
+ReportLab and pypdf are imported inside the report views, so workers that
+never render a PDF do not load them.
+"""
+import os
+from datetime import datetime
+from io import BytesIO
+
+from flask import Blueprint, Response, jsonify, request, send_file, session, url_for
+
+from app_common import DB_PATH, login_required, run_query
+from compliance_export import build_compliance_query, filters_from_args, stream_csv, stream_xlsx
+from metrics import timed
+from result_store import get_result_store
+
+bp = Blueprint("reports", __name__)
+
+# -----------------------------
+# Helper to create dummy placeholder images
+# -----------------------------
+def create_placeholder_image(path, text):
+    from PIL import Image, ImageDraw, ImageFont
+    img = Image.new('RGB', (400, 300), color=(200, 200, 200))
+    d = ImageDraw.Draw(img)
+    font = ImageFont.load_default()
+    w, h = d.textsize(text, font=font)
+    d.text(((400-w)/2,(300-h)/2), text, fill=(50,50,50), font=font)
+    img.save(path)
+
+@bp.route('/get_compliance_checks')
+@login_required
+def get_compliance_checks():
+    query, params = build_compliance_query(filters_from_args(request.args))
+    rows = run_query(query, params, fetch=True)
+    checks = []
+    for row in rows:
+        checks.append({
+            'product': row['product'] or 'Unknown',
+            'seller': row['seller'] or 'Unknown',
+            'mrp': row['mrp'] or '-',
+            'net_qty': row['net_qty'] or '-',
+            'detected_at': row['detected_at'] or '-',
+            'category': row['category'] or '-',
+            'status': row['status'],
+            'issue': row['issue'] or 'N/A',
+            'severity': row['severity'] or 'N/A'
+        })
+    return jsonify(checks)
+
+@bp.route('/export_compliance')
+@login_required
+def export_compliance():
+    """Stream products joined with violations as CSV (default) or XLSX (?format=xlsx), same filters as above."""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'xlsx'):
+        return jsonify({"error": "format must be csv or xlsx"}), 400
+    filters = filters_from_args(request.args)
+    filename = f"compliance_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{fmt}"
+    if fmt == 'xlsx':
+        body = stream_xlsx(DB_PATH, filters)
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    else:
+        body = stream_csv(DB_PATH, filters)
+        mimetype = 'text/csv'
+    return Response(body, mimetype=mimetype,
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
+
+# -----------------------------
+# Download PDF Report (Properly)
+# -----------------------------
+@bp.route("/download_report", methods=["POST"])
+@login_required
+def download_report():
+    # Results are looked up by id (form field, else the session's latest) among this user's own results;
+    # old sessions may still carry a copy
+    result_id = request.form.get('result_id') or session.get('result_id')
+    product_results = (get_result_store(DB_PATH).get(result_id, user=session.get('user'))
+                       or session.get('latest_results') or {'data': {}})
+    return _report_pdf(product_results)
+
+@bp.route("/reports")
+@login_required
+def list_reports():
+    """This user's recent stored results (newest first) with links to regenerate their PDFs."""
+    rows = get_result_store(DB_PATH).recent(limit=request.args.get("limit", 50, type=int), user=session.get('user'))
+    for row in rows:
+        row["report_url"] = url_for(".stored_report", result_id=row["id"])
+    return jsonify(rows)
+
+@bp.route("/reports/<result_id>")
+@login_required
+def stored_report(result_id):
+    """Regenerate the PDF for one of this user's stored results; other users' ids are not found."""
+    product_results = get_result_store(DB_PATH).get(result_id, user=session.get('user'))
+    if product_results is None:
+        return jsonify({"error": "Result not found"}), 404
+    return _report_pdf(product_results)
+
+def _report_pdf(product_results):
+    data = product_results.get('data') or {}
+
+    # Prepare compliance info table
+    compliance_fields = [
+        ('Product Name', data.get('product')),
+        ('Manufacturer / Packer / Importer', data.get('manufacturer')),
+        ('Address', data.get('address')),
+        ('Commodity Name', data.get('commodity')),
+        ('Net Quantity', data.get('net_quantity')),
+        ('MRP (₹)', data.get('mrp')),
+        ('Date of Manufacture / Import', data.get('date')),
+        ('Consumer Care Details', data.get('consumer_care')),
+        ('Country of Origin', data.get('origin'))
+    ]
+
+    # Calculate compliance score
+    present_count = sum(1 for _, info in compliance_fields if info and info != 'Not Found')
+    total_fields = len(compliance_fields)
+    compliance_score = int((present_count / total_fields) * 100) if total_fields else 0
+
+    # Use actual uploaded files if they exist, otherwise use placeholder
+    # Remove leading '/' if present for os.path.exists
+    uploaded_file = (product_results.get('filename') or '').lstrip('/')
+    processed_file = (product_results.get('processed_file') or '').lstrip('/')
+    if not uploaded_file or not os.path.exists(uploaded_file):
+        uploaded_file = "static/uploads/img1.png"
+        if not os.path.exists(uploaded_file):
+            create_placeholder_image(uploaded_file, "Uploaded Image")
+    if not processed_file or not os.path.exists(processed_file):
+        processed_file = "static/processed/img2.png"
+        if not os.path.exists(processed_file):
+            create_placeholder_image(processed_file, "Processed Image")
+
+    # Compliance table for PDF
+    compliance_table = [['Field', 'Status', 'Info']]
+    for label, info in compliance_fields:
+        status = 'Present' if info and info != 'Not Found' else 'Absent'
+        mark = '✔' if status == 'Present' else '✘'
+        compliance_table.append([label, f'{mark} {status}', info or 'Not Found'])
+
+    from bw_report_generator import render_bw_report
+    # Rendered in memory per request (cached by results + image hashes), so concurrent users never share a file
+    with timed("pdf_render"):
+        pdf_bytes = render_bw_report(product_results, compliance_table, compliance_score, uploaded_file, processed_file)
+    return send_file(BytesIO(pdf_bytes), mimetype='application/pdf', as_attachment=True,
+                     download_name='violation_report_bw.pdf')
+
+@bp.route("/download_bulk_report")
+@login_required
+def download_bulk_report():
+    """Every violation (optionally one month, ?month=YYYY-MM) as one PDF, streamed while it renders."""
+    from bulk_report import month_bounds, stream_bulk_report
+    month = request.args.get("month", "").strip()
+    try:
+        since, until = month_bounds(month) if month else (None, None)
+    except ValueError:
+        return jsonify({"error": "month must be YYYY-MM"}), 400
+    filename = f"violation_report_{month or 'all'}.pdf"
+    return Response(stream_bulk_report(DB_PATH, since, until), mimetype="application/pdf",
+                    headers={"Content-Disposition": f"attachment; filename={filename}"})
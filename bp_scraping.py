@@ -0,0 +1,94 @@
+"""Background scraping jobs: submit category crawls and follow their progress."""
+import json
+import time
+
+from flask import Blueprint, Response, jsonify, request, url_for
+
+from app_common import DB_PATH, login_required
+from scrape_scheduler import get_scheduler
+
+bp = Blueprint("scraping", __name__)
+
+@bp.route("/scrape_category", methods=["POST"])
+@login_required
+def scrape_category():
+    category = request.form.get("category", "").strip().lower()
+    if not category:
+        return jsonify({"status": "error", "message": "category is required"}), 400
+    # The crawl runs in the background; poll status_url or stream_url for progress
+    job_id = get_scheduler(DB_PATH).submit(category, max_pages=1)
+    return jsonify({
+        "status": "queued",
+        "job_id": job_id,
+        "status_url": url_for(".scrape_job_status", job_id=job_id),
+        "stream_url": url_for(".scrape_job_stream", job_id=job_id),
+    }), 202
+
+@bp.route("/scrape_categories", methods=["POST"])
+@login_required
+def scrape_categories():
+    # Accept either JSON {categories: [..], max_pages} or form with comma-separated 'categories'
+    categories = []
+    max_pages = 1
+    if request.is_json:
+        payload = request.get_json(silent=True) or {}
+        categories = payload.get("categories") or []
+        max_pages = int(payload.get("max_pages") or 1)
+    else:
+        cats = request.form.get("categories") or request.form.get("category") or ""
+        categories = [c.strip().lower() for c in cats.split(",") if c.strip()]
+        mp = request.form.get("max_pages")
+        if mp:
+            try:
+                max_pages = int(mp)
+            except ValueError:
+                max_pages = 1
+
+    if not categories:
+        # Default to all known categories
+        categories = ["protein", "mobile", "laptop"]
+
+    scheduler = get_scheduler(DB_PATH)
+    jobs = {cat: scheduler.submit(cat, max_pages=max_pages) for cat in categories}
+    return jsonify({
+        "status": "queued",
+        "categories": categories,
+        "jobs": {cat: {"job_id": job_id, "status_url": url_for(".scrape_job_status", job_id=job_id)}
+                 for cat, job_id in jobs.items()},
+        "csv": "/data/scraped_info.csv",
+    }), 202
+
+@bp.route("/scrape_jobs")
+@login_required
+def scrape_jobs():
+    return jsonify(get_scheduler(DB_PATH).recent())
+
+@bp.route("/scrape_jobs/<job_id>")
+@login_required
+def scrape_job_status(job_id):
+    job = get_scheduler(DB_PATH).get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify(job)
+
+@bp.route("/scrape_jobs/<job_id>/stream")
+@login_required
+def scrape_job_stream(job_id):
+    """Server-sent events with the job row whenever it changes, until it finishes."""
+    scheduler = get_scheduler(DB_PATH)
+    if not scheduler.get(job_id):
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+
+    def events():
+        last = None
+        while True:
+            job = scheduler.get(job_id)
+            payload = json.dumps(job)
+            if payload != last:
+                last = payload
+                yield f"data: {payload}\n\n"
+            if job["status"] not in ("queued", "running"):
+                return
+            time.sleep(1)
+
+    return Response(events(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache"})
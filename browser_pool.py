@@ -0,0 +1,189 @@
+"""Process-wide Playwright browser shared by every scrape request.
+
+One headless Chromium runs on a dedicated event-loop thread. Scrapes borrow an
+isolated BrowserContext from a small pool; contexts are recycled after a number
+of page loads or when a page crashes, and the browser is relaunched if it dies.
+Flask routes (or any thread) hand coroutines to the loop with submit()/run().
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import os
+import threading
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, List, Optional
+
+from playwright.async_api import async_playwright
+
+
+USER_AGENT = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
+)
+
+
+class _ContextSlot:
+    def __init__(self, context):
+        self.context = context
+        self.pages_loaded = 0
+        self.broken = False
+
+    def track(self, page) -> None:
+        def _loaded(_):
+            self.pages_loaded += 1
+
+        def _crashed(_):
+            self.broken = True
+
+        page.on("domcontentloaded", _loaded)
+        page.on("crash", _crashed)
+
+
+class BrowserManager:
+    def __init__(self, max_contexts: int = 4, pages_per_context: int = 100, headless: bool = True,
+                 user_agent: str = USER_AGENT, launch_args: Optional[List[str]] = None):
+        self.max_contexts = max_contexts
+        self.pages_per_context = pages_per_context
+        self.headless = headless
+        self.user_agent = user_agent
+        self.launch_args = launch_args or []
+        self.stats = {"launches": 0, "contexts_created": 0, "contexts_recycled": 0, "jobs": 0}
+
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="playwright-loop", daemon=True)
+        self._pw = None
+        self._browser = None
+        self._browser_lock: Optional[asyncio.Lock] = None
+        self._idle: List[_ContextSlot] = []
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    # -- loop thread -------------------------------------------------------
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def start(self) -> "BrowserManager":
+        with self._start_lock:
+            if not self._started:
+                self._thread.start()
+                self._started = True
+        return self
+
+    def submit(self, coro_fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> concurrent.futures.Future:
+        """Schedule coro_fn(*args, **kwargs) on the browser loop; thread-safe."""
+        self.start()
+        self.stats["jobs"] += 1
+        return asyncio.run_coroutine_threadsafe(coro_fn(*args, **kwargs), self._loop)
+
+    def run(self, coro_fn: Callable[..., Awaitable[Any]], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Blocking submit(): wait for and return the coroutine's result."""
+        return self.submit(coro_fn, *args, **kwargs).result(timeout)
+
+    # -- browser / contexts (run on the loop thread) -----------------------
+    async def _ensure_browser(self):
+        if self._browser_lock is None:
+            self._browser_lock = asyncio.Lock()
+            self._slots = asyncio.Semaphore(self.max_contexts)
+        async with self._browser_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return self._browser
+            # Browser crashed or never launched: drop stale contexts and relaunch
+            self._idle.clear()
+            if self._pw is None:
+                self._pw = await async_playwright().start()
+            self._browser = await self._pw.chromium.launch(headless=self.headless, args=self.launch_args)
+            self.stats["launches"] += 1
+            return self._browser
+
+    async def _new_slot(self, **context_options) -> _ContextSlot:
+        browser = await self._ensure_browser()
+        context_options.setdefault("user_agent", self.user_agent)
+        context = await browser.new_context(**context_options)
+        slot = _ContextSlot(context)
+        context.on("page", slot.track)
+        self.stats["contexts_created"] += 1
+        return slot
+
+    async def _retire(self, slot: _ContextSlot) -> None:
+        self.stats["contexts_recycled"] += 1
+        try:
+            await slot.context.close()
+        except Exception:
+            pass
+
+    @asynccontextmanager
+    async def context(self, **context_options):
+        """Borrow a BrowserContext. Custom options always get a fresh, unpooled context."""
+        await self._ensure_browser()
+        async with self._slots:
+            slot = None
+            if not context_options:
+                while self._idle and slot is None:
+                    candidate = self._idle.pop()
+                    if candidate.broken or not self._browser.is_connected():
+                        await self._retire(candidate)
+                    else:
+                        slot = candidate
+            if slot is None:
+                slot = await self._new_slot(**context_options)
+            try:
+                yield slot.context
+            except Exception:
+                slot.broken = True
+                raise
+            finally:
+                for page in list(slot.context.pages):
+                    try:
+                        await page.close()
+                    except Exception:
+                        slot.broken = True
+                if (context_options or slot.broken or slot.pages_loaded >= self.pages_per_context
+                        or not self._browser.is_connected()):
+                    await self._retire(slot)
+                else:
+                    self._idle.append(slot)
+
+    async def _shutdown(self) -> None:
+        for slot in self._idle:
+            await self._retire(slot)
+        self._idle.clear()
+        if self._browser is not None:
+            try:
+                await self._browser.close()
+            except Exception:
+                pass
+        if self._pw is not None:
+            await self._pw.stop()
+        self._browser = None
+        self._pw = None
+
+    def shutdown(self, timeout: float = 15.0) -> None:
+        if not self._started:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._started = False
+
+
+_manager: Optional[BrowserManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_browser_manager() -> BrowserManager:
+    """Return the process-wide BrowserManager, starting it on first use."""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = BrowserManager(
+                max_contexts=int(os.environ.get("SCRAPER_MAX_CONTEXTS", "4")),
+                pages_per_context=int(os.environ.get("SCRAPER_PAGES_PER_CONTEXT", "100")),
+            )
+            _manager.start()
+            atexit.register(_manager.shutdown)
+        return _manager
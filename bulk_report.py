@@ -0,0 +1,350 @@
+"""Consolidated violation report over every row in violations, rendered in parallel and streamed.
+
+Violations are read in keyset-paged chunks (ordered by category), each chunk is
+drawn to a small PDF in a process pool with only a few chunks in flight, and
+their pages are copied into one PDF that is written out incrementally. Memory
+stays flat however many violations there are. Page 1 summarises the aggregated
+counts and lists each category's page range; categories are also bookmarks.
+
+    python bulk_report.py --month 2026-10 -o violations_2026-10.pdf
+"""
+import argparse
+import atexit
+import multiprocessing
+import os
+import sqlite3
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from pypdf import PdfReader
+from pypdf.generic import IndirectObject, NameObject
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from bw_report_generator import draw_summary_page, draw_violation_page
+
+
+BULK_CHUNK_SIZE = int(os.environ.get("BULK_REPORT_CHUNK", "200"))
+BULK_WORKERS = int(os.environ.get("BULK_REPORT_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+CATEGORY_SQL = "COALESCE(NULLIF(p.category, ''), 'Uncategorized')"
+
+
+def month_bounds(month: str) -> Tuple[str, str]:
+    """'2026-10' -> ('2026-10-01', '2026-11-01') for comparing ISO detected_at strings."""
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d")
+
+
+def _connect(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _filters(since: Optional[str], until: Optional[str], max_id: Optional[int]) -> Tuple[str, list]:
+    clauses, params = ["1 = 1"], []
+    if since:
+        clauses.append("v.detected_at >= ?")
+        params.append(since)
+    if until:
+        clauses.append("v.detected_at < ?")
+        params.append(until)
+    if max_id is not None:
+        # Pin the report to the rows counted in the summary
+        clauses.append("v.id <= ?")
+        params.append(max_id)
+    return " AND ".join(clauses), params
+
+
+def summarize(db_path: str, since: Optional[str] = None, until: Optional[str] = None) -> Dict:
+    with _connect(db_path) as conn:
+        where, params = _filters(since, until, None)
+        base = f"FROM violations v LEFT JOIN products p ON p.id = v.product_id WHERE {where}"
+        total, products, max_id = conn.execute(
+            f"SELECT COUNT(*), COUNT(DISTINCT v.product_id), MAX(v.id) {base}", params).fetchone()
+        where, params = _filters(since, until, max_id or 0)
+        base = f"FROM violations v LEFT JOIN products p ON p.id = v.product_id WHERE {where}"
+
+        def grouped(expr: str, order: str, limit: int = -1) -> List[Tuple[str, int]]:
+            rows = conn.execute(f"SELECT {expr} AS k, COUNT(*) AS n {base} GROUP BY k ORDER BY {order} LIMIT ?",
+                                (*params, limit)).fetchall()
+            return [(r["k"], r["n"]) for r in rows]
+
+        return {
+            "period": f"{since or '...'} to {until or '...'}" if since or until else None,
+            "total": total,
+            "products": products,
+            "max_id": max_id or 0,
+            "by_severity": grouped("COALESCE(v.severity, 'N/A')", "n DESC"),
+            "by_status": grouped("COALESCE(v.status, 'Open')", "n DESC"),
+            "top_issues": grouped("COALESCE(v.issue, 'N/A')", "n DESC", 10),
+            "categories": grouped(CATEGORY_SQL, "k"),
+        }
+
+
+def iter_violation_chunks(db_path: str, summary: Dict, since: Optional[str] = None, until: Optional[str] = None,
+                          chunk_size: int = BULK_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """Keyset-paginate violations joined with their product, in the summary's category order."""
+    where, params = _filters(since, until, summary["max_id"])
+    query = f'''
+        SELECT v.id AS violation_id, v.issue, v.severity, v.status, v.detected_at,
+               p.title, p.brand, p.seller, {CATEGORY_SQL} AS category, p.scanned_at, p.source_url,
+               p.mrp, p.net_qty, p.manufacturer, p.country_of_origin, p.consumer_care
+        FROM violations v LEFT JOIN products p ON p.id = v.product_id
+        WHERE {where} AND ({CATEGORY_SQL} > ? OR ({CATEGORY_SQL} = ? AND v.id > ?))
+        ORDER BY {CATEGORY_SQL}, v.id
+        LIMIT ?
+    '''
+    last_category, last_id = "", 0
+    while True:
+        with _connect(db_path) as conn:
+            rows = [dict(r) for r in conn.execute(query, (*params, last_category, last_category, last_id, chunk_size))]
+        if not rows:
+            return
+        yield rows
+        last_category, last_id = rows[-1]["category"], rows[-1]["violation_id"]
+
+
+def _render_chunk(args) -> bytes:
+    rows, first_page_no, generated_at = args
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    for offset, row in enumerate(rows):
+        draw_violation_page(c, row, first_page_no + offset, generated_at)
+        c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _render_summary(summary: Dict, toc: List[Tuple[str, int, int, int]], generated_at: datetime) -> bytes:
+    buffer = BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw_summary_page(c, summary, toc, generated_at)
+    c.showPage()
+    c.save()
+    return buffer.getvalue()
+
+
+def _pdf_text(text: str) -> bytes:
+    return b"<FEFF" + text.encode("utf-16-be").hex().upper().encode("ascii") + b">"
+
+
+class IncrementalPdfWriter:
+    """Copies pages of small PDFs into one PDF, emitting bytes as each page is added.
+
+    Only object offsets and page ids are kept, so memory does not grow with the
+    page content. Pages may use fonts and form/image XObjects without nested
+    indirect references, which is all ReportLab emits for these report pages.
+    """
+
+    CATALOG_ID, PAGES_ID = 1, 2
+
+    def __init__(self):
+        self._offsets: Dict[int, int] = {}
+        self._position = 0
+        self._next_id = 3
+        self._shared: Dict[bytes, int] = {}
+        self.page_ids: List[int] = []
+
+    def _emit(self, obj_id: int, body: bytes) -> bytes:
+        chunk = b"%d 0 obj\n" % obj_id + body + b"\nendobj\n"
+        self._offsets[obj_id] = self._position
+        self._position += len(chunk)
+        return chunk
+
+    def _alloc(self) -> int:
+        self._next_id += 1
+        return self._next_id - 1
+
+    def header(self) -> bytes:
+        chunk = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+        self._position += len(chunk)
+        return chunk
+
+    @staticmethod
+    def _serialize(obj) -> bytes:
+        out = BytesIO()
+        obj.write_to_stream(out)
+        return out.getvalue()
+
+    def _shared_resource(self, obj) -> Tuple[int, Optional[bytes]]:
+        """Id of an identical resource already written, or a new id plus the bytes to emit."""
+        resolved = obj.get_object()
+        if any(isinstance(v, IndirectObject) for v in resolved.values()):
+            raise ValueError("nested indirect references in page resources are not supported")
+        # Streams (images, forms) are written as-is with their original filters
+        data = self._serialize(resolved)
+        if data in self._shared:
+            return self._shared[data], None
+        obj_id = self._alloc()
+        self._shared[data] = obj_id
+        return obj_id, self._emit(obj_id, data)
+
+    def add_pdf(self, data: bytes) -> Iterator[bytes]:
+        for page in PdfReader(BytesIO(data)).pages:
+            resources = page.get("/Resources")
+            resources = resources.get_object() if resources is not None else {}
+            res_parts = []
+            for kind in ("/Font", "/XObject"):
+                entries = resources.get(kind)
+                if not entries:
+                    continue
+                refs = []
+                for name, ref in entries.get_object().items():
+                    obj_id, chunk = self._shared_resource(ref)
+                    if chunk:
+                        yield chunk
+                    refs.append(b"%s %d 0 R" % (self._serialize(NameObject(name)), obj_id))
+                res_parts.append(kind.encode() + b" << " + b" ".join(refs) + b" >>")
+            res_parts.append(b"/ProcSet [/PDF /Text /ImageB /ImageC /ImageI]")
+
+            contents = page.get_contents()
+            raw = zlib.compress(contents.get_data() if contents is not None else b"", 6)
+            content_id = self._alloc()
+            yield self._emit(content_id, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(raw)
+                             + raw + b"\nendstream")
+            box = " ".join(f"{float(v):g}" for v in page.mediabox).encode()
+            page_id = self._alloc()
+            self.page_ids.append(page_id)
+            yield self._emit(page_id, b"<< /Type /Page /Parent %d 0 R /MediaBox [%s] /Resources << %s >> "
+                                      b"/Contents %d 0 R >>" % (self.PAGES_ID, box, b" ".join(res_parts), content_id))
+
+    def finish(self, bookmarks: List[Tuple[str, int]] = ()) -> bytes:
+        """Write the page tree, bookmarks ((title, page_index)), catalog, xref and trailer."""
+        chunks = []
+        kids = b" ".join(b"%d 0 R" % i for i in self.page_ids)
+        chunks.append(self._emit(self.PAGES_ID, b"<< /Type /Pages /Kids [%s] /Count %d >>"
+                                 % (kids, len(self.page_ids))))
+        outlines = b""
+        marks = [(t, i) for t, i in bookmarks if 0 <= i < len(self.page_ids)]
+        if marks:
+            root_id = self._alloc()
+            ids = [self._alloc() for _ in marks]
+            for n, ((title, index), obj_id) in enumerate(zip(marks, ids)):
+                links = b""
+                if n > 0:
+                    links += b" /Prev %d 0 R" % ids[n - 1]
+                if n < len(ids) - 1:
+                    links += b" /Next %d 0 R" % ids[n + 1]
+                chunks.append(self._emit(obj_id, b"<< /Title %s /Parent %d 0 R%s /Dest [%d 0 R /Fit] >>"
+                                         % (_pdf_text(title), root_id, links, self.page_ids[index])))
+            chunks.append(self._emit(root_id, b"<< /Type /Outlines /First %d 0 R /Last %d 0 R /Count %d >>"
+                                     % (ids[0], ids[-1], len(ids))))
+            outlines = b" /Outlines %d 0 R /PageMode /UseOutlines" % root_id
+        chunks.append(self._emit(self.CATALOG_ID, b"<< /Type /Catalog /Pages %d 0 R%s >>" % (self.PAGES_ID, outlines)))
+
+        xref_at = self._position
+        size = self._next_id
+        xref = [b"xref\n0 %d\n" % size, b"0000000000 65535 f \n"]
+        for obj_id in range(1, size):
+            xref.append(b"%010d 00000 n \n" % self._offsets[obj_id])
+        xref.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+                    % (size, self.CATALOG_ID, xref_at))
+        return b"".join(chunks) + b"".join(xref)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """Process-wide spawn pool for chunk rendering, created on first use and reused by every report.
+
+    Spawned children re-import __main__; app.py starts no background services in them.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+@atexit.register
+def _shutdown_pool() -> None:
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+
+
+def stream_bulk_report(db_path: str = "compliance.db", since: Optional[str] = None, until: Optional[str] = None,
+                       chunk_size: int = BULK_CHUNK_SIZE, workers: int = BULK_WORKERS) -> Iterator[bytes]:
+    """Yield the consolidated report PDF piece by piece."""
+    generated_at = datetime.now()
+    summary = summarize(db_path, since, until)
+
+    # One page per violation after the summary page, in category order
+    toc, next_page = [], 2
+    for category, count in summary["categories"]:
+        toc.append((category, count, next_page, next_page + count - 1))
+        next_page += count
+
+    pdf = IncrementalPdfWriter()
+    yield pdf.header()
+    yield from pdf.add_pdf(_render_summary(summary, toc, generated_at))
+
+    def jobs():
+        page_no = 2
+        for rows in iter_violation_chunks(db_path, summary, since, until, chunk_size):
+            yield rows, page_no, generated_at
+            page_no += len(rows)
+
+    if workers <= 1:
+        for job in jobs():
+            yield from pdf.add_pdf(_render_chunk(job))
+    else:
+        pool = get_render_pool(workers)
+        # Keep a bounded window of chunks in flight and emit them in order
+        pending = deque()
+        try:
+            for job in jobs():
+                pending.append(pool.submit(_render_chunk, job))
+                if len(pending) >= workers * 2:
+                    yield from pdf.add_pdf(pending.popleft().result())
+            while pending:
+                yield from pdf.add_pdf(pending.popleft().result())
+        except BrokenProcessPool:
+            # A worker died; the next report starts a fresh pool
+            _discard_pool(pool)
+            raise
+        finally:
+            for future in pending:
+                future.cancel()
+
+    yield pdf.finish([("Summary", 0)] + [(category, first - 1) for category, _, first, _ in toc])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--db", default="compliance.db")
+    parser.add_argument("--month", help="YYYY-MM; default is every violation")
+    parser.add_argument("--chunk", type=int, default=BULK_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=BULK_WORKERS)
+    parser.add_argument("-o", "--output", default="violation_report_bulk.pdf")
+    args = parser.parse_args()
+
+    since, until = month_bounds(args.month) if args.month else (None, None)
+    started = datetime.now()
+    with open(args.output, "wb") as f:
+        for piece in stream_bulk_report(args.db, since, until, chunk_size=args.chunk, workers=args.workers):
+            f.write(piece)
+    print(f"Wrote {args.output} ({os.path.getsize(args.output) // 1024} KiB) in "
+          f"{(datetime.now() - started).total_seconds():.1f}s")
@@ -4,11 +4,27 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import Table, TableStyle
 from reportlab.lib import colors
 import os
+import hashlib
+import json
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from datetime import datetime
+from io import BytesIO
+from PIL import Image
 
-def generate_bw_report(product_results, compliance_table, compliance_score, uploaded_file, processed_file):
-    pdf_path = "static/violation_report_bw.pdf"
-    c = canvas.Canvas(pdf_path, pagesize=A4)
+log = logging.getLogger(__name__)
+
+REPORT_CACHE_SIZE = int(os.environ.get("REPORT_CACHE_SIZE", "32"))
+FILE_DIGEST_CACHE_SIZE = int(os.environ.get("FILE_DIGEST_CACHE_SIZE", "1024"))
+THUMBNAIL_DIR = os.environ.get("REPORT_THUMBNAIL_DIR", os.path.join("static", "thumbnails"))
+THUMBNAIL_DPI = 150
+IMAGE_BOX = (250, 180)  # points, as drawn on the page
+
+def _draw_frame(c, title, when):
+    """Page border and header shared by every report page."""
     width, height = A4
 
     # Border
@@ -19,9 +35,32 @@ def generate_bw_report(product_results, compliance_table, compliance_score, uplo
     # Header
     c.setFillColor(colors.black)
     c.setFont("Helvetica-Bold", 22)
-    c.drawString(40, height-45, "Violation Report")
+    c.drawString(40, height-45, title)
+    c.setFont("Helvetica", 11)
+    c.drawString(width-220, height-45, f"Date: {when.strftime('%d-%m-%Y')}  Time: {when.strftime('%H:%M:%S')}")
+
+def _draw_stamp(c):
+    width, height = A4
+    # Vigyantram stamp logo at the bottom (black/white)
+    stamp_w = 150
+    stamp_h = 25
+    stamp_x = width/2 - stamp_w/2
+    stamp_y = 25
+    c.setFillColor(colors.black)
+    c.roundRect(stamp_x, stamp_y, stamp_w, stamp_h, 20, fill=1, stroke=0)
+    c.setFillColor(colors.white)
+    c.setFont("Helvetica-Bold", 22)
+    c.drawCentredString(stamp_x + stamp_w/2, stamp_y + 32, "Vigyantram")
     c.setFont("Helvetica", 11)
-    c.drawString(width-220, height-45, f"Date: {datetime.now().strftime('%d-%m-%Y')}  Time: {datetime.now().strftime('%H:%M:%S')}")
+    c.drawCentredString(stamp_x + stamp_w/2, stamp_y + 14, "© Vigyantram Team")
+
+def generate_bw_report(product_results, compliance_table, compliance_score, uploaded_file, processed_file,
+                       output="static/violation_report_bw.pdf"):
+    """Draw the report onto output (a path or a binary file object) and return output."""
+    pdf_path = output
+    c = canvas.Canvas(pdf_path, pagesize=A4)
+    width, height = A4
+    _draw_frame(c, "Violation Report", datetime.now())
 
     # Images Section
     c.setFillColor(colors.black)
@@ -34,9 +73,9 @@ def generate_bw_report(product_results, compliance_table, compliance_score, uplo
     c.drawString(110, height-135, "Captured Image")
     c.drawString(390, height-135, "Processed Image")
     if os.path.exists(uploaded_file):
-        c.drawImage(uploaded_file, 40, height-320, width=250, height=180, preserveAspectRatio=True, mask='auto')
+        c.drawImage(report_thumbnail(uploaded_file), 40, height-320, width=250, height=180, preserveAspectRatio=True, mask='auto')
     if os.path.exists(processed_file):
-        c.drawImage(processed_file, 320, height-320, width=250, height=180, preserveAspectRatio=True, mask='auto')
+        c.drawImage(report_thumbnail(processed_file), 320, height-320, width=250, height=180, preserveAspectRatio=True, mask='auto')
 
     # Compliance Info Table
     info_label_y = height-420
@@ -70,18 +109,189 @@ def generate_bw_report(product_results, compliance_table, compliance_score, uplo
     c.setFont("Helvetica-Bold", 20)
     c.drawCentredString(score_box_x + score_box_w/2, score_box_y + score_box_h/2 - 18, "Compliance Score")
 
-    # Vigyantram stamp logo at the bottom (black/white)
-    stamp_w = 150
-    stamp_h = 25
-    stamp_x = width/2 - stamp_w/2
-    stamp_y = 25
-    c.setFillColor(colors.black)
-    c.roundRect(stamp_x, stamp_y, stamp_w, stamp_h, 20, fill=1, stroke=0)
-    c.setFillColor(colors.white)
-    c.setFont("Helvetica-Bold", 22)
-    c.drawCentredString(stamp_x + stamp_w/2, stamp_y + 32, "Vigyantram")
-    c.setFont("Helvetica", 11)
-    c.drawCentredString(stamp_x + stamp_w/2, stamp_y + 14, "© Vigyantram Team")
+    _draw_stamp(c)
 
     c.save()
     return pdf_path
+
+
+# -----------------------------
+# Bulk (multi-product) report pages
+# -----------------------------
+VIOLATION_PAGE_FIELDS = [
+    ('Product Name', 'title'),
+    ('Brand', 'brand'),
+    ('Seller', 'seller'),
+    ('Category', 'category'),
+    ('Manufacturer / Packer / Importer', 'manufacturer'),
+    ('Net Quantity', 'net_qty'),
+    ('MRP (₹)', 'mrp'),
+    ('Country of Origin', 'country_of_origin'),
+    ('Consumer Care Details', 'consumer_care'),
+    ('Scanned At', 'scanned_at'),
+    ('Source', 'source_url'),
+]
+
+def _bw_table(rows, col_widths):
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph
+    from xml.sax.saxutils import escape
+    body_style = getSampleStyleSheet()["BodyText"]
+    body_style.fontSize = 9
+    body_style.leading = 11
+    # Long OCR fields are clipped so one row can never push the table off the page
+    cells = [rows[0]] + [[str(v) if i == 0 else Paragraph(escape(str(v)[:600]), body_style)
+                          for i, v in enumerate(r)] for r in rows[1:]]
+    table = Table(cells, colWidths=col_widths)
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.white),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.black),
+        ('ALIGN',(0,0),(-1,-1),'LEFT'),
+        ('VALIGN',(0,0),(-1,-1),'TOP'),
+        ('GRID', (0,0), (-1,-1), 1, colors.black),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 9),
+        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.whitesmoke, colors.lightgrey]),
+    ]))
+    return table
+
+def _draw_table_at(c, table, y_top):
+    width, height = A4
+    _, table_h = table.wrapOn(c, width - 80, height)
+    table.drawOn(c, 40, y_top - table_h)
+    return y_top - table_h
+
+def draw_summary_page(c, summary, toc, generated_at):
+    """First page of a bulk report: aggregated counts and the page range of each category."""
+    width, height = A4
+    _draw_frame(c, "Consolidated Violation Report", generated_at)
+    c.setFont("Helvetica", 11)
+    period = summary.get("period") or "All time"
+    c.drawString(40, height-70, f"Period: {period}    Violations: {summary['total']}    Products: {summary['products']}")
+
+    counts = [['Breakdown', 'Count']] + [[f"Severity: {k}", v] for k, v in summary['by_severity']]
+    counts += [[f"Status: {k}", v] for k, v in summary['by_status']]
+    y = _draw_table_at(c, _bw_table(counts, [200, 70]), height-90)
+
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(40, y-25, "Most Frequent Issues:")
+    y = _draw_table_at(c, _bw_table([['Issue', 'Count']] + [[k, v] for k, v in summary['top_issues']], [430, 70]), y-35)
+
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(40, y-25, "Contents:")
+    rows = [['Category', 'Violations', 'Pages']] + [[cat, n, f"{first}-{last}"] for cat, n, first, last in toc]
+    _draw_table_at(c, _bw_table(rows, [250, 100, 150]), y-35)
+    _draw_stamp(c)
+
+def draw_violation_page(c, row, page_no, generated_at):
+    """One page per violation with the scanned product's label fields."""
+    width, height = A4
+    _draw_frame(c, "Violation Report", generated_at)
+    c.setFont("Helvetica", 11)
+    c.drawString(40, height-70, f"Violation #{row['violation_id']}    Detected: {row.get('detected_at') or '-'}    Page {page_no}")
+
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(40, height-100, "Violation:")
+    issue_rows = [['Issue', 'Severity', 'Status'],
+                  [row.get('issue') or 'N/A', row.get('severity') or 'N/A', row.get('status') or 'Open']]
+    y = _draw_table_at(c, _bw_table(issue_rows, [330, 85, 85]), height-110)
+
+    c.setFillColor(colors.black)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(40, y-25, "Product Information:")
+    info_rows = [['Field', 'Info']] + [[label, row.get(key) or 'Not Found'] for label, key in VIOLATION_PAGE_FIELDS]
+    _draw_table_at(c, _bw_table(info_rows, [180, 320]), y-35)
+    _draw_stamp(c)
+
+# -----------------------------
+# In-memory rendering with an LRU cache
+# -----------------------------
+_report_cache = OrderedDict()
+_report_cache_lock = threading.Lock()
+
+@lru_cache(maxsize=FILE_DIGEST_CACHE_SIZE)
+def _digest_of(path, mtime_ns, size):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _file_digest(path):
+    """sha1 of a file's bytes, memoised (LRU) on (path, mtime, size) so cache hits don't re-read images."""
+    try:
+        st = os.stat(path)
+        return _digest_of(path, st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def _is_bilevel(img):
+    if img.mode == "1":
+        return True
+    if img.mode not in ("L", "LA", "P"):
+        return False
+    histogram = img.convert("L").histogram()
+    return sum(1 for count in histogram if count) <= 2
+
+def report_thumbnail(path, box=IMAGE_BOX, dpi=THUMBNAIL_DPI, cache_dir=THUMBNAIL_DIR):
+    """Downsample an image to dpi at the printed box size, cached on disk by source hash.
+
+    Binarized images become 1-bit PNGs, everything else a JPEG. Returns the
+    thumbnail path, or the original path if it cannot be read.
+    """
+    digest = _file_digest(path)
+    if digest is None:
+        return path
+    max_px = (int(box[0] / 72 * dpi), int(box[1] / 72 * dpi))
+    stem = os.path.join(cache_dir, f"{digest}_{max_px[0]}x{max_px[1]}")
+    for ext in (".png", ".jpg"):
+        if os.path.exists(stem + ext):
+            return stem + ext
+    tmp = None
+    try:
+        with Image.open(path) as img:
+            img.load()
+            bilevel = _is_bilevel(img)
+            img.thumbnail(max_px, Image.LANCZOS if not bilevel else Image.NEAREST)
+            os.makedirs(cache_dir, exist_ok=True)
+            out = stem + (".png" if bilevel else ".jpg")
+            # Unique temp per render: concurrent requests for the same image each write their own file
+            fd, tmp = tempfile.mkstemp(dir=cache_dir, prefix=os.path.basename(stem) + ".", suffix=".tmp")
+            os.close(fd)
+            if bilevel:
+                img.convert("L").point(lambda v: 255 if v >= 128 else 0).convert("1").save(tmp, "PNG", optimize=True)
+            else:
+                img.convert("RGB").save(tmp, "JPEG", quality=80, optimize=True)
+            os.replace(tmp, out)
+            return out
+    except Exception as e:
+        log.warning("Thumbnail failed for %s: %s", path, e)
+        if tmp and os.path.exists(tmp):
+            os.remove(tmp)
+        return path
+
+def report_cache_key(product_results, compliance_table, compliance_score, uploaded_file, processed_file):
+    payload = json.dumps([product_results, compliance_table, compliance_score], sort_keys=True, default=str)
+    h = hashlib.sha256(payload.encode("utf-8"))
+    for path in (uploaded_file, processed_file):
+        h.update(("|%s" % _file_digest(path)).encode("utf-8"))
+    return h.hexdigest()
+
+def render_bw_report(product_results, compliance_table, compliance_score, uploaded_file, processed_file):
+    """Return the report PDF as bytes; identical results and images are served from the cache."""
+    key = report_cache_key(product_results, compliance_table, compliance_score, uploaded_file, processed_file)
+    with _report_cache_lock:
+        if key in _report_cache:
+            _report_cache.move_to_end(key)
+            return _report_cache[key]
+    buffer = BytesIO()
+    generate_bw_report(product_results, compliance_table, compliance_score, uploaded_file, processed_file,
+                       output=buffer)
+    pdf = buffer.getvalue()
+    with _report_cache_lock:
+        _report_cache[key] = pdf
+        while len(_report_cache) > REPORT_CACHE_SIZE:
+            _report_cache.popitem(last=False)
+    return pdf
@@ -0,0 +1,452 @@
+"""Camera registry and asyncio snapshot service for the inspection points.
+
+Cameras live in the cameras table (compliance.db); the default ESP32 is seeded
+from ESP32_SNAPSHOT_URL/ESP32_STREAM_URL and more can be added through the
+CAMERAS env var ("line1=http://10.0.0.5/capture,line2=...") or /cameras.
+
+One aiohttp session with a keep-alive connector runs on a dedicated event-loop
+thread. Snapshot bodies are streamed to disk in chunks. Each camera (or ad-hoc
+URL, up to ADHOC_CAMERA_LIMIT of them) has a circuit breaker: after a few
+consecutive failures it fails fast for a cool-down instead of blocking a
+worker for the full timeout, then lets one trial request through. Registry
+reads never run on the event loop. Cameras with a poll interval are captured
+concurrently in the background. Latency and error metrics are kept per camera.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import aiohttp
+
+from metrics import timed
+
+log = logging.getLogger(__name__)
+
+CAMERA_CONNECT_TIMEOUT = float(os.environ.get("CAMERA_CONNECT_TIMEOUT", "2"))
+CAMERA_READ_TIMEOUT = float(os.environ.get("CAMERA_READ_TIMEOUT", "5"))
+BREAKER_FAILURES = int(os.environ.get("CAMERA_BREAKER_FAILURES", "3"))
+BREAKER_COOLDOWN = float(os.environ.get("CAMERA_BREAKER_COOLDOWN", "30"))
+# Breakers/metrics kept for ad-hoc ?url= snapshots (least recently used dropped first)
+ADHOC_CAMERA_LIMIT = int(os.environ.get("ADHOC_CAMERA_LIMIT", "16"))
+# Shortest background poll interval /cameras accepts (0 still means "not polled")
+MIN_POLL_INTERVAL = float(os.environ.get("CAMERA_MIN_POLL_INTERVAL", "1"))
+
+
+class CameraError(Exception):
+    """A snapshot could not be taken."""
+
+
+class CameraBadResponse(CameraError):
+    """The camera answered, but with an error status or an empty body."""
+
+
+class CameraUnavailable(CameraError):
+    """The camera's circuit breaker is open; the request was not attempted."""
+
+
+class CameraTimeout(CameraError):
+    """The snapshot did not complete within the caller's deadline."""
+
+
+def extension_for(content_type: str) -> str:
+    return ".png" if "png" in (content_type or "") else ".jpg"
+
+
+class CircuitBreaker:
+    """closed -> open after `failures` consecutive errors; half-open after `cooldown` seconds."""
+
+    def __init__(self, failures: int = BREAKER_FAILURES, cooldown: float = BREAKER_COOLDOWN):
+        self.failures = failures
+        self.cooldown = cooldown
+        self.consecutive = 0
+        self.opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.consecutive = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.consecutive += 1
+        self._trial_in_flight = False
+        if self.consecutive >= self.failures or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """End a half-open trial that produced no verdict (cancelled), so the next call may try."""
+        self._trial_in_flight = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.cooldown - (time.monotonic() - self.opened_at)) if self.opened_at else 0.0
+
+
+class _CameraMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.successes = 0
+        self.failures = 0
+        self.fast_fails = 0
+        self.bytes = 0
+        self.latencies_ms = deque(maxlen=200)
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[str] = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+
+        def pct(p: float) -> Optional[float]:
+            return round(lat[min(len(lat) - 1, int(p * len(lat)))], 1) if lat else None
+
+        return {
+            "requests": self.requests,
+            "successes": self.successes,
+            "failures": self.failures,
+            "fast_fails": self.fast_fails,
+            "error_rate": round(self.failures / self.requests, 3) if self.requests else 0.0,
+            "bytes": self.bytes,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "last_error": self.last_error,
+            "last_success_at": self.last_success_at,
+        }
+
+
+class CameraService:
+    def __init__(self, db_path: str, poll_dir: str = "static/captures",
+                 connect_timeout: float = CAMERA_CONNECT_TIMEOUT, read_timeout: float = CAMERA_READ_TIMEOUT):
+        self.db_path = db_path
+        self.poll_dir = poll_dir
+        self.timeout = aiohttp.ClientTimeout(total=connect_timeout + read_timeout, connect=connect_timeout,
+                                             sock_read=read_timeout)
+        self.on_capture: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._metrics: Dict[str, _CameraMetrics] = {}
+        self._adhoc: "OrderedDict[str, None]" = OrderedDict()
+        self._adhoc_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_loop, name="camera-loop", daemon=True)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._started = False
+        self._start_lock = threading.Lock()
+        self._init_db()
+
+    # -- registry ----------------------------------------------------------
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS cameras (
+                    id TEXT PRIMARY KEY,
+                    snapshot_url TEXT NOT NULL,
+                    stream_url TEXT,
+                    poll_interval REAL NOT NULL DEFAULT 0,
+                    enabled INTEGER NOT NULL DEFAULT 1,
+                    created_at TEXT NOT NULL
+                )''')
+
+    def register(self, camera_id: str, snapshot_url: str, stream_url: Optional[str] = None,
+                 poll_interval: float = 0.0, enabled: bool = True, overwrite: bool = True) -> None:
+        verb = "INSERT OR REPLACE" if overwrite else "INSERT OR IGNORE"
+        with self._connect() as conn:
+            conn.execute(f'''{verb} INTO cameras (id, snapshot_url, stream_url, poll_interval, enabled, created_at)
+                             VALUES (?, ?, ?, ?, ?, ?)''',
+                         (camera_id, snapshot_url, stream_url, poll_interval, int(enabled), datetime.now().isoformat()))
+        if self._started:
+            self._loop.call_soon_threadsafe(self._sync_pollers, self._polled_cameras())
+        elif enabled and poll_interval > 0:
+            self.start()
+
+    def cameras(self) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute("SELECT * FROM cameras ORDER BY id")]
+
+    def camera(self, camera_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM cameras WHERE id = ?", (camera_id,)).fetchone()
+        return dict(row) if row else None
+
+    def _polled_cameras(self) -> Dict[str, Dict[str, Any]]:
+        return {c["id"]: c for c in self.cameras() if c["enabled"] and c["poll_interval"] > 0}
+
+    def _resolve(self, camera: Optional[str], url: Optional[str]) -> Tuple[str, str]:
+        """(breaker/metrics key, snapshot URL) for a registered camera id or an ad-hoc URL."""
+        if url:
+            self._track_adhoc(url)
+            return url, url
+        cam = self.camera(camera or "esp32")
+        if not cam:
+            raise CameraError(f"unknown camera {camera!r}")
+        return cam["id"], cam["snapshot_url"]
+
+    def _track_adhoc(self, url: str) -> None:
+        """Keep state for at most ADHOC_CAMERA_LIMIT ad-hoc URLs; the oldest are forgotten."""
+        with self._adhoc_lock:
+            self._adhoc[url] = None
+            self._adhoc.move_to_end(url)
+            while len(self._adhoc) > ADHOC_CAMERA_LIMIT:
+                stale, _ = self._adhoc.popitem(last=False)
+                self._breakers.pop(stale, None)
+                self._metrics.pop(stale, None)
+
+    def metrics_label(self, key: str) -> str:
+        """Camera label for Prometheus: ad-hoc URLs share one label to keep cardinality fixed."""
+        return "adhoc" if key in self._adhoc else key
+
+    # -- loop thread -------------------------------------------------------
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    def start(self) -> "CameraService":
+        with self._start_lock:
+            if not self._started:
+                self._thread.start()
+                self._started = True
+                self._loop.call_soon_threadsafe(self._sync_pollers, self._polled_cameras())
+        return self
+
+    def _run(self, coro, timeout: float) -> Any:
+        self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise CameraTimeout(f"camera did not respond within {timeout:g}s") from None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=256, limit_per_host=4, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout,
+                                                  headers={"User-Agent": "Mozilla/5.0"})
+        return self._session
+
+    # -- capture -----------------------------------------------------------
+    async def _fetch(self, key: str, url: str, dest_path: Optional[str] = None) -> Dict[str, Any]:
+        breaker = self._breakers.setdefault(key, CircuitBreaker())
+        metrics = self._metrics.setdefault(key, _CameraMetrics())
+        if not breaker.allow():
+            metrics.fast_fails += 1
+            raise CameraUnavailable(f"camera {key} is unavailable; retrying in {breaker.retry_in():.0f}s")
+        metrics.requests += 1
+        started = time.perf_counter()
+        try:
+            session = await self._get_session()
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    raise CameraBadResponse(f"camera returned status {resp.status}")
+                content_type = resp.headers.get("Content-Type", "")
+                size = 0
+                body = None
+                if dest_path:
+                    path = os.path.splitext(dest_path)[0] + extension_for(content_type)
+                    tmp = path + ".part"
+                    try:
+                        with open(tmp, "wb") as f:
+                            async for chunk in resp.content.iter_chunked(64 * 1024):
+                                f.write(chunk)
+                                size += len(chunk)
+                        if size:
+                            os.replace(tmp, path)
+                    finally:
+                        # Empty, failed or cancelled downloads leave no .part behind
+                        if os.path.exists(tmp):
+                            os.remove(tmp)
+                else:
+                    path = None
+                    body = await resp.read()
+                    size = len(body)
+                if not size:
+                    raise CameraBadResponse("empty response from camera")
+        except CameraError as e:
+            breaker.record_failure()
+            metrics.failures += 1
+            metrics.last_error = str(e)
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+            breaker.record_failure()
+            metrics.failures += 1
+            metrics.last_error = str(e) or e.__class__.__name__
+            raise CameraError(f"camera request failed: {metrics.last_error}") from e
+        finally:
+            # Cancelled or unexpected errors: no verdict, but don't leave a half-open trial stuck
+            breaker.release()
+        breaker.record_success()
+        metrics.successes += 1
+        metrics.bytes += size
+        metrics.latencies_ms.append((time.perf_counter() - started) * 1000)
+        metrics.last_success_at = datetime.now().isoformat()
+        return {"camera": key, "path": path, "content": body, "content_type": content_type, "bytes": size}
+
+    def capture(self, dest_dir: str, prefix: str = "esp32", camera: Optional[str] = None,
+                url: Optional[str] = None) -> Dict[str, Any]:
+        """Stream one snapshot to dest_dir/<prefix>_<timestamp>.<ext>; raises CameraError."""
+        key, snapshot_url = self._resolve(camera, url)
+        stamp = datetime.now().strftime('%Y%m%d_%H%M%S_%f')
+        dest = os.path.join(dest_dir, f"{prefix}_{stamp}" if prefix else stamp)
+        with timed("camera_fetch", camera=self.metrics_label(key)):
+            result = self._run(self._fetch(key, snapshot_url, dest), self.timeout.total + 1)
+        result["filename"] = os.path.basename(result["path"])
+        return result
+
+    def fetch_burst(self, count: int, camera: Optional[str] = None, url: Optional[str] = None) -> List[Dict[str, Any]]:
+        """count snapshots in memory, back to back over the same keep-alive connection."""
+        key, snapshot_url = self._resolve(camera, url)
+
+        async def burst():
+            return [await self._fetch(key, snapshot_url) for _ in range(count)]
+
+        with timed("camera_burst", camera=self.metrics_label(key)):
+            return self._run(burst(), count * (self.timeout.total + 1))
+
+    def capture_many(self, dest_dir: str, camera_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """Snapshot several cameras concurrently; returns {camera_id: result or {"error": ...}}."""
+        ids = camera_ids or [c["id"] for c in self.cameras() if c["enabled"]]
+        # Registry lookups happen here, not on the event loop
+        resolved = {}
+        for camera_id in ids:
+            try:
+                resolved[camera_id] = self._resolve(camera_id, None)
+            except CameraError as e:
+                resolved[camera_id] = e
+
+        async def one(camera_id):
+            try:
+                if isinstance(resolved[camera_id], CameraError):
+                    raise resolved[camera_id]
+                key, url = resolved[camera_id]
+                dest = os.path.join(dest_dir, f"{camera_id}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+                result = await self._fetch(key, url, dest)
+                result["filename"] = os.path.basename(result["path"])
+                return camera_id, result
+            except CameraError as e:
+                return camera_id, {"camera": camera_id, "error": str(e)}
+
+        async def run_all():
+            return dict(await asyncio.gather(*(one(i) for i in ids)))
+
+        with timed("camera_fetch_many"):
+            return self._run(run_all(), self.timeout.total + 5)
+
+    # -- background polling --------------------------------------------------
+    def _sync_pollers(self, wanted: Dict[str, Dict[str, Any]]) -> None:
+        """Start/stop poll tasks to match _polled_cameras() (runs on the loop thread)."""
+        for camera_id in list(self._pollers):
+            if camera_id not in wanted:
+                self._pollers.pop(camera_id).cancel()
+        for camera_id, cam in wanted.items():
+            if camera_id not in self._pollers:
+                self._pollers[camera_id] = self._loop.create_task(self._poll(camera_id))
+
+    async def _poll(self, camera_id: str) -> None:
+        while True:
+            cam = await self._loop.run_in_executor(None, self.camera, camera_id)
+            if not cam or not cam["enabled"] or cam["poll_interval"] <= 0:
+                self._pollers.pop(camera_id, None)
+                return
+            try:
+                dest = os.path.join(self.poll_dir, f"{camera_id}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}")
+                with timed("camera_poll", camera=camera_id):
+                    result = await self._fetch(camera_id, cam["snapshot_url"], dest)
+                if self.on_capture:
+                    await self._loop.run_in_executor(None, self.on_capture, camera_id, result)
+            except CameraError:
+                pass
+            except Exception as e:
+                log.warning("Camera poll %s failed: %s", camera_id, e)
+            await asyncio.sleep(cam["poll_interval"])
+
+    # -- metrics / shutdown --------------------------------------------------
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        out = {}
+        registered = [c["id"] for c in self.cameras()]
+        keys = registered + [k for k in list(self._metrics) if k not in registered]
+        for key in keys:
+            m = self._metrics.get(key, _CameraMetrics()).snapshot()
+            m["breaker"] = self._breakers[key].state if key in self._breakers else "closed"
+            m["polling"] = key in self._pollers
+            out[key] = m
+        return out
+
+    async def _close(self) -> None:
+        for task in self._pollers.values():
+            task.cancel()
+        self._pollers.clear()
+        if self._session is not None:
+            await self._session.close()
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        if not self._started:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), self._loop).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)
+        self._started = False
+
+
+def _parse_cameras(spec: str) -> Dict[str, str]:
+    cams = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            name, url = part.split("=", 1)
+            cams[name.strip()] = url.strip()
+    return cams
+
+
+_service: Optional[CameraService] = None
+_service_lock = threading.Lock()
+
+
+def get_camera_service(db_path: str = "compliance.db", poll_dir: str = "static/captures") -> CameraService:
+    """Process-wide camera service; seeds the default ESP32 and any CAMERAS entries."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = CameraService(db_path, poll_dir)
+            _service.register("esp32", os.environ.get("ESP32_SNAPSHOT_URL", "http://10.219.158.90/capture"),
+                              os.environ.get("ESP32_STREAM_URL", "http://192.168.0.123:81/stream"),
+                              overwrite="ESP32_SNAPSHOT_URL" in os.environ)
+            for name, url in _parse_cameras(os.environ.get("CAMERAS", "")).items():
+                _service.register(name, url, overwrite=False)
+            if any(c["enabled"] and c["poll_interval"] > 0 for c in _service.cameras()):
+                _service.start()
+            atexit.register(_service.shutdown)
+        return _service
@@ -0,0 +1,291 @@
+"""Write-behind capture log: requests enqueue records, one writer thread persists them.
+
+Logging a capture costs a put_nowait() on a bounded in-process queue. A single
+writer thread drains the queue in batches and writes each batch with one
+open/write/fsync (CSV sink) or one transaction (SQLite sink), every
+CAPTURE_LOG_FLUSH_S seconds or as soon as CAPTURE_LOG_BATCH records are
+waiting. Because there is only one writer, rows can no longer interleave.
+
+Loss is bounded: a hard crash loses at most the records enqueued since the
+last flush (CAPTURE_LOG_FLUSH_S seconds' worth, never more than
+CAPTURE_LOG_QUEUE records). When the queue is full new records are counted as
+dropped instead of blocking the request. close() (registered with atexit)
+flushes everything still queued.
+
+Streams map to the existing CSV files so readers keep working:
+    img              -> img.csv
+    captures         -> data/captures.csv
+    extracted_texts  -> data/extracted_texts.csv
+CSV files rotate to <name>.1 ... <name>.N once they exceed
+CAPTURE_LOG_MAX_BYTES. With CAPTURE_LOG_SINK=sqlite records go to the
+capture_log table instead; `python capture_log.py export img out.csv` dumps a
+stream back to CSV.
+"""
+import atexit
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+CAPTURE_LOG_SINK = os.environ.get("CAPTURE_LOG_SINK", "csv")
+CAPTURE_LOG_DB = os.environ.get("CAPTURE_LOG_DB", "compliance.db")
+CAPTURE_LOG_FLUSH_S = float(os.environ.get("CAPTURE_LOG_FLUSH_S", "1.0"))
+CAPTURE_LOG_BATCH = int(os.environ.get("CAPTURE_LOG_BATCH", "500"))
+CAPTURE_LOG_QUEUE = int(os.environ.get("CAPTURE_LOG_QUEUE", "10000"))
+CAPTURE_LOG_MAX_BYTES = int(os.environ.get("CAPTURE_LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_LOG_BACKUPS = int(os.environ.get("CAPTURE_LOG_BACKUPS", "5"))
+
+STREAMS = {
+    "img": "img.csv",
+    "captures": "data/captures.csv",
+    "extracted_texts": "data/extracted_texts.csv",
+}
+
+
+class CsvSink:
+    """Append-only CSV files per stream, size-rotated, fsynced once per batch."""
+
+    def __init__(self, paths: Dict[str, str] = None, max_bytes: int = CAPTURE_LOG_MAX_BYTES,
+                 backups: int = CAPTURE_LOG_BACKUPS):
+        self.paths = dict(paths or STREAMS)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self._headers: Dict[str, List[str]] = {}
+
+    def _path(self, stream: str) -> str:
+        return self.paths.setdefault(stream, os.path.join("data", f"{stream}.csv"))
+
+    def _rotate(self, path: str) -> None:
+        for i in range(self.backups - 1, 0, -1):
+            if os.path.exists(f"{path}.{i}"):
+                os.replace(f"{path}.{i}", f"{path}.{i + 1}")
+        os.replace(path, f"{path}.1")
+
+    def _header(self, path: str, stream: str, first: Dict) -> List[str]:
+        if stream not in self._headers:
+            header = None
+            if os.path.exists(path) and os.path.getsize(path):
+                with open(path, newline="", encoding="utf-8") as f:
+                    header = next(csv.reader(f), None)
+            self._headers[stream] = header or list(first)
+        return self._headers[stream]
+
+    def write(self, stream: str, records: List[Tuple[str, Dict]]) -> None:
+        path = self._path(stream)
+        if os.path.exists(path) and self.max_bytes and os.path.getsize(path) >= self.max_bytes:
+            self._rotate(path)
+            self._headers.pop(stream, None)
+        header = self._header(path, stream, records[0][1])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if not os.path.exists(path) or not os.path.getsize(path):
+            writer.writerow(header)
+        for _, record in records:
+            writer.writerow(["" if record.get(k) is None else record.get(k) for k in header])
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", newline="", encoding="utf-8") as f:
+            f.write(buffer.getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class SqliteSink:
+    """All streams in one capture_log table; one transaction per batch."""
+
+    def __init__(self, db_path: str = CAPTURE_LOG_DB):
+        self.db_path = db_path
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        # Created lazily so the connection belongs to the writer thread
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS capture_log (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    stream TEXT NOT NULL,
+                    logged_at TEXT NOT NULL,
+                    record TEXT NOT NULL
+                )''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_capture_log_stream ON capture_log(stream, id)")
+        return self._conn
+
+    def write(self, stream: str, records: List[Tuple[str, Dict]]) -> None:
+        conn = self._connect()
+        with conn:
+            conn.executemany("INSERT INTO capture_log (stream, logged_at, record) VALUES (?, ?, ?)",
+                             [(stream, logged_at, json.dumps(r, default=str)) for logged_at, r in records])
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+class CaptureLog:
+    def __init__(self, sink=None, flush_interval: float = CAPTURE_LOG_FLUSH_S,
+                 batch_size: int = CAPTURE_LOG_BATCH, max_queue: int = CAPTURE_LOG_QUEUE):
+        self.sink = sink or CsvSink()
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self.last_error: Optional[str] = None
+        self.last_flush_at: Optional[str] = None
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="capture-log", daemon=True)
+        self._thread.start()
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    def log(self, stream: str, record: Dict) -> bool:
+        """Enqueue one record; False if it was dropped because the queue is full or the log is closed."""
+        if self._closed:
+            self._count("dropped")
+            return False
+        try:
+            self._queue.put_nowait((stream, datetime.now().isoformat(), record))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Block until everything enqueued so far has been written."""
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _writer(self) -> None:
+        pending: List = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, threading.Event):
+                # flush() marker: everything queued before it is in `pending` now
+                self._write(pending)
+                pending = []
+                deadline = time.monotonic() + self.flush_interval
+                if self._closed and self._queue.empty():
+                    if hasattr(self.sink, "close"):
+                        self.sink.close()
+                    item.set()
+                    return
+                item.set()
+                continue
+            if item is not None:
+                pending.append(item)
+                if len(pending) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            self._write(pending)
+            pending = []
+            deadline = time.monotonic() + self.flush_interval
+
+    def _write(self, pending: List) -> None:
+        if not pending:
+            return
+        by_stream: Dict[str, List[Tuple[str, Dict]]] = {}
+        for stream, logged_at, record in pending:
+            by_stream.setdefault(stream, []).append((logged_at, record))
+        for stream, records in by_stream.items():
+            try:
+                self.sink.write(stream, records)
+                self._count("written", len(records))
+            except Exception as e:
+                self.last_error = f"{stream}: {e}"
+                self._count("errors")
+                log.warning("Capture log write failed for %s: %s", stream, e)
+        self._count("batches")
+        self.last_flush_at = datetime.now().isoformat()
+
+    def close(self, timeout: float = 10.0) -> None:
+        """Flush whatever is queued and stop the writer; later log() calls are dropped."""
+        if self._closed:
+            return
+        self._closed = True
+        self.flush(timeout)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            "queued": self._queue.qsize(),
+            "sink": type(self.sink).__name__,
+            "flush_interval_s": self.flush_interval,
+            "last_flush_at": self.last_flush_at,
+            "last_error": self.last_error,
+        })
+        return stats
+
+
+def export_csv(db_path: str, stream: str, out) -> int:
+    """Write a SQLite-sink stream back out as CSV (header from the first record); returns the row count."""
+    conn = sqlite3.connect(db_path)
+    try:
+        writer, header, count = csv.writer(out), None, 0
+        for (record,) in conn.execute("SELECT record FROM capture_log WHERE stream = ? ORDER BY id", (stream,)):
+            record = json.loads(record)
+            if header is None:
+                header = list(record)
+                writer.writerow(header)
+            writer.writerow(["" if record.get(k) is None else record.get(k) for k in header])
+            count += 1
+        return count
+    finally:
+        conn.close()
+
+
+_capture_log: Optional[CaptureLog] = None
+_capture_log_lock = threading.Lock()
+
+
+def get_capture_log() -> CaptureLog:
+    """Process-wide capture log using the CAPTURE_LOG_* settings; flushed at interpreter exit."""
+    global _capture_log
+    with _capture_log_lock:
+        if _capture_log is None:
+            sink = SqliteSink(CAPTURE_LOG_DB) if CAPTURE_LOG_SINK == "sqlite" else CsvSink()
+            _capture_log = CaptureLog(sink)
+            atexit.register(_capture_log.close)
+        return _capture_log
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Capture log utilities.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="dump a SQLite-sink stream to CSV")
+    export.add_argument("stream", choices=sorted(STREAMS))
+    export.add_argument("output", nargs="?", help="output CSV (default stdout)")
+    export.add_argument("--db", default=CAPTURE_LOG_DB)
+    args = parser.parse_args()
+
+    if args.output:
+        with open(args.output, "w", newline="", encoding="utf-8") as f:
+            n = export_csv(args.db, args.stream, f)
+    else:
+        n = export_csv(args.db, args.stream, sys.stdout)
+    print(f"Exported {n} {args.stream} records", file=sys.stderr)
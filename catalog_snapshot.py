@@ -0,0 +1,392 @@
+"""Prebuilt, memory-mapped snapshot of the product catalog CSVs.
+
+`python catalog_snapshot.py build` compiles data/laptop.csv, mobile.csv and
+protein.csv into data/catalog_snapshot/<build_id>/:
+
+    manifest.json            format version, source sizes/mtimes, columns and row counts
+    <cat>.cells.bin          every cell as UTF-8, row-major
+    <cat>.cells.npy          int64 offsets into cells.bin (rows * columns + 1)
+    <cat>.search.bin         normalized name and name+details per row (the fuzzy-match keys)
+    <cat>.search.npy         int64 offsets into search.bin (rows * 2 + 1)
+
+The offsets are standard .npy files but are read without NumPy: the header is
+skipped and the data cast straight out of a read-only mmap, so loading a
+snapshot costs a few syscalls, rows are decoded only when touched, and the
+page cache is shared by every worker process. data/catalog_snapshot/CURRENT
+names the active build and is swapped atomically, so a rebuild never disturbs
+workers that have the previous one mapped.
+
+load_catalog() uses the snapshot when its manifest matches the CSVs on disk
+(size and mtime) and otherwise falls back to parsing the CSVs.
+"""
+import ast
+import csv
+import json
+import logging
+import mmap
+import os
+import re
+import shutil
+import struct
+import sys
+import threading
+from collections.abc import Mapping, Sequence
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = 1
+SNAPSHOT_DIR = os.environ.get("CATALOG_SNAPSHOT_DIR", "data/catalog_snapshot")
+CATALOG_SOURCES = {
+    "laptop": "data/laptop.csv",
+    "mobile": "data/mobile.csv",
+    "protein": "data/protein.csv",
+}
+KEEP_BUILDS = 2
+
+
+def normalize_text(value):
+    if not value:
+        return ""
+    value = value.lower()
+    value = re.sub(r"[^a-z0-9\s]", " ", value)
+    value = re.sub(r"\s+", " ", value).strip()
+    return value
+
+
+def search_keys(product) -> Tuple[str, str]:
+    """(normalized name, normalized name + details) as used by the OCR fuzzy matcher."""
+    name = normalize_text(product.get('name') or product.get('Product Name') or "")
+    details = normalize_text(product.get('details') or product.get('Details') or "")
+    return name, (name + " " + details).strip()
+
+
+class CsvTable(list):
+    """Rows parsed from a CSV, with the same search_keys interface as a snapshot table."""
+
+    def __init__(self, rows):
+        super().__init__(rows)
+        self._keys = None
+
+    @property
+    def search_keys(self) -> List[Tuple[str, str]]:
+        if self._keys is None:
+            self._keys = [search_keys(p) for p in self]
+        return self._keys
+
+
+def _source_stamp(path: str) -> Dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def _read_csv(path: str) -> Tuple[List[str], List[Dict]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        rows = list(reader)
+        return list(reader.fieldnames or []), rows
+
+
+# -----------------------------
+# .npy offsets without NumPy
+# -----------------------------
+def _write_npy_int64(path: str, values: List[int]) -> None:
+    header = "{'descr': '<i8', 'fortran_order': False, 'shape': (%d,), }" % len(values)
+    # Pad so magic + version + length + header is a multiple of 64, ending in a newline
+    pad = 64 - (10 + len(header) + 1) % 64
+    header = (header + " " * (pad % 64) + "\n").encode("latin1")
+    with open(path, "wb") as f:
+        f.write(b"\x93NUMPY\x01\x00" + struct.pack("<H", len(header)) + header)
+        f.write(struct.pack(f"<{len(values)}q", *values))
+
+
+def _map_npy_int64(path: str) -> Tuple[mmap.mmap, memoryview]:
+    f = open(path, "rb")
+    try:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        f.close()
+    if mm[:6] != b"\x93NUMPY" or mm[6] != 1:
+        raise ValueError(f"{path}: not a version 1 .npy file")
+    header_len = struct.unpack("<H", mm[8:10])[0]
+    header = ast.literal_eval(mm[10:10 + header_len].decode("latin1"))
+    if header["descr"] != "<i8" or sys.byteorder != "little":
+        raise ValueError(f"{path}: expected little-endian int64 offsets")
+    return mm, memoryview(mm)[10 + header_len:].cast("q")
+
+
+def _pack_strings(strings, bin_path: str, npy_path: str) -> None:
+    offsets = [0]
+    with open(bin_path, "wb") as f:
+        for s in strings:
+            data = (s or "").encode("utf-8")
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    _write_npy_int64(npy_path, offsets)
+
+
+class _StringColumn:
+    """Read-only view of strings packed by _pack_strings."""
+
+    def __init__(self, bin_path: str, npy_path: str):
+        self._offsets_mm, self.offsets = _map_npy_int64(npy_path)
+        if os.path.getsize(bin_path):
+            with open(bin_path, "rb") as f:
+                self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self._data = b""
+
+    def __getitem__(self, i: int) -> str:
+        return self._data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+
+# -----------------------------
+# Snapshot tables
+# -----------------------------
+class SnapshotRow(Mapping):
+    """One product, decoded cell by cell on access; behaves like the csv.DictReader dict."""
+
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "SnapshotTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, key):
+        col = self._table.column_index[key]
+        return self._table.cells[self._index * self._table.width + col]
+
+    def __iter__(self):
+        return iter(self._table.columns)
+
+    def __len__(self):
+        return self._table.width
+
+    def __repr__(self):
+        return f"SnapshotRow({dict(self)!r})"
+
+
+class SnapshotTable(Sequence):
+    def __init__(self, snapshot_dir: str, name: str, columns: List[str], rows: int):
+        self.name = name
+        self.columns = columns
+        self.column_index = {c: i for i, c in enumerate(columns)}
+        self.width = len(columns)
+        self.rows = rows
+        self.cells = _StringColumn(os.path.join(snapshot_dir, f"{name}.cells.bin"),
+                                   os.path.join(snapshot_dir, f"{name}.cells.npy"))
+        self._search = _StringColumn(os.path.join(snapshot_dir, f"{name}.search.bin"),
+                                     os.path.join(snapshot_dir, f"{name}.search.npy"))
+        if len(self.cells.offsets) != rows * self.width + 1 or len(self._search.offsets) != rows * 2 + 1:
+            raise ValueError(f"snapshot table {name} is truncated")
+        self.search_keys = _SearchKeys(self._search, rows)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [SnapshotRow(self, i) for i in range(*index.indices(self.rows))]
+        if index < 0:
+            index += self.rows
+        if not 0 <= index < self.rows:
+            raise IndexError(index)
+        return SnapshotRow(self, index)
+
+
+class _SearchKeys(Sequence):
+    def __init__(self, column: _StringColumn, rows: int):
+        self._column = column
+        self._rows = rows
+
+    def __len__(self):
+        return self._rows
+
+    def __getitem__(self, i):
+        return self._column[2 * i], self._column[2 * i + 1]
+
+
+class _ChainedTable(Sequence):
+    """The 'all' view over several tables without copying rows."""
+
+    def __init__(self, tables):
+        self._tables = tables
+        self._starts = []
+        total = 0
+        for t in tables:
+            self._starts.append(total)
+            total += len(t)
+        self._len = total
+        self.search_keys = _ChainedKeys(self)
+
+    def _locate(self, index: int):
+        for start, table in zip(reversed(self._starts), reversed(self._tables)):
+            if index >= start:
+                return table, index - start
+        raise IndexError(index)
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._len))]
+        if index < 0:
+            index += self._len
+        if not 0 <= index < self._len:
+            raise IndexError(index)
+        table, i = self._locate(index)
+        return table[i]
+
+    def __iter__(self):
+        for table in self._tables:
+            yield from table
+
+
+class _ChainedKeys(Sequence):
+    def __init__(self, chained: _ChainedTable):
+        self._chained = chained
+
+    def __len__(self):
+        return len(self._chained)
+
+    def __getitem__(self, index):
+        table, i = self._chained._locate(index)
+        return table.search_keys[i]
+
+
+# -----------------------------
+# Build / load
+# -----------------------------
+def build_snapshot(snapshot_dir: str = SNAPSHOT_DIR, sources: Optional[Dict[str, str]] = None) -> str:
+    """Compile the catalog CSVs into a new snapshot build and make it current; returns its path."""
+    sources = sources or CATALOG_SOURCES
+    build_id = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+    build_dir = os.path.join(snapshot_dir, build_id)
+    os.makedirs(build_dir)
+    manifest = {"format": SNAPSHOT_FORMAT, "build_id": build_id, "built_at": datetime.now().isoformat(),
+                "sources": {}, "tables": {}}
+    for name, path in sources.items():
+        stamp = _source_stamp(path)
+        columns, rows = _read_csv(path)
+        cells = (row.get(col) for row in rows for col in columns)
+        _pack_strings(cells, os.path.join(build_dir, f"{name}.cells.bin"), os.path.join(build_dir, f"{name}.cells.npy"))
+        keys = (k for row in rows for k in search_keys(row))
+        _pack_strings(keys, os.path.join(build_dir, f"{name}.search.bin"), os.path.join(build_dir, f"{name}.search.npy"))
+        if _source_stamp(path) != stamp:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            raise RuntimeError(f"{path} changed while building the snapshot; try again")
+        manifest["sources"][name] = dict(stamp, path=path)
+        manifest["tables"][name] = {"columns": columns, "rows": len(rows)}
+    with open(os.path.join(build_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    current_tmp = os.path.join(snapshot_dir, f"CURRENT.{os.getpid()}")
+    with open(current_tmp, "w") as f:
+        f.write(build_id)
+    os.replace(current_tmp, os.path.join(snapshot_dir, "CURRENT"))
+
+    # Old builds stay valid for workers that still have them mapped; unlinking is safe on POSIX
+    builds = sorted(d for d in os.listdir(snapshot_dir) if os.path.isdir(os.path.join(snapshot_dir, d)))
+    for old in builds[:-KEEP_BUILDS]:
+        shutil.rmtree(os.path.join(snapshot_dir, old), ignore_errors=True)
+    return build_dir
+
+
+def snapshot_status(snapshot_dir: str = SNAPSHOT_DIR, sources: Optional[Dict[str, str]] = None) -> Tuple[Optional[str], Optional[Dict], str]:
+    """(build dir, manifest, reason) where reason is "fresh" or why the snapshot cannot be used."""
+    sources = sources or CATALOG_SOURCES
+    try:
+        with open(os.path.join(snapshot_dir, "CURRENT")) as f:
+            build_dir = os.path.join(snapshot_dir, f.read().strip())
+        with open(os.path.join(build_dir, "manifest.json"), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None, None, "missing"
+    if manifest.get("format") != SNAPSHOT_FORMAT:
+        return build_dir, manifest, "format changed"
+    if set(manifest["sources"]) != set(sources):
+        return build_dir, manifest, "sources changed"
+    for name, path in sources.items():
+        try:
+            stamp = _source_stamp(path)
+        except OSError:
+            return build_dir, manifest, f"{path} missing"
+        recorded = manifest["sources"][name]
+        if (recorded["size"], recorded["mtime_ns"]) != (stamp["size"], stamp["mtime_ns"]):
+            return build_dir, manifest, f"{path} modified since the snapshot was built"
+    return build_dir, manifest, "fresh"
+
+
+def _load_csv_catalog(sources: Dict[str, str]) -> Dict[str, Sequence]:
+    catalog = {}
+    for name, path in sources.items():
+        try:
+            catalog[name] = CsvTable(_read_csv(path)[1])
+        except FileNotFoundError:
+            log.warning("CSV file %s not found", path)
+            catalog[name] = CsvTable([])
+        except Exception as e:
+            log.error("Error loading CSV file %s: %s", path, e)
+            catalog[name] = CsvTable([])
+    catalog["all"] = CsvTable(row for name in sources for row in catalog[name])
+    return catalog
+
+
+_loaded_from = None
+_load_lock = threading.Lock()
+
+
+def load_catalog(snapshot_dir: str = SNAPSHOT_DIR, sources: Optional[Dict[str, str]] = None) -> Dict[str, Sequence]:
+    """{'laptop', 'mobile', 'protein', 'all'} tables from a fresh snapshot, else from the CSVs."""
+    global _loaded_from
+    sources = sources or CATALOG_SOURCES
+    build_dir, manifest, reason = snapshot_status(snapshot_dir, sources)
+    if reason == "fresh":
+        try:
+            catalog = {name: SnapshotTable(build_dir, name, manifest["tables"][name]["columns"],
+                                           manifest["tables"][name]["rows"])
+                       for name in sources}
+            catalog["all"] = _ChainedTable([catalog[name] for name in sources])
+            with _load_lock:
+                _loaded_from = f"snapshot {manifest['build_id']}"
+            return catalog
+        except (OSError, ValueError, KeyError) as e:
+            reason = f"unreadable: {e}"
+    log.info("Catalog snapshot not used (%s); parsing CSVs", reason)
+    with _load_lock:
+        _loaded_from = f"csv ({reason})"
+    return _load_csv_catalog(sources)
+
+
+def loaded_from() -> Optional[str]:
+    return _loaded_from
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped catalog snapshot.")
+    parser.add_argument("command", choices=["build", "status", "bench"])
+    parser.add_argument("--dir", default=SNAPSHOT_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        path = build_snapshot(args.dir)
+        print(f"Catalog snapshot built: {path}")
+    elif args.command == "status":
+        build_dir, manifest, reason = snapshot_status(args.dir)
+        print(json.dumps({"build_dir": build_dir, "status": reason,
+                          "tables": {k: v["rows"] for k, v in (manifest or {}).get("tables", {}).items()}}, indent=2))
+    else:
+        t = time.perf_counter()
+        csv_catalog = _load_csv_catalog(CATALOG_SOURCES)
+        _ = csv_catalog["all"].search_keys
+        csv_ms = (time.perf_counter() - t) * 1000
+        t = time.perf_counter()
+        snap = load_catalog(args.dir)
+        snap_ms = (time.perf_counter() - t) * 1000
+        print(f"csv parse + search keys: {csv_ms:.1f} ms; snapshot load ({loaded_from()}): {snap_ms:.2f} ms; "
+              f"rows: {len(snap['all'])}")
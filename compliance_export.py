@@ -0,0 +1,214 @@
+"""Compliance check queries and streaming CSV / XLSX export of products joined with violations.
+
+The same filters (product, seller, category, status) drive the compliance
+checks view and the export. Rows are pulled from a SQLite cursor in batches
+and encoded as they arrive, so the first bytes go out immediately and memory
+does not depend on the number of rows. XLSX is written as a zip stream with
+the sheet serialised row by row (inline strings, no shared-string table).
+"""
+import csv
+import io
+import sqlite3
+import zipfile
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+EXPORT_BATCH_SIZE = 1000
+
+FILTER_KEYS = ("product", "seller", "category", "status")
+
+EXPORT_COLUMNS = [
+    ("violation_id", "Violation ID"),
+    ("product", "Product"),
+    ("brand", "Brand"),
+    ("seller", "Seller"),
+    ("category", "Category"),
+    ("mrp", "MRP"),
+    ("net_qty", "Net Qty"),
+    ("manufacturer", "Manufacturer"),
+    ("country_of_origin", "Country of Origin"),
+    ("consumer_care", "Consumer Care"),
+    ("source_url", "Source URL"),
+    ("scanned_at", "Scanned At"),
+    ("status", "Status"),
+    ("violation_status", "Violation Status"),
+    ("issue", "Issue"),
+    ("severity", "Severity"),
+    ("violation_detected_at", "Violation Detected At"),
+]
+
+
+def filters_from_args(args) -> Dict[str, str]:
+    """Pick the supported filters out of request.args (or any mapping)."""
+    return {k: (args.get(k) or "").strip() for k in FILTER_KEYS if (args.get(k) or "").strip()}
+
+
+def build_compliance_query(filters: Optional[Dict[str, str]] = None, columns: str = "checks") -> Tuple[str, List]:
+    """SQL + params for violations joined with products, matching the compliance checks filters.
+
+    columns="checks" selects what /get_compliance_checks renders; "export" adds
+    every product and violation field.
+    """
+    filters = filters or {}
+    select = '''p.title as product, p.seller, p.mrp, p.net_qty, p.scanned_at as detected_at, p.category,
+           'Non-Compliant' as status, v.issue, v.severity'''
+    if columns == "export":
+        select = '''v.id as violation_id, p.title as product, p.brand, p.seller, p.category, p.mrp, p.net_qty,
+           p.manufacturer, p.country_of_origin, p.consumer_care, p.source_url, p.scanned_at,
+           'Non-Compliant' as status, v.status as violation_status, v.issue, v.severity,
+           v.detected_at as violation_detected_at'''
+    # Filter on the values the checks view displays: a missing product/seller shows as 'Unknown',
+    # a missing category as '-' (captures are stored without one)
+    clauses, params = [], []
+    if filters.get("product"):
+        clauses.append("LOWER(COALESCE(NULLIF(p.title, ''), 'Unknown')) LIKE ?")
+        params.append(f"%{filters['product'].lower()}%")
+    if filters.get("seller"):
+        clauses.append("LOWER(COALESCE(NULLIF(p.seller, ''), 'Unknown')) LIKE ?")
+        params.append(f"%{filters['seller'].lower()}%")
+    if filters.get("category"):
+        clauses.append("COALESCE(NULLIF(p.category, ''), '-') = ?")
+        params.append(filters["category"])
+    if filters.get("status"):
+        # Every row here is a violation ('Non-Compliant'); also accept the violation's own status (Open/Closed)
+        clauses.append("(? = 'Non-Compliant' OR v.status = ?)")
+        params.extend([filters["status"], filters["status"]])
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    query = f'''
+    SELECT {select}
+    FROM violations v
+    JOIN products p ON v.product_id = p.id
+    {where}
+    ORDER BY v.detected_at DESC
+    '''
+    return query, params
+
+
+_indexed_dbs = set()
+
+
+def ensure_export_indexes(conn: sqlite3.Connection, db_path: str) -> None:
+    """Index detected_at so ORDER BY walks the index and the first rows arrive without a full sort."""
+    if db_path not in _indexed_dbs:
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_violations_detected_at ON violations(detected_at)")
+        conn.commit()
+        _indexed_dbs.add(db_path)
+
+
+def iter_export_rows(db_path: str, filters: Optional[Dict[str, str]] = None,
+                     batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List[sqlite3.Row]]:
+    """Yield batches of export rows straight off the cursor."""
+    query, params = build_compliance_query(filters, columns="export")
+    conn = sqlite3.connect(db_path)
+    conn.row_factory = sqlite3.Row
+    try:
+        ensure_export_indexes(conn, db_path)
+        cursor = conn.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+
+def stream_csv(db_path: str, filters: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([label for _, label in EXPORT_COLUMNS])
+    for rows in iter_export_rows(db_path, filters):
+        for row in rows:
+            writer.writerow(["" if row[key] is None else row[key] for key, _ in EXPORT_COLUMNS])
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _ZipSink:
+    """Write-only, unseekable file object; zipfile then emits data descriptors and we drain its bytes."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_STATIC = {
+    "[Content_Types].xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'),
+    "_rels/.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+    "xl/workbook.xml": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Compliance" sheetId="1" r:id="rId1"/></sheets></workbook>'),
+    "xl/_rels/workbook.xml.rels": (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/'
+        'worksheet" Target="worksheets/sheet1.xml"/></Relationships>'),
+}
+
+
+def _xlsx_cell(value) -> str:
+    if value is None or value == "":
+        return "<c/>"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return f"<c><v>{value}</v></c>"
+    # Strip control characters XML 1.0 does not allow
+    text = "".join(ch for ch in str(value) if ch in "\t\n\r" or ord(ch) >= 32)
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def _xlsx_row(values) -> bytes:
+    return ("<row>" + "".join(_xlsx_cell(v) for v in values) + "</row>").encode("utf-8")
+
+
+def stream_xlsx(db_path: str, filters: Optional[Dict[str, str]] = None) -> Iterator[bytes]:
+    sink = _ZipSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for name, body in _XLSX_STATIC.items():
+            zf.writestr(name, body)
+        yield sink.drain()
+        info = zipfile.ZipInfo("xl/worksheets/sheet1.xml", date_time=datetime.now().timetuple()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED
+        with zf.open(info, "w", force_zip64=True) as sheet:
+            sheet.write(b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>')
+            sheet.write(_xlsx_row(label for _, label in EXPORT_COLUMNS))
+            for rows in iter_export_rows(db_path, filters):
+                sheet.write(b"".join(_xlsx_row(row[key] for key, _ in EXPORT_COLUMNS) for row in rows))
+                yield sink.drain()
+            sheet.write(b"</sheetData></worksheet>")
+    yield sink.drain()
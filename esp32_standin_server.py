@@ -0,0 +1,175 @@
+"""Local stand-in for the ESP32-CAM: an MJPEG /stream and a /capture snapshot.
+
+Replays the images in static/uploads as if each product were slid under the
+camera, left there for --hold seconds, then taken away: an empty scene, a few
+frames of the product moving in, the settled product, and so on. Every frame
+gets a little sensor noise so change detection is exercised realistically.
+
+    python esp32_standin_server.py --port 8081
+    ESP32_STREAM_URL=http://127.0.0.1:8081/stream ESP32_SNAPSHOT_URL=http://127.0.0.1:8081/capture python app.py
+"""
+import glob
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import cv2
+import numpy as np
+
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+BOUNDARY = "frame"
+
+
+def _encode(img: np.ndarray, quality: int = 80) -> bytes:
+    ok, buf = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    return buf.tobytes() if ok else b""
+
+
+def _fit(img: np.ndarray, size) -> np.ndarray:
+    """Scale img to fit inside size (w, h), keeping aspect ratio."""
+    w, h = size
+    scale = min(w / img.shape[1], h / img.shape[0]) * 0.8
+    return cv2.resize(img, (max(1, int(img.shape[1] * scale)), max(1, int(img.shape[0] * scale))),
+                      interpolation=cv2.INTER_AREA)
+
+
+def build_timeline(images_dir: str = "static/uploads", size=(640, 480), fps: float = 10.0, hold: float = 2.0,
+                   transition_frames: int = 5, noise: float = 3.0, seed: int = 0) -> List[bytes]:
+    """JPEG frames for one loop: (empty, slide-in, settled product) per image."""
+    rng = np.random.default_rng(seed)
+    w, h = size
+    background = np.full((h, w, 3), 180, dtype=np.uint8)
+    cv2.rectangle(background, (20, 20), (w - 20, h - 20), (150, 150, 150), 4)
+
+    def noisy(scene: np.ndarray) -> bytes:
+        grain = rng.normal(0, noise, scene.shape) if noise else 0
+        return _encode(np.clip(scene.astype(np.float32) + grain, 0, 255).astype(np.uint8))
+
+    paths = sorted(p for pattern in IMAGE_PATTERNS for p in glob.glob(os.path.join(images_dir, pattern)))
+    hold_frames = max(1, int(hold * fps))
+    frames: List[bytes] = []
+    for path in paths:
+        product = cv2.imread(path, cv2.IMREAD_COLOR)
+        if product is None:
+            continue
+        product = _fit(product, size)
+        ph, pw = product.shape[:2]
+        y, x_final = (h - ph) // 2, (w - pw) // 2
+        frames.extend(noisy(background) for _ in range(hold_frames))
+        for step in range(1, transition_frames + 1):
+            # Slide the product in from the left edge
+            scene = background.copy()
+            x = int(-pw + (x_final + pw) * step / (transition_frames + 1))
+            left, right = max(0, x), min(w, x + pw)
+            if right > left:
+                scene[y:y + ph, left:right] = product[:, left - x:right - x]
+            frames.append(noisy(scene))
+        scene = background.copy()
+        scene[y:y + ph, x_final:x_final + pw] = product
+        frames.extend(noisy(scene) for _ in range(hold_frames))
+    if not frames:
+        frames = [noisy(background)]
+    return frames
+
+
+class Esp32StandinServer:
+    """Threaded MJPEG stand-in. Use as a context manager in scripts and benchmarks."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, images_dir: str = "static/uploads",
+                 fps: float = 10.0, hold: float = 2.0, size=(640, 480)):
+        self.fps = fps
+        self.frames = build_timeline(images_dir, size=size, fps=fps, hold=hold)
+        self.frames_sent = 0
+        self.started_at = time.monotonic()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def current_frame(self) -> bytes:
+        index = int((time.monotonic() - self.started_at) * self.fps) % len(self.frames)
+        return self.frames[index]
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path == "/capture":
+                    body = server.current_frame()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "image/jpeg")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+                if path != "/stream":
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                next_at = time.monotonic()
+                try:
+                    while not server._stopping.is_set():
+                        frame = server.current_frame()
+                        self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                                         f"Content-Length: {len(frame)}\r\n\r\n".encode("ascii"))
+                        self.wfile.write(frame + b"\r\n")
+                        server.frames_sent += 1
+                        next_at += 1.0 / server.fps
+                        time.sleep(max(0.0, next_at - time.monotonic()))
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "Esp32StandinServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "Esp32StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve an MJPEG stream replaying static/uploads.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--images-dir", default="static/uploads")
+    parser.add_argument("--fps", type=float, default=10.0)
+    parser.add_argument("--hold", type=float, default=2.0, help="seconds each scene stays still")
+    args = parser.parse_args()
+
+    server = Esp32StandinServer(args.host, args.port, args.images_dir, fps=args.fps, hold=args.hold)
+    print(f"ESP32 stand-in on {server.base_url}/stream ({len(server.frames)} frames per loop)")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
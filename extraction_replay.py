@@ -0,0 +1,307 @@
+"""Replay stored OCR texts through field extraction and the rule engine, without Tesseract.
+
+By default the texts are data/extracted_texts.csv (real captures, mostly
+listing screenshots) and data/extraction_corpus.jsonl: declaration panels
+written in the three OCR styles the extractor targets (clean, squashed and
+misspelt), hand-labelled field by field, some with a mandatory declaration
+missing. Other inputs can be any mix of:
+    *.csv     a full_text, raw_text or text column (capture log exports)
+    *.jsonl   one {"text": ...} object per line
+    *.txt     one OCR dump per file (directories are searched recursively)
+Identical texts are replayed once unless --keep-duplicates is given.
+
+Each text goes through field_extraction.extract_product_fields and
+evaluate_legal_metrology_rules in a pool of --workers processes, and is scored
+against a labels file (JSONL, one object per text, keyed by text_key()):
+    {"key": "3f2a...", "preview": "first line", "fields": {"product": "...", "mrp": null},
+     "compliant": false, "issues": ["Missing MRP"]}
+Only the fields present in "fields" are scored (null means "not on the label",
+a list gives acceptable alternatives). Values are compared case-insensitively
+on letters and digits. A wrong value counts against both precision and recall.
+
+    python extraction_replay.py                              # per-field precision/recall + texts/s
+    python extraction_replay.py dumps/ --init-labels data/extraction_labels.jsonl
+    python extraction_replay.py --json new.json --baseline old.json   # exit 1 on regressions
+"""
+import argparse
+import csv
+import glob
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_INPUTS = ("data/extracted_texts.csv", "data/extraction_corpus.jsonl")
+DEFAULT_LABELS = "data/extraction_labels.jsonl"
+FIELDS = ("product", "manufacturer", "address", "commodity", "net_quantity", "mrp", "date", "consumer_care", "origin")
+TEXT_COLUMNS = ("full_text", "raw_text", "text")
+NOT_FOUND = "Not Found"
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha1(text.strip().encode("utf-8")).hexdigest()[:16]
+
+
+def _normalize(value: Any) -> str:
+    return re.sub(r"[^0-9a-z]+", "", str(value).lower())
+
+
+# -----------------------------
+# Inputs
+# -----------------------------
+def _texts_from_path(path: str) -> Iterable[str]:
+    if os.path.isdir(path):
+        for name in sorted(glob.glob(os.path.join(path, "**", "*.txt"), recursive=True)):
+            yield from _texts_from_path(name)
+    elif path.endswith(".csv"):
+        csv.field_size_limit(sys.maxsize)
+        with open(path, newline="", encoding="utf-8", errors="replace") as f:
+            reader = csv.DictReader(f)
+            column = next((c for c in TEXT_COLUMNS if c in (reader.fieldnames or [])), None)
+            if column is None:
+                print(f"{path}: no {'/'.join(TEXT_COLUMNS)} column, skipped", file=sys.stderr)
+                return
+            for row in reader:
+                yield row[column] or ""
+    elif path.endswith(".jsonl"):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line).get("text") or ""
+    else:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            yield f.read()
+
+
+def load_texts(paths: List[str], keep_duplicates: bool = False) -> List[Tuple[str, str]]:
+    """[(key, text)] for every non-blank text, in input order."""
+    texts, seen = [], set()
+    for path in paths:
+        for text in _texts_from_path(path):
+            if not text.strip():
+                continue
+            key = text_key(text)
+            if key in seen and not keep_duplicates:
+                continue
+            seen.add(key)
+            texts.append((key, text))
+    return texts
+
+
+def load_labels(path: str) -> Dict[str, Dict]:
+    labels: Dict[str, Dict] = {}
+    if path and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    entry = json.loads(line)
+                    labels[entry["key"]] = entry
+    return labels
+
+
+# -----------------------------
+# Replay (runs in the worker processes)
+# -----------------------------
+_extract = None
+_rules = None
+
+
+def _init_worker() -> None:
+    global _extract, _rules
+    from bp_check import evaluate_legal_metrology_rules
+    from field_extraction import extract_product_fields
+    _extract, _rules = extract_product_fields, evaluate_legal_metrology_rules
+
+
+def replay_chunk(chunk: List[Tuple[str, str]]) -> Tuple[List[Dict], float]:
+    """Extract fields and run the rules on each text; returns (outputs, seconds spent)."""
+    if _extract is None:
+        _init_worker()
+    started = time.perf_counter()
+    outputs = []
+    for key, text in chunk:
+        fields = _extract(text)
+        # The rule engine reads the capture pipeline's names (country rather than origin)
+        compliant, issues = _rules({"mrp": fields.get("mrp"), "net_quantity": fields.get("net_quantity"),
+                                    "country": fields.get("origin")})
+        outputs.append({"key": key, "fields": {f: fields.get(f, NOT_FOUND) for f in FIELDS},
+                        "compliant": compliant, "issues": issues})
+    return outputs, time.perf_counter() - started
+
+
+def replay(texts: List[Tuple[str, str]], workers: int, chunk_size: int) -> Tuple[List[Dict], Dict[str, float]]:
+    chunks = [texts[i:i + chunk_size] for i in range(0, len(texts), chunk_size)]
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker) as pool:
+        # Workers import the extractor before the clock starts
+        pool.map(time.sleep, [0] * workers)
+        started = time.perf_counter()
+        outputs, busy = [], 0.0
+        for chunk_outputs, seconds in pool.imap(replay_chunk, chunks):
+            outputs.extend(chunk_outputs)
+            busy += seconds
+        wall = time.perf_counter() - started
+    return outputs, {
+        "texts": len(texts),
+        "workers": workers,
+        "wall_s": round(wall, 4),
+        "texts_per_s": round(len(texts) / wall, 1) if wall else None,
+        "texts_per_cpu_s": round(len(texts) / busy, 1) if busy else None,
+    }
+
+
+# -----------------------------
+# Scoring
+# -----------------------------
+def _matches(predicted: str, expected: Any) -> bool:
+    options = expected if isinstance(expected, list) else [expected]
+    return any(_normalize(predicted) == _normalize(option) for option in options if option is not None)
+
+
+def score(outputs: List[Dict], labels: Dict[str, Dict]) -> Dict[str, Any]:
+    counts = {f: {"tp": 0, "fp": 0, "fn": 0, "labelled": 0} for f in FIELDS}
+    verdicts = {"labelled": 0, "correct": 0}
+    issues = {"tp": 0, "fp": 0, "fn": 0}
+    mistakes: List[Dict] = []
+    for out in outputs:
+        label = labels.get(out["key"])
+        if not label:
+            continue
+        for field, expected in (label.get("fields") or {}).items():
+            if field not in counts:
+                continue
+            c = counts[field]
+            c["labelled"] += 1
+            predicted = out["fields"].get(field, NOT_FOUND)
+            found = predicted not in (None, "", NOT_FOUND)
+            present = expected is not None and expected != []
+            if found and present and _matches(predicted, expected):
+                c["tp"] += 1
+                continue
+            c["fp"] += found
+            c["fn"] += present
+            if found or present:
+                mistakes.append({"key": out["key"], "field": field, "predicted": predicted, "expected": expected})
+        if "compliant" in label:
+            verdicts["labelled"] += 1
+            verdicts["correct"] += out["compliant"] == label["compliant"]
+        if "issues" in label:
+            got, want = set(out["issues"]), set(label["issues"])
+            issues["tp"] += len(got & want)
+            issues["fp"] += len(got - want)
+            issues["fn"] += len(want - got)
+
+    def pr(c: Dict[str, int]) -> Dict[str, Optional[float]]:
+        p = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else None
+        r = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else None
+        f1 = 2 * p * r / (p + r) if p and r else (0.0 if p is not None and r is not None else None)
+        return {"precision": _round(p), "recall": _round(r), "f1": _round(f1)}
+
+    return {
+        "labelled_texts": sum(1 for out in outputs if out["key"] in labels),
+        "fields": {f: dict(c, **pr(c)) for f, c in counts.items()},
+        "rules": {"verdict_accuracy": _round(verdicts["correct"] / verdicts["labelled"]) if verdicts["labelled"] else None,
+                  "verdicts_labelled": verdicts["labelled"], "issues": dict(issues, **pr(issues))},
+        "mistakes": mistakes,
+    }
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return round(value, 3) if value is not None else None
+
+
+def init_labels(path: str, outputs: List[Dict], texts: Dict[str, str], labels: Dict[str, Dict]) -> int:
+    """Append skeleton labels (current predictions, to be corrected by hand) for unlabelled texts."""
+    added = 0
+    with open(path, "a", encoding="utf-8") as f:
+        for out in outputs:
+            if out["key"] in labels:
+                continue
+            preview = next((line.strip() for line in texts[out["key"]].splitlines() if line.strip()), "")[:80]
+            fields = {k: (None if v == NOT_FOUND else v) for k, v in out["fields"].items()}
+            f.write(json.dumps({"key": out["key"], "preview": preview, "fields": fields,
+                                "compliant": out["compliant"], "issues": out["issues"]}, ensure_ascii=False) + "\n")
+            labels[out["key"]] = {}
+            added += 1
+    return added
+
+
+def regressions(current: Dict, baseline: Dict, threshold: float, speed_threshold: float) -> List[str]:
+    found = []
+    for field, result in current["accuracy"]["fields"].items():
+        base = baseline.get("accuracy", {}).get("fields", {}).get(field, {})
+        for metric in ("precision", "recall"):
+            new, old = result.get(metric), base.get(metric)
+            if new is not None and old is not None and old - new > threshold:
+                found.append(f"{field}.{metric}: {old} -> {new}")
+    new, old = current["throughput"].get("texts_per_cpu_s"), baseline.get("throughput", {}).get("texts_per_cpu_s")
+    if new and old and (old - new) / old > speed_threshold:
+        found.append(f"texts_per_cpu_s: {old} -> {new} ({(new - old) / old:+.0%})")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Replay OCR texts through extraction and rules; score against labels.")
+    parser.add_argument("inputs", nargs="*", default=list(DEFAULT_INPUTS), help="CSV/JSONL/TXT files or directories")
+    parser.add_argument("--labels", default=DEFAULT_LABELS)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--chunk-size", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=1, help="replay the corpus N times for steadier throughput")
+    parser.add_argument("--keep-duplicates", action="store_true")
+    parser.add_argument("--init-labels", metavar="PATH", help="append skeleton labels for unlabelled texts to PATH")
+    parser.add_argument("--show-mistakes", action="store_true")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="earlier --json report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.02, help="allowed precision/recall drop (absolute)")
+    parser.add_argument("--speed-threshold", type=float, default=0.2, help="allowed texts/s drop (fractional)")
+    args = parser.parse_args()
+
+    texts = load_texts(args.inputs, args.keep_duplicates)
+    if not texts:
+        print("No texts to replay", file=sys.stderr)
+        return 2
+    outputs, throughput = replay(texts * max(1, args.repeat), args.workers, args.chunk_size)
+    outputs = outputs[:len(texts)]
+    labels = load_labels(args.labels)
+    if args.init_labels:
+        added = init_labels(args.init_labels, outputs, dict(texts), load_labels(args.init_labels))
+        print(f"Added {added} skeleton labels to {args.init_labels}; correct them by hand")
+    accuracy = score(outputs, labels)
+    report = {"inputs": args.inputs, "throughput": throughput, "accuracy": accuracy}
+
+    print(f"{len(texts)} texts ({accuracy['labelled_texts']} labelled), {throughput['workers']} workers: "
+          f"{throughput['texts_per_s']} texts/s wall, {throughput['texts_per_cpu_s']} texts/s per CPU")
+    print(f"{'field':14s} {'labelled':>8s} {'precision':>9s} {'recall':>7s} {'f1':>6s}")
+    for field, r in accuracy["fields"].items():
+        if r["labelled"]:
+            print(f"{field:14s} {r['labelled']:8d} {_fmt(r['precision']):>9s} {_fmt(r['recall']):>7s} {_fmt(r['f1']):>6s}")
+    rules = accuracy["rules"]
+    print(f"rule verdict accuracy {_fmt(rules['verdict_accuracy'])} ({rules['verdicts_labelled']} labelled), "
+          f"issues precision {_fmt(rules['issues']['precision'])} recall {_fmt(rules['issues']['recall'])}")
+    if args.show_mistakes:
+        for m in accuracy["mistakes"]:
+            print(f"  {m['key']} {m['field']}: got {m['predicted']!r}, expected {m['expected']!r}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(report, json.load(f), args.threshold, args.speed_threshold)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            return 1
+    return 0
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}"
+
+
+if __name__ == "__main__":
+    sys.exit(main())
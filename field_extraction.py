@@ -1,5 +1,8 @@
 import re
 
+from metrics import timed
+
+@timed("extract_fields")
 def extract_product_fields(text, processed_path=None):
     """
     Extract product details from OCR text using robust regex patterns.
@@ -0,0 +1,287 @@
+"""Fast HTML parsing for Flipkart listing and product pages.
+
+Both scrapers parse through these functions. The backend is picked once:
+selectolax (if installed) > lxml > BeautifulSoup with a SoupStrainer, so only
+the card/container nodes we read are ever built. Pass backend= to force one
+(parse_benchmark.py compares them, including the old full-tree "bs4" parse).
+
+selectolax is optional and not in requirements.txt; `pip install selectolax`
+makes it the default. Every backend returns the same rows as the full bs4
+parse (parse_benchmark.py checks this before timing).
+"""
+import re
+from typing import Dict, List, Optional
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    from selectolax.lexbor import LexborHTMLParser as _SelectolaxParser
+except ImportError:
+    try:
+        from selectolax.parser import HTMLParser as _SelectolaxParser
+    except ImportError:
+        _SelectolaxParser = None
+
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+
+CARD_CLASSES = ("_1AtVbE", "_2kHMtA", "_4ddWXP")
+TITLE_SELECTOR = "a.s1Q9rs, a.IRpwTa, ._4rR01T"
+PRICE_SELECTOR = "._30jeq3._1_WHN1, ._30jeq3"
+DETAILS_SELECTOR = "ul._1xgFaf, ul._1xgFaf li, .IRpwTa"
+IMAGE_SELECTOR = "img._396cs4, img._2r_T1I, img._1a8UBa"
+PRODUCT_TITLE_CLASS = "VU-ZEz"
+PRODUCT_PRICE_CLASS = "Nx9bqj"
+PRODUCT_CONTAINER_CLASS = "DOjaWF gdgoEp col-8-12"
+
+BACKENDS = ("selectolax", "lxml", "bs4-strained", "bs4")
+
+
+def default_backend() -> str:
+    if _SelectolaxParser is not None:
+        return "selectolax"
+    if lxml is not None:
+        return "lxml"
+    return "bs4-strained"
+
+
+DEFAULT_BACKEND = default_backend()
+
+
+def _absolute(link: str, base_url: str) -> str:
+    return base_url + link if link and link.startswith("/") else link
+
+
+def _card(name: str, price: str, details: str, link: str, image_url: str, base_url: str) -> Dict[str, str]:
+    return {
+        "name": name,
+        "price": price,
+        "details": details,
+        "product_link": _absolute(link or "", base_url),
+        "image_url": image_url or "",
+    }
+
+
+# -- lxml helpers -----------------------------------------------------------
+def _has_class(cls: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')"
+
+
+def _xpath_for(selector: str) -> str:
+    """Translate the small 'tag.cls.cls, .cls' selector subset we use into XPath."""
+    parts = []
+    for sel in selector.split(","):
+        sel = sel.strip()
+        if " " in sel:
+            outer, inner = sel.split(" ", 1)
+            parts.append(_xpath_for(outer) + "//" + _xpath_for(inner)[len(".//"):])
+            continue
+        tag, *classes = sel.split(".")
+        cond = " and ".join(_has_class(c) for c in classes)
+        parts.append(f".//{tag or '*'}" + (f"[{cond}]" if cond else ""))
+    return " | ".join(parts)
+
+
+_LXML_XPATHS = {
+    "cards": [f"//div[{_has_class(c)}]" for c in CARD_CLASSES],
+    "title": _xpath_for(TITLE_SELECTOR),
+    "price": _xpath_for(PRICE_SELECTOR),
+    "details": _xpath_for(DETAILS_SELECTOR),
+    "image": _xpath_for(IMAGE_SELECTOR),
+}
+
+
+def _lxml_text(el, separator: str = "") -> str:
+    el = _strip_noise(el)
+    pieces = [t.strip() for t in el.itertext()]
+    return separator.join(p for p in pieces if p)
+
+
+def _selectolax_text(node, separator: str = "") -> str:
+    # node.text(strip=True) keeps empty whitespace nodes, doubling the separator between elements
+    pieces = node.text(separator="\x00", strip=True).split("\x00")
+    return separator.join(p for p in pieces if p)
+
+
+def _strip_noise(el):
+    etree.strip_elements(el, etree.Comment, "script", "style", with_tail=False)
+    return el
+
+
+def _lxml_first(card, key: str):
+    found = card.xpath(_LXML_XPATHS[key])
+    return found[0] if found else None
+
+
+# -- search result cards ----------------------------------------------------
+def parse_search_page(html: str, base_url: str = "https://www.flipkart.com",
+                      backend: Optional[str] = None) -> List[Dict[str, str]]:
+    backend = backend or DEFAULT_BACKEND
+    items: List[Dict[str, str]] = []
+    if not html:
+        return items
+
+    if backend == "selectolax":
+        tree = _SelectolaxParser(html)
+        for cls in CARD_CLASSES:
+            for card in tree.css(f"div.{cls}"):
+                title_el = card.css_first(TITLE_SELECTOR)
+                if title_el is None:
+                    continue
+                name = title_el.text(strip=True)
+                price_el = card.css_first(PRICE_SELECTOR)
+                details_el = card.css_first(DETAILS_SELECTOR)
+                img_el = card.css_first(IMAGE_SELECTOR)
+                if name:
+                    items.append(_card(
+                        name,
+                        price_el.text(strip=True) if price_el is not None else "",
+                        _selectolax_text(details_el, " | ") if details_el is not None else "",
+                        title_el.attributes.get("href") or title_el.attributes.get("to") or "",
+                        img_el.attributes.get("src") if img_el is not None else "",
+                        base_url,
+                    ))
+        return items
+
+    if backend == "lxml":
+        root = lxml.html.fromstring(html)
+        for xpath in _LXML_XPATHS["cards"]:
+            for card in root.xpath(xpath):
+                title_el = _lxml_first(card, "title")
+                if title_el is None:
+                    continue
+                name = _lxml_text(title_el)
+                price_el = _lxml_first(card, "price")
+                details_el = _lxml_first(card, "details")
+                img_el = _lxml_first(card, "image")
+                if name:
+                    items.append(_card(
+                        name,
+                        _lxml_text(price_el) if price_el is not None else "",
+                        _lxml_text(details_el, " | ") if details_el is not None else "",
+                        title_el.get("href") or title_el.get("to") or "",
+                        img_el.get("src") if img_el is not None else "",
+                        base_url,
+                    ))
+        return items
+
+    if backend == "bs4-strained":
+        strainer = SoupStrainer("div", class_=re.compile(r"(^|\s)(%s)(\s|$)" % "|".join(CARD_CLASSES)))
+        soup = BeautifulSoup(html, "lxml" if lxml is not None else "html.parser", parse_only=strainer)
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+    cards = []
+    for cls in CARD_CLASSES:
+        cards.extend(soup.select(f"div.{cls}"))
+    for card in cards:
+        title_el = card.select_one(TITLE_SELECTOR)
+        if not title_el:
+            continue
+        name = title_el.get_text(strip=True)
+        price_el = card.select_one(PRICE_SELECTOR)
+        details_el = card.select_one(DETAILS_SELECTOR)
+        img_el = card.select_one(IMAGE_SELECTOR)
+        if name:
+            items.append(_card(
+                name,
+                price_el.get_text(strip=True) if price_el else "",
+                details_el.get_text(" | ", strip=True) if details_el else "",
+                title_el.get("href") or title_el.get("to") or "",
+                img_el.get("src") if img_el else "",
+                base_url,
+            ))
+    return items
+
+
+# -- product links on a listing page ---------------------------------------
+def parse_listing_links(html: str, base_url: str = "https://www.flipkart.com",
+                        backend: Optional[str] = None) -> List[str]:
+    """Unique product links (query string dropped) in page order."""
+    backend = backend or DEFAULT_BACKEND
+    if not html:
+        return []
+    if backend == "selectolax":
+        hrefs = (a.attributes.get("href") or "" for a in _SelectolaxParser(html).css("a[href]"))
+    elif backend == "lxml":
+        hrefs = lxml.html.fromstring(html).xpath("//a[contains(@href, '/p/')]/@href")
+    else:
+        parse_only = SoupStrainer("a", href=re.compile("/p/")) if backend == "bs4-strained" else None
+        parser = "lxml" if lxml is not None and parse_only is not None else "html.parser"
+        soup = BeautifulSoup(html, parser, parse_only=parse_only)
+        hrefs = (a["href"] for a in soup.find_all("a", href=True))
+
+    seen = set()
+    links: List[str] = []
+    for href in hrefs:
+        if "/p/" in href:
+            full_link = base_url + href.split("?")[0]
+            if full_link not in seen:
+                seen.add(full_link)
+                links.append(full_link)
+    return links
+
+
+# -- product detail page ----------------------------------------------------
+def parse_product_details(html: str, keep_raw_html: bool = False,
+                          backend: Optional[str] = None) -> Dict[str, str]:
+    """Product Name, Price and Raw_Text (plus Raw_HTML of the container if keep_raw_html)."""
+    backend = backend or DEFAULT_BACKEND
+    data: Dict[str, str] = {}
+    if not html:
+        return data
+
+    if backend == "selectolax":
+        tree = _SelectolaxParser(html)
+        for tag in tree.css("script, style"):
+            tag.decompose()
+        title = tree.css_first(f"span.{PRODUCT_TITLE_CLASS}")
+        if title is not None:
+            data["Product Name"] = title.text(strip=True)
+        price = tree.css_first(f"div.{PRODUCT_PRICE_CLASS}")
+        if price is not None:
+            data["Price"] = price.text(strip=True)
+        container = tree.css_first("div." + PRODUCT_CONTAINER_CLASS.replace(" ", "."))
+        if container is not None and container.attributes.get("class") == PRODUCT_CONTAINER_CLASS:
+            if keep_raw_html:
+                data["Raw_HTML"] = container.html
+            data["Raw_Text"] = _selectolax_text(container, " ")
+        return data
+
+    if backend == "lxml":
+        root = lxml.html.fromstring(html)
+        title = root.xpath(f"//span[{_has_class(PRODUCT_TITLE_CLASS)}]")
+        if title:
+            data["Product Name"] = _lxml_text(title[0])
+        price = root.xpath(f"//div[{_has_class(PRODUCT_PRICE_CLASS)}]")
+        if price:
+            data["Price"] = _lxml_text(price[0])
+        container = root.xpath(f"//div[@class='{PRODUCT_CONTAINER_CLASS}']")
+        if container:
+            if keep_raw_html:
+                data["Raw_HTML"] = lxml.html.tostring(container[0], encoding="unicode")
+            data["Raw_Text"] = _lxml_text(container[0], " ")
+        return data
+
+    if backend == "bs4-strained":
+        # Class values are matched against the raw attribute string while parsing
+        classes = re.compile(r"(^|\s)(%s|%s|DOjaWF)(\s|$)" % (PRODUCT_TITLE_CLASS, PRODUCT_PRICE_CLASS))
+        strainer = SoupStrainer(["span", "div"], class_=classes)
+        soup = BeautifulSoup(html, "lxml" if lxml is not None else "html.parser", parse_only=strainer)
+    else:
+        soup = BeautifulSoup(html, "html.parser")
+    title = soup.find("span", class_=PRODUCT_TITLE_CLASS)
+    if title:
+        data["Product Name"] = title.get_text(strip=True)
+    price = soup.find("div", class_=PRODUCT_PRICE_CLASS)
+    if price:
+        data["Price"] = price.get_text(strip=True)
+    container = soup.find("div", class_=PRODUCT_CONTAINER_CLASS)
+    if container:
+        if keep_raw_html:
+            data["Raw_HTML"] = str(container)
+        data["Raw_Text"] = container.get_text(separator=" ", strip=True)
+    return data
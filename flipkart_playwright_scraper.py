@@ -1,10 +1,20 @@
 import asyncio
+import logging
+import os
 import re
+import time
 import urllib.parse
-from typing import List, Dict
+from datetime import datetime
+from typing import AsyncIterator, Callable, Dict, List, Optional
 
-from bs4 import BeautifulSoup
-from playwright.async_api import async_playwright
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from browser_pool import USER_AGENT, get_browser_manager
+from flipkart_parsing import parse_listing_links, parse_product_details as _parse_product_details
+from http_cache import ResponseCache, get_response_cache
+from scrape_index import SCRAPE_FRESH_AGE, ScrapeIndex, canonical_url, get_scrape_index
+
+log = logging.getLogger(__name__)
 
 
 def slugify(text: str) -> str:
@@ -16,48 +26,141 @@ def build_listing_url(query: str) -> str:
 
 
 def parse_listing(html: str) -> List[str]:
-    soup = BeautifulSoup(html, "html.parser")
-    links: List[str] = []
-    for a_tag in soup.find_all("a", href=True):
-        href = a_tag['href']
-        if "/p/" in href:
-            full_link = "https://www.flipkart.com" + href.split("?")[0]
-            if full_link not in links:
-                links.append(full_link)
-    return links
+    return parse_listing_links(html, base_url="https://www.flipkart.com")
+
+
+def parse_product_details(html: str, keep_raw_html: bool = False) -> Dict[str, str]:
+    return _parse_product_details(html, keep_raw_html=keep_raw_html)
 
 
-def parse_product_details(html: str) -> Dict[str, str]:
-    soup = BeautifulSoup(html, "html.parser")
-    data: Dict[str, str] = {}
+LISTING_READY_SELECTOR = "a[href*='/p/']"
+PRODUCT_READY_SELECTOR = "span.VU-ZEz"
 
-    title = soup.find("span", class_="VU-ZEz")
-    if title:
-        data["Product Name"] = title.get_text(strip=True)
+# We only read text, so anything visual or third-party is dead weight
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_HOST_PATTERNS = (
+    "google-analytics.com", "googletagmanager.com", "doubleclick.net", "googlesyndication.com",
+    "facebook.net", "facebook.com", "hotjar.com", "clarity.ms", "criteo", "adservice",
+    "omtrdc.net", "demdex.net", "branch.io", "appsflyer.com",
+)
+# Sub-resources from other hosts are aborted; top-level navigations are always allowed
+ALLOWED_HOSTS = tuple(h.strip() for h in os.environ.get(
+    "SCRAPER_ALLOWED_HOSTS", "flipkart.com,flixcart.com").split(",") if h.strip())
 
-    container = soup.find("div", class_="DOjaWF gdgoEp col-8-12")
-    if container:
-        data["Raw_HTML"] = str(container)
-        data["Raw_Text"] = container.get_text(separator=" ", strip=True)
 
-    return data
+def _host_allowed(host: str, domains) -> bool:
+    """host is one of domains or a subdomain of one (flipkart.com.evil.net is not)."""
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+def _host_blocked(host: str, patterns) -> bool:
+    # Block patterns are loose on purpose ("criteo", "adservice" match any host containing them)
+    return any(p in host for p in patterns)
 
 
 class FlipkartPlaywrightScraper:
-    def __init__(self):
+    def __init__(self, context=None, concurrency: int = 4, block_resources: bool = True,
+                 allowed_hosts=ALLOWED_HOSTS, listing_javascript: bool = True,
+                 cache: Optional[ResponseCache] = None, index: Optional[ScrapeIndex] = None,
+                 fresh_age: float = SCRAPE_FRESH_AGE):
+        """Pass a BrowserContext (e.g. from browser_pool) to reuse a running browser.
+
+        concurrency is the number of tabs used to fetch product pages in parallel.
+        block_resources aborts images, media, fonts, known trackers and any
+        sub-resource outside allowed_hosts. listing_javascript=False loads search
+        pages with JavaScript disabled, for when their markup is server-rendered.
+        Rendered HTML goes through the shared response cache; in replay mode no
+        browser is started at all. With an index, product pages seen within
+        fresh_age seconds are skipped (except in replay mode).
+        """
+        self.cache = cache or get_response_cache()
+        self.index = index
+        self.fresh_age = fresh_age
         self._pw = None
         self._browser = None
+        self._context = context
+        self._listing_context = None
         self._page = None
+        self.concurrency = max(1, concurrency)
+        self.block_resources = block_resources
+        self.allowed_hosts = tuple(allowed_hosts or ())
+        self.listing_javascript = listing_javascript
+        self._workers: "asyncio.Queue" = asyncio.Queue()
+        self._worker_pages = []
+        self._page_bytes: Dict[int, int] = {}
+        self._pending_sizes: Dict[int, set] = {}
+        self.stats = {"pages": 0, "bytes": 0, "seconds": 0.0, "blocked": 0, "skipped_fresh": 0, "failed": 0}
+
+    async def _filter_request(self, route):
+        request = route.request
+        host = urllib.parse.urlsplit(request.url).hostname or ""
+        if request.is_navigation_request() and request.frame.parent_frame is None:
+            await route.continue_()
+            return
+        if (request.resource_type in BLOCKED_RESOURCE_TYPES
+                or _host_blocked(host, BLOCKED_HOST_PATTERNS)
+                or (self.allowed_hosts and not _host_allowed(host, self.allowed_hosts))):
+            self.stats["blocked"] += 1
+            await route.abort()
+            return
+        await route.continue_()
+
+    def _track_bytes(self, page) -> None:
+        key = id(page)
+        self._page_bytes[key] = 0
+        pending = self._pending_sizes[key] = set()
+
+        async def _count(request):
+            try:
+                sizes = await request.sizes()
+            except Exception:
+                return
+            self._page_bytes[key] = self._page_bytes.get(key, 0) + \
+                sizes.get("responseBodySize", 0) + sizes.get("responseHeadersSize", 0)
+
+        def _finished(request):
+            # sizes() needs a round trip; fetch_html waits for these before reading the total
+            task = asyncio.ensure_future(_count(request))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        page.on("requestfinished", _finished)
+
+    async def _prepare_page(self, page):
+        if self.block_resources:
+            await page.route("**/*", self._filter_request)
+        self._track_bytes(page)
+        return page
+
+    async def _new_page(self):
+        if self._context is not None:
+            page = await self._context.new_page()
+        else:
+            page = await self._browser.new_page(user_agent=USER_AGENT)
+        return await self._prepare_page(page)
 
     async def start(self):
-        self._pw = await async_playwright().start()
-        self._browser = await self._pw.chromium.launch(headless=True)
-        self._page = await self._browser.new_page(user_agent=(
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-            "(KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36"
-        ))
+        if self.cache.replay:
+            return
+        if self._context is None:
+            self._pw = await async_playwright().start()
+            self._browser = await self._pw.chromium.launch(headless=True)
+        if self.listing_javascript:
+            self._page = await self._new_page()
+        else:
+            browser = self._browser or self._context.browser
+            self._listing_context = await browser.new_context(user_agent=USER_AGENT, java_script_enabled=False)
+            self._page = await self._prepare_page(await self._listing_context.new_page())
 
     async def close(self):
+        if self._listing_context is not None:
+            await self._listing_context.close()
+            self._listing_context = None
+        if self._context is not None:
+            for page in [self._page] + self._worker_pages:
+                if page and not page.is_closed():
+                    await page.close()
+            return
         try:
             if self._browser:
                 await self._browser.close()
@@ -65,33 +168,117 @@ class FlipkartPlaywrightScraper:
             if self._pw:
                 await self._pw.stop()
 
-    async def fetch_html(self, url: str, wait_ms: int = 5000) -> str:
-        await self._page.goto(url, timeout=60000)
-        await self._page.wait_for_timeout(wait_ms)
-        return await self._page.content()
+    async def fetch_html(self, url: str, wait_ms: int = 5000, ready_selector: str = None, page=None) -> str:
+        """Load url and return its HTML once ready_selector appears (or the network
+        goes idle when no selector is given), waiting at most wait_ms."""
+        cached = await self.cache.alookup(url)
+        if cached is not None:
+            return cached
+        page = page or self._page
+        started = time.perf_counter()
+        bytes_before = self._page_bytes.get(id(page), 0)
+        await page.goto(url, timeout=60000, wait_until="domcontentloaded")
+        try:
+            if ready_selector:
+                await page.wait_for_selector(ready_selector, timeout=wait_ms)
+            else:
+                await page.wait_for_load_state("networkidle", timeout=wait_ms)
+        except PlaywrightTimeoutError:
+            pass
+        html = await page.content()
+        await self.cache.astore(url, html)
+        elapsed = time.perf_counter() - started
+        pending = self._pending_sizes.get(id(page))
+        if pending:
+            await asyncio.gather(*list(pending), return_exceptions=True)
+        transferred = self._page_bytes.get(id(page), 0) - bytes_before
+        self.stats["pages"] += 1
+        self.stats["bytes"] += transferred
+        self.stats["seconds"] += elapsed
+        return html
 
-    async def scrape_category(self, query: str, max_pages: int = 1) -> List[Dict[str, str]]:
-        results: List[Dict[str, str]] = []
+    def summary(self) -> Dict[str, float]:
+        """Totals plus per-page averages for bandwidth and load time."""
+        pages = self.stats["pages"] or 1
+        return dict(self.stats,
+                    avg_kib_per_page=round(self.stats["bytes"] / 1024 / pages, 1),
+                    avg_seconds_per_page=round(self.stats["seconds"] / pages, 3))
+
+    async def _borrow_page(self):
+        if self._workers.empty() and len(self._worker_pages) < self.concurrency:
+            page = await self._new_page()
+            self._worker_pages.append(page)
+            return page
+        return await self._workers.get()
+
+    async def _fetch_product(self, link: str, limit: asyncio.Semaphore) -> Optional[Dict[str, str]]:
+        prod_html = await self.cache.alookup(link)
+        if prod_html is None:
+            async with limit:
+                page = await self._borrow_page()
+                try:
+                    prod_html = await self.fetch_html(link, ready_selector=PRODUCT_READY_SELECTOR, page=page)
+                except Exception as e:
+                    # Counted here and reported once in the end-of-scrape summary
+                    self.stats["failed"] += 1
+                    log.debug("Product fetch failed for %s: %s", link, e)
+                    return None
+                finally:
+                    self._workers.put_nowait(page)
+        prod_info = parse_product_details(prod_html)
+        if not prod_info:
+            return None
+        # Map to common fields for CSV writer compatibility
+        return {
+            "name": prod_info.get("Product Name", ""),
+            "price": prod_info.get("Price", ""),
+            "details": prod_info.get("Raw_Text", ""),
+            "product_link": link,
+            "image_url": "",
+        }
+
+    async def iter_category(self, query: str, max_pages: int = 1) -> AsyncIterator[Dict[str, str]]:
+        """Yield product rows as soon as each product page is parsed."""
+        limit = asyncio.Semaphore(self.concurrency)
         base_url = build_listing_url(query)
+        seen = set()
         for page in range(1, max_pages + 1):
             page_url = f"{base_url}&page={page}"
-            listing_html = await self.fetch_html(page_url)
-            product_links = parse_listing(listing_html)
-            if not product_links:
+            listing_html = await self.fetch_html(page_url, ready_selector=LISTING_READY_SELECTOR)
+            listing_links = parse_listing(listing_html)
+            if not listing_links:
                 break
-            for link in product_links:
-                prod_html = await self.fetch_html(link)
-                prod_info = parse_product_details(prod_html)
-                if prod_info:
-                    # Map to common fields for CSV writer compatibility
-                    mapped = {
-                        "name": prod_info.get("Product Name", ""),
-                        "price": "",
-                        "details": prod_info.get("Raw_Text", ""),
-                        "product_link": link,
-                        "image_url": "",
-                    }
-                    results.append(mapped)
+            fresh = set()
+            if self.index and not self.cache.replay:
+                # One lookup per listing page, off the shared browser loop
+                fresh = await asyncio.to_thread(self.index.fresh_keys, listing_links, self.fresh_age)
+            product_links = []
+            for link in listing_links:
+                key = canonical_url(link)
+                if key in seen:
+                    continue
+                seen.add(key)
+                if key in fresh:
+                    self.stats["skipped_fresh"] += 1
+                    continue
+                product_links.append(link)
+            tasks = [asyncio.ensure_future(self._fetch_product(link, limit)) for link in product_links]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    row = await next_done
+                    if row:
+                        yield row
+            finally:
+                for task in tasks:
+                    task.cancel()
+
+    async def scrape_category(self, query: str, max_pages: int = 1,
+                              on_row: Optional[Callable[[Dict[str, str]], None]] = None) -> List[Dict[str, str]]:
+        results: List[Dict[str, str]] = []
+        async for row in self.iter_category(query, max_pages=max_pages):
+            if on_row:
+                on_row(row)
+            results.append(row)
         return results
 
 
@@ -104,30 +291,48 @@ def _category_to_query(category: str) -> str:
     return mapping.get((category or "").lower(), category or "")
 
 
-def scrape_category_sync(category: str, max_pages: int = 1) -> List[Dict[str, str]]:
-    """Synchronous wrapper for Flask route usage."""
-    async def _run() -> List[Dict[str, str]]:
-        scraper = FlipkartPlaywrightScraper()
-        await scraper.start()
-        try:
-            query = _category_to_query(category)
-            return await scraper.scrape_category(query, max_pages=max_pages)
-        finally:
-            await scraper.close()
+SCRAPER_CONCURRENCY = int(os.environ.get("SCRAPER_CONCURRENCY", "4"))
+SCRAPER_BLOCK_RESOURCES = os.environ.get("SCRAPER_BLOCK_RESOURCES", "1") != "0"
+SCRAPER_LISTING_JS = os.environ.get("SCRAPER_LISTING_JS", "1") != "0"
+
 
+async def _run_scraper(scraper: "FlipkartPlaywrightScraper", category: str, max_pages: int,
+                       on_row: Optional[Callable[[Dict[str, str]], None]]) -> List[Dict[str, str]]:
+    def _enrich(row: Dict[str, str]) -> None:
+        row.update(scraped_at=datetime.now().isoformat(), source="flipkart", category=category, time_filter="")
+        if on_row:
+            on_row(row)
+
+    await scraper.start()
     try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    # If loop is already running (e.g., in certain environments), create a new one
-    if loop.is_running():
-        new_loop = asyncio.new_event_loop()
-        try:
-            return new_loop.run_until_complete(_run())
-        finally:
-            new_loop.close()
-    else:
-        return loop.run_until_complete(_run())
+        return await scraper.scrape_category(_category_to_query(category), max_pages=max_pages, on_row=_enrich)
+    finally:
+        await scraper.close()
+        log.info("Scrape stats for %s: %s cache=%s", category, scraper.summary(), scraper.cache.stats)
+
+
+async def _scrape_with_pool(category: str, max_pages: int,
+                            on_row: Optional[Callable[[Dict[str, str]], None]] = None) -> List[Dict[str, str]]:
+    options = dict(concurrency=SCRAPER_CONCURRENCY, block_resources=SCRAPER_BLOCK_RESOURCES,
+                   listing_javascript=SCRAPER_LISTING_JS, index=get_scrape_index())
+    if get_response_cache().replay:
+        # Offline re-parse of cached pages: no browser needed
+        return await _run_scraper(FlipkartPlaywrightScraper(**options), category, max_pages, on_row)
+    async with get_browser_manager().context() as context:
+        return await _run_scraper(FlipkartPlaywrightScraper(context=context, **options), category, max_pages, on_row)
+
+
+def scrape_category_sync(category: str, max_pages: int = 1,
+                         on_row: Optional[Callable[[Dict[str, str]], None]] = None) -> List[Dict[str, str]]:
+    """Synchronous wrapper for Flask route usage; runs on the shared browser.
+
+    on_row is called (on the browser thread) for every row as soon as it is scraped.
+    """
+    return get_browser_manager().run(_scrape_with_pool, category, max_pages, on_row)
 
 
+def scrape_categories_sync(categories: List[str], max_pages: int = 1) -> Dict[str, List[Dict[str, str]]]:
+    """Scrape several categories concurrently on the shared browser, one context each."""
+    manager = get_browser_manager()
+    futures = {cat: manager.submit(_scrape_with_pool, cat, max_pages) for cat in categories}
+    return {cat: fut.result() for cat, fut in futures.items()}
@@ -1,10 +1,20 @@
 import os
 import csv
+import time
+import random
+import asyncio
+import threading
 from datetime import datetime
-from typing import List, Dict, Tuple
+from email.utils import parsedate_to_datetime
+from typing import List, Dict, Tuple, Optional
+from urllib.parse import urlsplit
 
 import requests
-from bs4 import BeautifulSoup
+import aiohttp
+
+from flipkart_parsing import parse_search_page
+from http_cache import ResponseCache, get_response_cache
+from scrape_index import row_key
 
 
 HEADERS = {
@@ -12,6 +22,14 @@ HEADERS = {
     "Accept-Language": "en-US,en;q=0.9",
 }
 
+# Point at a local stand-in (see flipkart_standin_server.py) to scrape offline
+FLIPKART_BASE_URL = os.environ.get("FLIPKART_BASE_URL", "https://www.flipkart.com").rstrip("/")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Background scrape jobs may upsert into the same CSV concurrently
+_csv_lock = threading.Lock()
+
 
 def _category_to_query(category: str) -> str:
     mapping = {
@@ -22,73 +40,131 @@ def _category_to_query(category: str) -> str:
     return mapping.get((category or "").lower(), category or "")
 
 
-def _build_search_urls(query: str, pages: int = 2) -> List[str]:
+def _build_search_urls(query: str, pages: int = 2, base_url: str = FLIPKART_BASE_URL) -> List[str]:
     # Flipkart search URL pattern; keep pages small to be polite
-    base = "https://www.flipkart.com/search?q="
+    base = f"{base_url}/search?q="
     return [f"{base}{requests.utils.quote(query)}&page={p}" for p in range(1, pages + 1)]
 
 
-def _parse_search_page(html: str) -> List[Dict[str, str]]:
-    soup = BeautifulSoup(html, "html.parser")
-    items: List[Dict[str, str]] = []
+def _parse_search_page(html: str, base_url: str = FLIPKART_BASE_URL) -> List[Dict[str, str]]:
+    return parse_search_page(html, base_url=base_url)
 
-    # Flipkart uses multiple card templates; try a few common ones
-    cards = []
-    cards.extend(soup.select("div._1AtVbE"))
-    cards.extend(soup.select("div._2kHMtA"))
-    cards.extend(soup.select("div._4ddWXP"))
 
-    for card in cards:
-        title_el = card.select_one("a.s1Q9rs, a.IRpwTa, ._4rR01T")
-        if not title_el:
-            continue
-        name = title_el.get_text(strip=True)
-        link = title_el.get("href") or title_el.get("to")
-        if link and link.startswith("/"):
-            link = "https://www.flipkart.com" + link
+class TokenBucket:
+    """Async token bucket: `rate` tokens per second, bursting up to `capacity`."""
 
-        price_el = card.select_one("._30jeq3._1_WHN1, ._30jeq3")
-        price = price_el.get_text(strip=True) if price_el else ""
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
 
-        details_el = card.select_one("ul._1xgFaf, ul._1xgFaf li, .IRpwTa")
-        details = details_el.get_text(" | ", strip=True) if details_el else ""
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
-        img_el = card.select_one("img._396cs4, img._2r_T1I, img._1a8UBa")
-        image_url = img_el.get("src") if img_el else ""
 
-        if name:
-            items.append({
-                "name": name,
-                "price": price,
-                "details": details,
-                "product_link": link or "",
-                "image_url": image_url or "",
-            })
+class AsyncFlipkartFetcher:
+    """Pooled aiohttp client with per-host concurrency, rate limiting and retries.
 
-    return items
+    One keep-alive connection pool is shared by every request, so pages after
+    the first reuse the TLS session instead of paying a new handshake.
+    """
 
+    def __init__(self, concurrency: int = 8, per_host: int = 4, rate: float = 4.0,
+                 retries: int = 3, backoff: float = 0.5, timeout: float = 15.0,
+                 cache: Optional[ResponseCache] = None):
+        self.cache = cache or get_response_cache()
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bucket = TokenBucket(rate, capacity=max(1.0, rate))
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._host_limits: Dict[str, asyncio.Semaphore] = {}
+        self.stats = {"pages": 0, "failed": 0, "retries": 0, "bytes": 0}
 
-def scrape_flipkart_category(category: str, time_filter: str, max_pages: int = 2) -> List[Dict[str, str]]:
-    """Scrape Flipkart listing results for a category keyword.
+    async def __aenter__(self) -> "AsyncFlipkartFetcher":
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host,
+                                         keepalive_timeout=30, ttl_dns_cache=300)
+        self._session = aiohttp.ClientSession(
+            headers=HEADERS,
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
 
-    time_filter is accepted for future extension but not used (Flipkart search lacks simple time filters).
-    """
-    query = _category_to_query(category)
-    if not query:
-        return []
+    async def __aexit__(self, *exc) -> None:
+        if self._session:
+            await self._session.close()
+            self._session = None
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        if host not in self._host_limits:
+            self._host_limits[host] = asyncio.Semaphore(self.per_host)
+        return self._host_limits[host]
+
+    def _retry_delay(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        # Full jitter exponential backoff
+        return random.uniform(0, self.backoff * (2 ** attempt))
 
-    urls = _build_search_urls(query, pages=max_pages)
-    results: List[Dict[str, str]] = []
-    for url in urls:
-        try:
-            resp = requests.get(url, headers=HEADERS, timeout=10)
-            if resp.status_code != 200:
-                continue
-            items = _parse_search_page(resp.text)
-            results.extend(items)
-        except Exception:
-            continue
+    async def fetch(self, url: str) -> Optional[str]:
+        """Return the page body, or None once retries are exhausted."""
+        cached = await self.cache.alookup(url)
+        if cached is not None:
+            self.stats["pages"] += 1
+            return cached
+        async with self._host_limit(url):
+            for attempt in range(self.retries + 1):
+                await self.bucket.acquire()
+                retry_after = None
+                try:
+                    headers = await self.cache.aconditional_headers(url)
+                    async with self._session.get(url, headers=headers) as resp:
+                        if resp.status == 304:
+                            body = await self.cache.arevalidated(url)
+                            if body is not None:
+                                self.stats["pages"] += 1
+                                return body
+                        if resp.status == 200:
+                            body = await resp.text()
+                            self.stats["pages"] += 1
+                            self.stats["bytes"] += len(body)
+                            await self.cache.astore(url, body, dict(resp.headers))
+                            return body
+                        if resp.status not in RETRY_STATUSES:
+                            break
+                        retry_after = resp.headers.get("Retry-After")
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    pass
+                if attempt < self.retries:
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self._retry_delay(attempt, retry_after))
+        self.stats["failed"] += 1
+        return None
 
+
+def _dedupe_and_enrich(results: List[Dict[str, str]], category: str, time_filter: str) -> List[Dict[str, str]]:
     # Deduplicate by link then name
     seen = set()
     unique: List[Dict[str, str]] = []
@@ -105,10 +181,57 @@ def scrape_flipkart_category(category: str, time_filter: str, max_pages: int = 2
         item["source"] = "flipkart"
         item["category"] = category
         item["time_filter"] = time_filter or ""
-
     return unique
 
 
+async def scrape_flipkart_categories_async(categories: List[str], time_filter: str = "", max_pages: int = 2,
+                                           base_url: str = FLIPKART_BASE_URL,
+                                           **fetcher_kwargs) -> Tuple[Dict[str, List[Dict[str, str]]], Dict[str, float]]:
+    """Fetch every search page of every category concurrently.
+
+    Returns ({category: rows}, stats) where stats includes pages_per_sec.
+    """
+    jobs: List[Tuple[str, str]] = []
+    for category in categories:
+        query = _category_to_query(category)
+        if query:
+            jobs.extend((category, url) for url in _build_search_urls(query, pages=max_pages, base_url=base_url))
+
+    started = time.perf_counter()
+    async with AsyncFlipkartFetcher(**fetcher_kwargs) as fetcher:
+        bodies = await asyncio.gather(*(fetcher.fetch(url) for _, url in jobs))
+        stats: Dict[str, float] = dict(fetcher.stats)
+    elapsed = time.perf_counter() - started
+    stats["cache"] = dict(get_response_cache().stats)
+
+    raw: Dict[str, List[Dict[str, str]]] = {c: [] for c in categories}
+    for (category, _), body in zip(jobs, bodies):
+        if body:
+            raw[category].extend(_parse_search_page(body, base_url=base_url))
+    results = {c: _dedupe_and_enrich(rows, c, time_filter) for c, rows in raw.items()}
+
+    stats["elapsed_s"] = round(elapsed, 3)
+    stats["pages_per_sec"] = round(stats["pages"] / elapsed, 2) if elapsed > 0 else 0.0
+    return results, stats
+
+
+def scrape_flipkart_categories(categories: List[str], time_filter: str = "", max_pages: int = 2,
+                               **kwargs) -> Tuple[Dict[str, List[Dict[str, str]]], Dict[str, float]]:
+    """Synchronous wrapper around scrape_flipkart_categories_async."""
+    return asyncio.run(scrape_flipkart_categories_async(categories, time_filter, max_pages, **kwargs))
+
+
+def scrape_flipkart_category(category: str, time_filter: str, max_pages: int = 2) -> List[Dict[str, str]]:
+    """Scrape Flipkart listing results for a category keyword.
+
+    time_filter is accepted for future extension but not used (Flipkart search lacks simple time filters).
+    """
+    if not _category_to_query(category):
+        return []
+    results, _ = scrape_flipkart_categories([category], time_filter, max_pages=max_pages)
+    return results.get(category, [])
+
+
 def write_scraped_csv(rows: List[Dict[str, str]], csv_path: str) -> Tuple[str, int]:
     if not rows:
         return csv_path, 0
@@ -127,3 +250,67 @@ def write_scraped_csv(rows: List[Dict[str, str]], csv_path: str) -> Tuple[str, i
     return csv_path, len(rows)
 
 
+def upsert_scraped_csv(rows: List[Dict[str, str]], csv_path: str) -> Tuple[str, int]:
+    """Replace rows already in the CSV (matched by product link, else name) and append new ones.
+
+    The file is rewritten to a temp file and swapped in, so readers never see a partial CSV.
+    """
+    if not rows:
+        return csv_path, 0
+    os.makedirs(os.path.dirname(csv_path), exist_ok=True)
+    fieldnames = [
+        "scraped_at", "source", "category", "time_filter",
+        "name", "price", "details", "product_link", "image_url",
+    ]
+    incoming = {row_key(r): r for r in rows if row_key(r)}
+    tmp_path = csv_path + ".tmp"
+    with _csv_lock:
+        with open(tmp_path, mode="w", newline="", encoding="utf-8") as out:
+            writer = csv.DictWriter(out, fieldnames=fieldnames)
+            writer.writeheader()
+            if os.path.exists(csv_path):
+                with open(csv_path, newline="", encoding="utf-8") as f:
+                    for existing in csv.DictReader(f):
+                        replacement = incoming.pop(row_key(existing), None)
+                        source = replacement if replacement is not None else existing
+                        writer.writerow({k: source.get(k, "") for k in fieldnames})
+            for r in incoming.values():
+                writer.writerow({k: r.get(k, "") for k in fieldnames})
+            out.flush()
+            os.fsync(out.fileno())
+        # Swap only once the temp file is closed (Windows can't replace an open file)
+        os.replace(tmp_path, csv_path)
+    return csv_path, len(rows)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Scrape Flipkart search listings concurrently.")
+    parser.add_argument("categories", nargs="*", default=["protein", "mobile", "laptop"])
+    parser.add_argument("--pages", type=int, default=2)
+    parser.add_argument("--base-url", default=FLIPKART_BASE_URL)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=4.0, help="requests per second (0 = unlimited)")
+    parser.add_argument("--csv", help="upsert new or changed results into this CSV")
+    parser.add_argument("--store", action="store_true", help="append snapshots to the scrape store")
+    args = parser.parse_args()
+
+    by_category, run_stats = scrape_flipkart_categories(
+        args.categories, max_pages=args.pages, base_url=args.base_url.rstrip("/"),
+        concurrency=args.concurrency, per_host=args.per_host, rate=args.rate,
+    )
+    for cat, rows in by_category.items():
+        print(f"{cat}: {len(rows)} products")
+    print(f"pages={run_stats['pages']} failed={run_stats['failed']} retries={run_stats['retries']} "
+          f"elapsed={run_stats['elapsed_s']}s pages/sec={run_stats['pages_per_sec']}")
+    if args.csv:
+        from scrape_index import get_scrape_index
+        changed = get_scrape_index().record([r for rows in by_category.values() for r in rows])
+        upsert_scraped_csv(changed, args.csv)
+        print(f"{len(changed)} new or changed rows written to {args.csv}")
+    if args.store:
+        from scrape_store import SCRAPE_STORE_DB, get_scrape_store
+        count = get_scrape_store().write_rows(r for rows in by_category.values() for r in rows)
+        print(f"{count} snapshots stored in {SCRAPE_STORE_DB}")
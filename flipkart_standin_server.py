@@ -0,0 +1,210 @@
+"""Local stand-in for Flipkart search and product pages, for offline scraping.
+
+Serves saved HTML from --pages-dir when present, otherwise renders listing and
+product pages from the catalog CSVs in data/ using the same class names the
+scrapers look for. Run it and point the scrapers at it:
+
+    python flipkart_standin_server.py --port 8765
+    FLIPKART_BASE_URL=http://127.0.0.1:8765 python flipkart_scraper.py --rate 0
+"""
+import csv
+import hashlib
+import html
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+
+PAGE_SIZE = 24
+
+CATALOGS = {
+    "protein": "data/protein.csv",
+    "mobile": "data/mobile.csv",
+    "laptop": "data/laptop.csv",
+}
+
+
+def _slug(text: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", (text or "").strip().lower()).strip("-")[:80] or "item"
+
+
+def load_catalog(data_dir: str = ".") -> Dict[str, List[Dict[str, str]]]:
+    catalog: Dict[str, List[Dict[str, str]]] = {}
+    for cat, rel in CATALOGS.items():
+        path = os.path.join(data_dir, rel)
+        rows: List[Dict[str, str]] = []
+        if os.path.exists(path):
+            with open(path, newline="", encoding="utf-8") as f:
+                for i, row in enumerate(csv.DictReader(f)):
+                    name = row.get("name") or row.get("Product Name") or ""
+                    rows.append({
+                        "name": name,
+                        "price": row.get("price") or row.get("Price") or "",
+                        "details": row.get("details") or row.get("Details") or "",
+                        "image_url": row.get("image_url") or row.get("Image") or "",
+                        "path": f"/{_slug(name)}/p/itm{cat[:3]}{i:05d}",
+                    })
+        catalog[cat] = rows
+    return catalog
+
+
+def _category_for_query(query: str) -> Optional[str]:
+    q = (query or "").lower()
+    for cat, words in (("protein", ("protein", "whey")), ("mobile", ("mobile", "phone")), ("laptop", ("laptop",))):
+        if any(w in q for w in words):
+            return cat
+    return None
+
+
+def render_listing(rows: List[Dict[str, str]]) -> str:
+    cards = []
+    for r in rows:
+        details = "".join(f"<li>{html.escape(d.strip())}</li>" for d in r["details"].split("|") if d.strip())
+        cards.append(
+            '<div class="_1AtVbE"><div class="_2kHMtA">'
+            f'<a class="s1Q9rs" href="{r["path"]}?pid=x&amp;lid=y">{html.escape(r["name"])}</a>'
+            f'<div class="_30jeq3 _1_WHN1">{html.escape(r["price"])}</div>'
+            f'<ul class="_1xgFaf">{details}</ul>'
+            f'<img class="_396cs4" src="{html.escape(r["image_url"])}"/>'
+            "</div></div>"
+        )
+    return f"<html><head><title>Search</title></head><body><div id='container'>{''.join(cards)}</div></body></html>"
+
+
+def render_product(row: Dict[str, str]) -> str:
+    details = " ".join(f"<p>{html.escape(d.strip())}</p>" for d in row["details"].split("|") if d.strip())
+    return (
+        "<html><head><title>Product</title></head><body>"
+        f'<div class="DOjaWF gdgoEp col-8-12"><h1><span class="VU-ZEz">{html.escape(row["name"])}</span></h1>'
+        f'<div class="Nx9bqj">{html.escape(row["price"])}</div>{details}</div>'
+        "</body></html>"
+    )
+
+
+class StandinServer:
+    """Threaded HTTP stand-in. Use as a context manager in scripts and benchmarks."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, pages_dir: Optional[str] = None,
+                 data_dir: str = ".", latency: float = 0.0, error_rate: float = 0.0):
+        self.catalog = load_catalog(data_dir)
+        self.products = {r["path"]: r for rows in self.catalog.values() for r in rows}
+        self.pages_dir = pages_dir
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests_served = 0
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _saved_page(self, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        if not self.pages_dir:
+            return None
+        if path == "/search":
+            name = f"search_{_slug(query.get('q', [''])[0])}_p{query.get('page', ['1'])[0]}.html"
+        else:
+            name = _slug(path) + ".html"
+        full = os.path.join(self.pages_dir, name)
+        if os.path.exists(full):
+            with open(full, "rb") as f:
+                return f.read()
+        return None
+
+    def render(self, path: str, query: Dict[str, List[str]]) -> Optional[bytes]:
+        saved = self._saved_page(path, query)
+        if saved is not None:
+            return saved
+        if path == "/search":
+            cat = _category_for_query(query.get("q", [""])[0])
+            rows = self.catalog.get(cat, []) if cat else []
+            try:
+                page = max(1, int(query.get("page", ["1"])[0]))
+            except ValueError:
+                page = 1
+            return render_listing(rows[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]).encode("utf-8")
+        row = self.products.get(path)
+        return render_product(row).encode("utf-8") if row else None
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests_served += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if server.error_rate and random.random() < server.error_rate:
+                    self.send_response(random.choice([429, 503]))
+                    self.send_header("Retry-After", "0")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                parts = urlsplit(self.path)
+                body = server.render(parts.path, parse_qs(parts.query))
+                if body is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def start(self) -> "StandinServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "StandinServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve saved/synthesized Flipkart pages locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages-dir", help="directory of saved HTML pages to serve first")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of 429/503 responses")
+    args = parser.parse_args()
+
+    srv = StandinServer(args.host, args.port, args.pages_dir, latency=args.latency, error_rate=args.error_rate)
+    print(f"Serving Flipkart stand-in on {srv.base_url}")
+    try:
+        srv.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
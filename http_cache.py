@@ -0,0 +1,183 @@
+"""On-disk HTTP response cache shared by flipkart_scraper and flipkart_playwright_scraper.
+
+Bodies are stored gzip-compressed under data/http_cache/<sha[:2]>/<sha>.html.gz,
+keyed by URL, with a JSON sidecar holding the fetch time and validators.
+
+Modes (SCRAPE_CACHE_MODE):
+    off      never read or write the cache
+    use      serve fresh entries, revalidate stale ones with ETag/Last-Modified (default)
+    refresh  always hit the network, but store what comes back
+    replay   serve only from the cache; misses return an empty body, no network at all
+
+Async fetchers use the a*() variants, which do the gzip/JSON file I/O in a
+worker thread so the event loop keeps serving other requests meanwhile.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+
+CACHE_MODES = ("off", "use", "refresh", "replay")
+
+
+class ResponseCache:
+    def __init__(self, root: str = "data/http_cache", ttl: float = 24 * 3600, mode: str = "use"):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode {mode!r}; expected one of {CACHE_MODES}")
+        self.root = root
+        self.ttl = ttl
+        self.mode = mode
+        self.stats = {"hits": 0, "misses": 0, "revalidated": 0, "stored": 0}
+        self._lock = threading.Lock()
+
+    @property
+    def replay(self) -> bool:
+        return self.mode == "replay"
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        base = os.path.join(self.root, digest[:2], digest)
+        return base + ".html.gz", base + ".json"
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def entry(self, url: str) -> Optional[Tuple[str, Dict]]:
+        """Return (body, meta) for url, or None if it was never cached."""
+        body_path, meta_path = self._paths(url)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with gzip.open(body_path, "rt", encoding="utf-8") as f:
+                return f.read(), meta
+        except (OSError, ValueError):
+            return None
+
+    def is_fresh(self, meta: Dict) -> bool:
+        return time.time() - meta.get("fetched_at", 0) < self.ttl
+
+    def lookup(self, url: str) -> Optional[str]:
+        """Body to serve without touching the network, or None to go fetch.
+
+        In replay mode a miss returns "" so callers see an empty page instead of fetching.
+        """
+        if self.mode in ("off", "refresh"):
+            return None
+        cached = self.entry(url)
+        if cached and (self.replay or self.is_fresh(cached[1])):
+            self._count("hits")
+            return cached[0]
+        if self.replay:
+            # Counted only; the scrape summary line reports cache stats
+            self._count("misses")
+            return ""
+        return None
+
+    async def alookup(self, url: str) -> Optional[str]:
+        if self.mode in ("off", "refresh"):
+            return None
+        return await asyncio.to_thread(self.lookup, url)
+
+    def conditional_headers(self, url: str) -> Dict[str, str]:
+        """If-None-Match / If-Modified-Since for a stale entry, if it has validators."""
+        if self.mode != "use":
+            return {}
+        cached = self.entry(url)
+        if not cached:
+            return {}
+        meta = cached[1]
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+        return headers
+
+    async def aconditional_headers(self, url: str) -> Dict[str, str]:
+        if self.mode != "use":
+            return {}
+        return await asyncio.to_thread(self.conditional_headers, url)
+
+    def revalidated(self, url: str) -> Optional[str]:
+        """Handle a 304: bump the fetch time and return the cached body."""
+        cached = self.entry(url)
+        if not cached:
+            return None
+        body, meta = cached
+        meta["fetched_at"] = time.time()
+        self._write_meta(url, meta)
+        self._count("revalidated")
+        return body
+
+    async def arevalidated(self, url: str) -> Optional[str]:
+        return await asyncio.to_thread(self.revalidated, url)
+
+    def store(self, url: str, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+        if self.mode in ("off", "replay") or not body:
+            return
+        headers = {k.lower(): v for k, v in (headers or {}).items()}
+        body_path, _ = self._paths(url)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        tmp = f"{body_path}.{threading.get_ident()}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8", compresslevel=6) as f:
+            f.write(body)
+        os.replace(tmp, body_path)
+        self._write_meta(url, {
+            "url": url,
+            "fetched_at": time.time(),
+            "etag": headers.get("etag"),
+            "last_modified": headers.get("last-modified"),
+        })
+        self._count("stored")
+
+    async def astore(self, url: str, body: str, headers: Optional[Dict[str, str]] = None) -> None:
+        if self.mode in ("off", "replay") or not body:
+            return
+        await asyncio.to_thread(self.store, url, body, headers)
+
+    def _write_meta(self, url: str, meta: Dict) -> None:
+        _, meta_path = self._paths(url)
+        tmp = f"{meta_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def iter_urls(self) -> Iterator[str]:
+        """Every cached URL, e.g. to re-run a parser over saved pages."""
+        for dirpath, _, files in os.walk(self.root):
+            for name in files:
+                if name.endswith(".json"):
+                    try:
+                        with open(os.path.join(dirpath, name), encoding="utf-8") as f:
+                            yield json.load(f)["url"]
+                    except (OSError, ValueError, KeyError):
+                        continue
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide cache configured from SCRAPE_CACHE_MODE / _DIR / _TTL."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                root=os.environ.get("SCRAPE_CACHE_DIR", os.path.join("data", "http_cache")),
+                ttl=float(os.environ.get("SCRAPE_CACHE_TTL", str(24 * 3600))),
+                mode=os.environ.get("SCRAPE_CACHE_MODE", "use").lower(),
+            )
+        return _cache
+
+
+if __name__ == "__main__":
+    cache = get_response_cache()
+    urls = list(cache.iter_urls())
+    print(f"{len(urls)} cached pages under {cache.root}")
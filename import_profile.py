@@ -0,0 +1,107 @@
+"""Cold-start profile of the Flask app: import time, RSS and which heavy modules got loaded.
+
+Each measurement runs in a fresh interpreter with `-X importtime`:
+    startup   import app (what every worker pays)
+    pages     plus one request to /home
+    check     plus one request to a check-blueprint route (loads the OCR stack)
+    reports   plus one request to a reports route
+
+    python import_profile.py                 # table + top imports
+    python import_profile.py --json          # machine readable
+    python import_profile.py --max-startup-ms 400 --max-startup-rss-mb 80   # exit 1 if over budget
+
+The startup stage must not import any HEAVY_MODULES; that is checked too.
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+HEAVY_MODULES = ("cv2", "pytesseract", "reportlab", "pypdf", "aiohttp", "numpy", "playwright")
+
+STAGES = {
+    "startup": "",
+    "pages": "c.get('/home')",
+    "check": "c.get('/quality/stats')",
+    "reports": "c.get('/get_compliance_checks')",
+}
+
+_CHILD = '''
+import resource, sys, time
+t = time.perf_counter()
+import app
+elapsed = time.perf_counter() - t
+if {request!r}:
+    c = app.app.test_client()
+    with c.session_transaction() as s:
+        s["user"] = "profile"
+    {request}
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("PROFILE", elapsed, rss_kb, ",".join(m for m in {heavy!r} if m in sys.modules))
+'''
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def profile_stage(request: str, cwd: str) -> Dict:
+    code = _CHILD.format(request=request, heavy=HEAVY_MODULES)
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=cwd,
+                          capture_output=True, text=True, timeout=300)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith("PROFILE ")), None)
+    if line is None:
+        raise RuntimeError(f"profile run failed:\n{proc.stderr[-2000:]}")
+    _, elapsed, rss_kb, heavy = line.split(" ", 3)
+    top: List[Tuple[int, str]] = []
+    for m in _IMPORTTIME.finditer(proc.stderr):
+        # Direct imports made by app.py (one nesting level down) show where startup time goes
+        if len(m.group(3)) == 3:
+            top.append((int(m.group(2)), m.group(4)))
+    top.sort(reverse=True)
+    return {
+        "import_ms": round(float(elapsed) * 1000, 1),
+        "rss_mb": round(int(rss_kb) / 1024, 1),
+        "heavy_loaded": [m for m in heavy.strip().split(",") if m],
+        "top_imports_ms": [(name, round(us / 1000, 1)) for us, name in top[:10]],
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure app cold-start import time and RSS.")
+    parser.add_argument("--cwd", default=os.path.dirname(os.path.abspath(__file__)))
+    parser.add_argument("--stages", default=",".join(STAGES), help="comma-separated subset of " + ",".join(STAGES))
+    parser.add_argument("--json", action="store_true")
+    parser.add_argument("--max-startup-ms", type=float, default=None)
+    parser.add_argument("--max-startup-rss-mb", type=float, default=None)
+    args = parser.parse_args()
+
+    results = {stage: profile_stage(STAGES[stage], args.cwd) for stage in args.stages.split(",")}
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for stage, r in results.items():
+            print(f"{stage:8s} import {r['import_ms']:8.1f} ms   rss {r['rss_mb']:6.1f} MB   "
+                  f"heavy: {', '.join(r['heavy_loaded']) or '-'}")
+        if "startup" in results:
+            print("\nslowest imports at startup (one level below app/site):")
+            for name, ms in results["startup"]["top_imports_ms"]:
+                print(f"  {ms:8.1f} ms  {name}")
+
+    failures = []
+    startup = results.get("startup")
+    if startup:
+        if startup["heavy_loaded"]:
+            failures.append(f"startup imported heavy modules: {', '.join(startup['heavy_loaded'])}")
+        if args.max_startup_ms is not None and startup["import_ms"] > args.max_startup_ms:
+            failures.append(f"startup import {startup['import_ms']} ms > {args.max_startup_ms} ms")
+        if args.max_startup_rss_mb is not None and startup["rss_mb"] > args.max_startup_rss_mb:
+            failures.append(f"startup RSS {startup['rss_mb']} MB > {args.max_startup_rss_mb} MB")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Low-overhead pipeline metrics: per-stage latency histograms, error counters and in-flight gauges.
+
+    with timed("tesseract"):                  # as a context manager
+        text = pytesseract.image_to_string(img)
+
+    @timed("extract_fields")                  # or as a decorator
+    def extract_product_fields(text): ...
+
+Every observation is labelled with its stage, the route being served (set per
+request by bp_metrics, or by trace() for background jobs; "-" otherwise) and
+the camera where one is involved (registered camera ids only; ad-hoc ?url=
+snapshots share the label "adhoc" so label cardinality stays fixed). render_prometheus() gives the text format
+served at /metrics.
+
+Each traced request or job also writes one JSON line to the
+"compliance.timing" logger with its total time, milliseconds per stage and any
+annotate()d fields. Only traces that hit an instrumented stage, or took longer
+than TIMING_LOG_SLOW_MS, are logged; TIMING_LOG=0 turns the lines off.
+
+A timer costs two perf_counter() calls and two short lock holds (about 2 us).
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+TIMING_LOG = os.environ.get("TIMING_LOG", "1") != "0"
+TIMING_LOG_SLOW_MS = float(os.environ.get("TIMING_LOG_SLOW_MS", "1000"))
+
+# Seconds; covers a 1 ms SQLite write up to a 30 s camera timeout
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+timing_log = logging.getLogger("compliance.timing")
+if not timing_log.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    timing_log.addHandler(_handler)
+    timing_log.setLevel(logging.INFO)
+    timing_log.propagate = False
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    """Metric families keyed by (name, labels); all updates take one lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            family = self._histograms.setdefault(name, {})
+            hist = family.get(labels)
+            if hist is None:
+                hist = family[labels] = Histogram()
+            hist.observe(value)
+
+    def inc(self, name: str, labels: Labels, amount: float = 1.0) -> None:
+        with self._lock:
+            family = self._counters.setdefault(name, {})
+            family[labels] = family.get(labels, 0.0) + amount
+
+    def add_gauge(self, name: str, labels: Labels, amount: float) -> None:
+        with self._lock:
+            family = self._gauges.setdefault(name, {})
+            family[labels] = family.get(labels, 0.0) + amount
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            histograms = {n: {k: (list(h.counts), h.sum, h.count) for k, h in f.items()}
+                          for n, f in self._histograms.items()}
+            counters = {n: dict(f) for n, f in self._counters.items()}
+            gauges = {n: dict(f) for n, f in self._gauges.items()}
+        lines: List[str] = []
+        for name, family in sorted(histograms.items()):
+            self._header(lines, name, "histogram")
+            for labels, (counts, total, count) in sorted(family.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS, counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', repr(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels + (('le', '+Inf'),))} {count}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {total!r}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {count}")
+        for kind, families in (("counter", counters), ("gauge", gauges)):
+            for name, family in sorted(families.items()):
+                self._header(lines, name, kind)
+                for labels, value in sorted(family.items()):
+                    lines.append(f"{name}{_fmt_labels(labels)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+
+def _fmt_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                          for k, v in labels) + "}"
+
+
+registry = Registry()
+registry.describe("compliance_stage_duration_seconds", "Time spent in one pipeline stage.")
+registry.describe("compliance_stage_errors_total", "Pipeline stage calls that raised.")
+registry.describe("compliance_stage_in_flight", "Pipeline stage calls currently running.")
+registry.describe("compliance_http_request_duration_seconds", "HTTP request latency by route template.")
+registry.describe("compliance_http_requests_in_flight", "HTTP requests currently being served.")
+
+
+# -----------------------------
+# Traces: one per request or background job
+# -----------------------------
+class Trace:
+    __slots__ = ("route", "started", "stages", "fields", "token")
+
+    def __init__(self, route: str):
+        self.route = route
+        self.token = None
+        self.started = time.perf_counter()
+        self.stages: Dict[str, List[float]] = {}
+        self.fields: Dict[str, Any] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        entry = self.stages.get(stage)
+        if entry is None:
+            self.stages[stage] = [seconds, 1]
+        else:
+            entry[0] += seconds
+            entry[1] += 1
+
+
+_trace: ContextVar[Optional[Trace]] = ContextVar("compliance_trace", default=None)
+
+
+def begin_trace(route: str) -> Trace:
+    current = Trace(route)
+    current.token = _trace.set(current)
+    return current
+
+
+def end_trace(trace: Trace, **fields: Any) -> float:
+    """Close a trace from begin_trace() and write its timing log line; returns its duration in seconds."""
+    elapsed = time.perf_counter() - trace.started
+    if trace.token is not None:
+        try:
+            _trace.reset(trace.token)
+        except ValueError:
+            # Ended from a different context than it began in; just detach it
+            _trace.set(None)
+        trace.token = None
+    if TIMING_LOG and (trace.stages or elapsed * 1000 >= TIMING_LOG_SLOW_MS):
+        record = {"route": trace.route, "ms": round(elapsed * 1000, 1)}
+        record.update(fields)
+        record["stages"] = {stage: round(total * 1000, 2) if calls == 1 else
+                            {"ms": round(total * 1000, 2), "calls": calls}
+                            for stage, (total, calls) in trace.stages.items()}
+        record.update(trace.fields)
+        timing_log.info(json.dumps(record, default=str))
+    return elapsed
+
+
+@contextmanager
+def trace(route: str, **fields: Any) -> Iterator[Trace]:
+    """Trace a background job (stream ingest, camera polling) like a request."""
+    current = begin_trace(route)
+    current.fields.update(fields)
+    try:
+        yield current
+    finally:
+        end_trace(current)
+
+
+def current_route() -> str:
+    current = _trace.get()
+    return current.route if current is not None else "-"
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields (paths, ids, scores) to the current trace's timing log line."""
+    current = _trace.get()
+    if current is not None:
+        current.fields.update(fields)
+
+
+# -----------------------------
+# Stage timers
+# -----------------------------
+class StageTimer:
+    """Context manager (or decorator) timing one stage; see timed()."""
+    __slots__ = ("stage", "camera", "_labels", "_trace", "_started")
+
+    def __init__(self, stage: str, camera: Optional[str] = None):
+        self.stage = stage
+        self.camera = camera
+
+    def __enter__(self) -> "StageTimer":
+        self._trace = _trace.get()
+        route = self._trace.route if self._trace is not None else "-"
+        self._labels = (("stage", self.stage), ("route", route), ("camera", self.camera or ""))
+        registry.add_gauge("compliance_stage_in_flight", self._labels, 1)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        elapsed = time.perf_counter() - self._started
+        registry.add_gauge("compliance_stage_in_flight", self._labels, -1)
+        registry.observe("compliance_stage_duration_seconds", self._labels, elapsed)
+        if exc_type is not None:
+            registry.inc("compliance_stage_errors_total", self._labels)
+        if self._trace is not None:
+            self._trace.add(self.stage, elapsed)
+        return False
+
+    def __call__(self, func):
+        stage, camera = self.stage, self.camera
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with StageTimer(stage, camera):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+def timed(stage: str, camera: Optional[str] = None) -> StageTimer:
+    return StageTimer(stage, camera)
+
+
+def render_prometheus() -> str:
+    return registry.render()
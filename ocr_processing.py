@@ -1,3 +1,4 @@
+import logging
 import os
 import platform
 from typing import Tuple, Optional
@@ -7,6 +8,10 @@ import pytesseract
 import cv2
 import numpy as np
 
+from metrics import annotate, timed
+
+log = logging.getLogger(__name__)
+
 
 # Set tesseract path
 if platform.system() == 'Windows':
@@ -17,6 +22,7 @@ else:
     os.environ['TESSDATA_PREFIX'] = "/usr/share/tesseract-ocr/5/tessdata"
 
 
+@timed("decode")
 def open_image_or_error(path: str) -> Image.Image:
     """Open image robustly or raise UnidentifiedImageError/Exception."""
     img = Image.open(path)
@@ -24,6 +30,7 @@ def open_image_or_error(path: str) -> Image.Image:
     return img
 
 
+@timed("preprocess")
 def preprocess_for_ocr(pil_img: Image.Image) -> Image.Image:
     """Lightweight preprocessing to improve OCR quality without OpenCV."""
     # Convert PIL image to OpenCV format
@@ -52,19 +59,21 @@ def perform_ocr(pil_img: Image.Image, fallback_to_original: bool = True) -> Tupl
 
     Returns (text, processed_image_used)
     """
-    print(f"[DEBUG] Tesseract cmd: {pytesseract.pytesseract.tesseract_cmd}")
     try:
         processed = preprocess_for_ocr(pil_img)
-        text = pytesseract.image_to_string(processed, config='--oem 3 --psm 6')
+        with timed("tesseract"):
+            text = pytesseract.image_to_string(processed, config='--oem 3 --psm 6')
         return text, processed
     except Exception as e:
-        print(f"[DEBUG] OCR failed on processed: {e}")
+        log.warning("OCR failed on processed image: %s", e)
+        annotate(ocr_fallback=str(e))
         if fallback_to_original:
             try:
-                text = pytesseract.image_to_string(pil_img, config='--oem 3 --psm 6')
+                with timed("tesseract"):
+                    text = pytesseract.image_to_string(pil_img, config='--oem 3 --psm 6')
                 return text, pil_img
             except Exception as e2:
-                print(f"[DEBUG] OCR failed on original: {e2}")
+                log.warning("OCR failed on original image: %s", e2)
                 raise e2
         raise
 
@@ -0,0 +1,147 @@
+"""Benchmark flipkart_parsing backends on saved pages: parse time and peak memory per page.
+
+Pages come from --pages-dir (*.html), the scrape response cache (--cache-dir,
+*.html.gz), or, by default, listing/product pages synthesized from the catalog
+CSVs and padded with script noise to roughly the size of real Flipkart pages.
+
+Each backend runs in its own process so peak RSS figures are comparable.
+
+    python parse_benchmark.py --cache-dir data/http_cache
+"""
+import argparse
+import glob
+import gzip
+import json
+import multiprocessing
+import os
+import resource
+import time
+import tracemalloc
+from typing import Dict, List, Tuple
+
+import flipkart_parsing
+
+
+def load_pages(pages_dir: str = None, cache_dir: str = None, pad_kb: int = 1500) -> List[Tuple[str, str]]:
+    """Return [(kind, html)] where kind is 'listing' or 'product'."""
+    pages: List[Tuple[str, str]] = []
+    paths = []
+    if pages_dir:
+        paths += glob.glob(os.path.join(pages_dir, "*.html"))
+    if cache_dir:
+        paths += glob.glob(os.path.join(cache_dir, "**", "*.html.gz"), recursive=True)
+    for path in paths:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            html = f.read()
+        kind = "product" if "VU-ZEz" in html else "listing"
+        pages.append((kind, html))
+    if pages:
+        return pages
+
+    from flipkart_standin_server import load_catalog, render_listing, render_product
+    noise = "<script>" + ("window.__INITIAL_STATE__ = {'k': 'v'};" * (pad_kb * 1024 // 38)) + "</script>"
+    for rows in load_catalog().values():
+        for start in range(0, len(rows), 24):
+            pages.append(("listing", render_listing(rows[start:start + 24]).replace("<body>", "<body>" + noise)))
+        for row in rows[:20]:
+            pages.append(("product", render_product(row).replace("<body>", "<body>" + noise)))
+    return pages
+
+
+def _parse(kind: str, html: str, backend: str, keep_raw_html: bool):
+    if kind == "listing":
+        flipkart_parsing.parse_search_page(html, backend=backend)
+        flipkart_parsing.parse_listing_links(html, backend=backend)
+    else:
+        flipkart_parsing.parse_product_details(html, keep_raw_html=keep_raw_html, backend=backend)
+
+
+def _rows(kind: str, html: str, backend: str):
+    if kind == "listing":
+        return (flipkart_parsing.parse_search_page(html, backend=backend),
+                flipkart_parsing.parse_listing_links(html, backend=backend))
+    return flipkart_parsing.parse_product_details(html, keep_raw_html=False, backend=backend)
+
+
+def check_equivalence(pages: List[Tuple[str, str]], backends: List[str]) -> Dict[str, int]:
+    """Pages on which each backend's rows differ from the full bs4 parse."""
+    mismatches = {b: 0 for b in backends if b != "bs4"}
+    for kind, html in pages:
+        expected = _rows(kind, html, "bs4")
+        for backend in mismatches:
+            if _rows(kind, html, backend) != expected:
+                mismatches[backend] += 1
+    return mismatches
+
+
+def run_backend(backend: str, pages: List[Tuple[str, str]], keep_raw_html: bool) -> Dict[str, Dict[str, float]]:
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    report: Dict[str, Dict[str, float]] = {}
+    for kind in ("listing", "product"):
+        subset = [html for k, html in pages if k == kind]
+        if not subset:
+            continue
+        times, peaks = [], []
+        for html in subset:
+            tracemalloc.start()
+            started = time.perf_counter()
+            _parse(kind, html, backend, keep_raw_html)
+            times.append(time.perf_counter() - started)
+            peaks.append(tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        report[kind] = {
+            "pages": len(subset),
+            "avg_kb_html": round(sum(len(h) for h in subset) / len(subset) / 1024, 1),
+            "ms_per_page": round(1000 * sum(times) / len(times), 2),
+            "peak_py_kib_per_page": round(max(peaks) / 1024, 1),
+        }
+    # ru_maxrss is KiB on Linux; includes C-level allocations tracemalloc can't see
+    report["peak_rss_growth_kib"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - rss_before
+    return report
+
+
+def _worker(args):
+    # Pages are loaded inside the child so RSS growth reflects parsing only
+    backend, load_args, keep_raw_html = args
+    return backend, run_backend(backend, load_pages(*load_args), keep_raw_html)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages-dir")
+    parser.add_argument("--cache-dir")
+    parser.add_argument("--pad-kb", type=int, default=1500, help="script padding for synthesized pages")
+    parser.add_argument("--backends", default=",".join(flipkart_parsing.BACKENDS))
+    parser.add_argument("--keep-raw-html", action="store_true")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--skip-check", action="store_true", help="don't compare backend output with bs4 first")
+    args = parser.parse_args()
+
+    load_args = (args.pages_dir, args.cache_dir, args.pad_kb)
+    available = [b for b in args.backends.split(",")
+                 if b != "selectolax" or flipkart_parsing._SelectolaxParser is not None]
+    if not args.skip_check:
+        # Padding is script noise every backend drops; a little keeps the check quick
+        check_pages = load_pages(args.pages_dir, args.cache_dir, min(args.pad_kb, 16))
+        mismatches = check_equivalence(check_pages, available)
+        for name, count in mismatches.items():
+            print(f"{name:13s} {'matches bs4' if not count else f'DIFFERS from bs4 on {count}'} "
+                  f"({len(check_pages)} pages)")
+        if any(mismatches.values()):
+            raise SystemExit(1)
+    ctx = multiprocessing.get_context("spawn")
+    results = {}
+    for name in available:
+        with ctx.Pool(1) as pool:
+            backend_name, report = pool.map(_worker, [(name, load_args, args.keep_raw_html)])[0]
+        results[backend_name] = report
+        for kind in ("listing", "product"):
+            if kind in report:
+                r = report[kind]
+                print(f"{backend_name:13s} {kind:8s} {r['pages']:4d} pages  {r['avg_kb_html']:8.1f} KiB  "
+                      f"{r['ms_per_page']:8.2f} ms/page  peak {r['peak_py_kib_per_page']:9.1f} KiB (py)")
+        print(f"{backend_name:13s} peak RSS growth {report['peak_rss_growth_kib']} KiB")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
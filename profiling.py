@@ -0,0 +1,278 @@
+"""Opt-in sampling profiler for single requests and background jobs.
+
+One sampler thread wakes every PROFILE_INTERVAL_MS while something is being
+profiled, reads sys._current_frames() and counts the stack of each profiled
+thread; nothing runs when no profile is active. The profiled code itself is
+not instrumented, so OCR and matching run at full speed between samples.
+
+A profile is taken when:
+    header    the request carries X-Profile: 1 and the session is logged in
+    toggle    the admin page armed "profile the next N requests" (optionally one route)
+    job       background jobs (stream ingest) are switched on in the admin page
+    rolling   rolling capture is on (PROFILE_ROLLING=1 or the admin page): every
+              request is sampled and the slowest PROFILE_SLOWEST_N per route kept
+
+Profiles are saved under PROFILE_DIR as collapsed stacks (<id>.folded, the
+flamegraph.pl / speedscope / inferno input) with a <id>.json sidecar, and can
+be exported as speedscope JSON. Toggles are per process.
+"""
+import heapq
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "data/profiles")
+PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_SLOWEST_N = int(os.environ.get("PROFILE_SLOWEST_N", "5"))
+PROFILE_ROLLING = os.environ.get("PROFILE_ROLLING", "0") == "1"
+PROFILE_HEADER = "X-Profile"
+MAX_STACK_DEPTH = 128
+
+
+class Profile:
+    __slots__ = ("id", "route", "method", "reason", "thread_id", "started_at", "started", "duration_ms",
+                 "status", "samples")
+
+    def __init__(self, route: str, method: Optional[str], reason: str):
+        now = datetime.now()
+        slug = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+        self.id = f"{now.strftime('%Y%m%d_%H%M%S_%f')}_{slug}"
+        self.route = route
+        self.method = method
+        self.reason = reason
+        self.thread_id = threading.get_ident()
+        self.started_at = now.isoformat(timespec="milliseconds")
+        self.started = time.perf_counter()
+        self.duration_ms = 0.0
+        self.status: Any = None
+        self.samples: Counter = Counter()
+
+    def meta(self, interval_ms: float) -> Dict[str, Any]:
+        return {"id": self.id, "route": self.route, "method": self.method, "reason": self.reason,
+                "started_at": self.started_at, "duration_ms": round(self.duration_ms, 1), "status": self.status,
+                "samples": sum(self.samples.values()), "interval_ms": interval_ms}
+
+
+class SamplingProfiler:
+    def __init__(self, directory: str = PROFILE_DIR, interval_ms: float = PROFILE_INTERVAL_MS,
+                 slowest_n: int = PROFILE_SLOWEST_N, rolling: bool = PROFILE_ROLLING):
+        self.directory = directory
+        self.interval_ms = interval_ms
+        self.slowest_n = slowest_n
+        self.rolling = rolling
+        self.jobs = False
+        self._armed = 0
+        self._armed_route: Optional[str] = None
+        self._lock = threading.Lock()
+        self._active: Dict[int, List[Profile]] = {}
+        self._labels: Dict[Any, str] = {}
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        # route -> min-heap of (duration_ms, id) for rolling captures kept on disk
+        self._slowest: Dict[str, List[Tuple[float, str]]] = {}
+        os.makedirs(directory, exist_ok=True)
+        for meta in self.list():
+            if meta.get("reason") == "rolling":
+                heapq.heappush(self._slowest.setdefault(meta["route"], []), (meta["duration_ms"], meta["id"]))
+
+    # -- toggles -------------------------------------------------------------
+    def arm(self, count: int, route: Optional[str] = None) -> None:
+        """Profile the next count requests (to route, if given)."""
+        with self._lock:
+            self._armed = max(0, count)
+            self._armed_route = route or None
+
+    def take_armed(self, route: str) -> bool:
+        with self._lock:
+            if self._armed and self._armed_route in (None, route):
+                self._armed -= 1
+                return True
+            return False
+
+    def settings(self) -> Dict[str, Any]:
+        return {"rolling": self.rolling, "jobs": self.jobs, "armed": self._armed, "armed_route": self._armed_route,
+                "interval_ms": self.interval_ms, "slowest_n": self.slowest_n, "directory": self.directory}
+
+    # -- sampling ------------------------------------------------------------
+    def start(self, route: str, method: Optional[str] = None, reason: str = "toggle") -> Profile:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+        profile = Profile(route, method, reason)
+        with self._lock:
+            self._active.setdefault(profile.thread_id, []).append(profile)
+        self._wake.set()
+        return profile
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            name = getattr(code, "co_qualname", code.co_name)
+            label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        interval = self.interval_ms / 1000
+        while True:
+            if not self._active:
+                self._wake.wait(1.0)
+                self._wake.clear()
+                continue
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, profiles in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is None:
+                        continue
+                    stack = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        stack.append(self._label(frame.f_code))
+                        frame = frame.f_back
+                    key = ";".join(reversed(stack))
+                    for profile in profiles:
+                        profile.samples[key] += 1
+            del frames
+            time.sleep(interval)
+
+    def finish(self, profile: Profile, status: Any = None) -> Optional[Dict[str, Any]]:
+        """Stop sampling; save the profile (rolling ones only if among the slowest). Returns its meta if saved."""
+        profile.duration_ms = (time.perf_counter() - profile.started) * 1000
+        profile.status = status
+        with self._lock:
+            profiles = self._active.get(profile.thread_id, [])
+            if profile in profiles:
+                profiles.remove(profile)
+            if not profiles:
+                self._active.pop(profile.thread_id, None)
+            evicted = None
+            if profile.reason == "rolling":
+                heap = self._slowest.setdefault(profile.route, [])
+                entry = (profile.duration_ms, profile.id)
+                if len(heap) < self.slowest_n:
+                    heapq.heappush(heap, entry)
+                elif heap and entry > heap[0]:
+                    evicted = heapq.heapreplace(heap, entry)[1]
+                else:
+                    return None
+        if evicted:
+            self.delete(evicted)
+        if not profile.samples:
+            # Faster than one sampling interval: record the request itself so the file is never empty
+            profile.samples[f"{profile.method or 'job'} {profile.route}"] += 1
+        return self._save(profile)
+
+    @contextmanager
+    def job(self, name: str) -> Iterator[Optional[Profile]]:
+        """Profile a background job when jobs or rolling capture are switched on."""
+        reason = "job" if self.jobs else "rolling" if self.rolling else None
+        profile = self.start(name, None, reason) if reason else None
+        status = "ok"
+        try:
+            yield profile
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            if profile is not None:
+                self.finish(profile, status)
+
+    # -- storage -------------------------------------------------------------
+    def _path(self, profile_id: str, ext: str) -> str:
+        if not re.fullmatch(r"[A-Za-z0-9_]+", profile_id):
+            raise ValueError("invalid profile id")
+        return os.path.join(self.directory, f"{profile_id}.{ext}")
+
+    def _save(self, profile: Profile) -> Dict[str, Any]:
+        meta = profile.meta(self.interval_ms)
+        with open(self._path(profile.id, "folded"), "w", encoding="utf-8") as f:
+            for stack, count in profile.samples.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(self._path(profile.id, "json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        return meta
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Saved profiles, newest first."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                        profiles.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(profiles, key=lambda m: m.get("started_at", ""), reverse=True)
+
+    def meta(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._path(profile_id, "json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def collapsed(self, profile_id: str) -> Optional[str]:
+        try:
+            with open(self._path(profile_id, "folded"), encoding="utf-8") as f:
+                return f.read()
+        except (OSError, ValueError):
+            return None
+
+    def speedscope(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """The profile in speedscope's file format (sampled, weights in milliseconds)."""
+        meta, collapsed = self.meta(profile_id), self.collapsed(profile_id)
+        if meta is None or collapsed is None:
+            return None
+        frames: List[Dict[str, str]] = []
+        index: Dict[str, int] = {}
+        samples, weights = [], []
+        for line in collapsed.splitlines():
+            stack, _, count = line.rpartition(" ")
+            ids = []
+            for name in stack.split(";"):
+                if name not in index:
+                    index[name] = len(frames)
+                    frames.append({"name": name})
+                ids.append(index[name])
+            samples.append(ids)
+            weights.append(int(count) * meta["interval_ms"])
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": f"{meta.get('method') or 'job'} {meta['route']} ({meta['duration_ms']} ms)",
+            "exporter": "profiling.py",
+            "shared": {"frames": frames},
+            "profiles": [{"type": "sampled", "name": meta["route"], "unit": "milliseconds", "startValue": 0,
+                          "endValue": sum(weights), "samples": samples, "weights": weights}],
+        }
+
+    def delete(self, profile_id: str) -> None:
+        for ext in ("folded", "json"):
+            try:
+                os.remove(self._path(profile_id, ext))
+            except (OSError, ValueError):
+                pass
+        with self._lock:
+            for heap in self._slowest.values():
+                if any(pid == profile_id for _, pid in heap):
+                    heap[:] = [e for e in heap if e[1] != profile_id]
+                    heapq.heapify(heap)
+
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler()
+        return _profiler
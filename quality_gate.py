@@ -0,0 +1,148 @@
+"""Fast image quality gate run before the expensive OCR stages.
+
+Scores a greyscale copy downscaled to QUALITY_MAX_SIDE px: sharpness is the
+variance of the Laplacian, exposure is the mean grey level, and glare is the
+fraction of clipped (>= 250) pixels when they form solid blobs with no print
+showing through (so white labels and screenshots are not mistaken for glare).
+Frames that fail are rejected before preprocess_for_ocr/Tesseract run; in burst
+or stream mode best_of() keeps only the sharpest acceptable frame.
+
+Counters (checked, passed, rejected per reason, burst frames skipped) and an
+estimate of the OCR CPU time saved are exposed through stats().
+"""
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from metrics import timed
+
+QUALITY_MAX_SIDE = int(os.environ.get("QUALITY_MAX_SIDE", "320"))
+QUALITY_MIN_SHARPNESS = float(os.environ.get("QUALITY_MIN_SHARPNESS", "60"))
+QUALITY_MIN_BRIGHTNESS = float(os.environ.get("QUALITY_MIN_BRIGHTNESS", "40"))
+QUALITY_MAX_CLIPPED = float(os.environ.get("QUALITY_MAX_CLIPPED", "0.97"))
+QUALITY_MAX_GLARE = float(os.environ.get("QUALITY_MAX_GLARE", "0.05"))
+QUALITY_GATE_ENABLED = os.environ.get("QUALITY_GATE", "1") != "0"
+
+
+def _grey_small(image) -> Optional[np.ndarray]:
+    """Downscaled greyscale array from JPEG/PNG bytes, a PIL image, a path or a BGR/grey array."""
+    if isinstance(image, (bytes, bytearray)):
+        buf = np.frombuffer(image, dtype=np.uint8)
+        # Let libjpeg do most of the downscaling while decoding
+        grey = cv2.imdecode(buf, cv2.IMREAD_REDUCED_GRAYSCALE_2)
+    elif isinstance(image, str):
+        grey = cv2.imread(image, cv2.IMREAD_GRAYSCALE)
+    elif isinstance(image, Image.Image):
+        grey = np.asarray(image.convert("L"))
+    else:
+        grey = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    if grey is None:
+        return None
+    h, w = grey.shape[:2]
+    scale = QUALITY_MAX_SIDE / max(h, w)
+    if scale < 1:
+        grey = cv2.resize(grey, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+    return grey
+
+
+def score_image(image) -> Dict:
+    """Quality metrics and verdict for one image; never raises on undecodable input."""
+    grey = _grey_small(image)
+    if grey is None:
+        return {"ok": False, "reasons": ["unreadable"], "sharpness": 0.0, "brightness": 0.0, "glare": 0.0}
+    sharpness = float(cv2.Laplacian(grey, cv2.CV_64F).var())
+    brightness = float(grey.mean())
+    clipped_mask = (grey >= 250).astype(np.uint8)
+    clipped = float(clipped_mask.mean())
+    # A glare spot is a solid clipped blob; white paper or a screenshot still shows text through it,
+    # which leaves holes once the clipped area is morphologically closed
+    closed = cv2.morphologyEx(clipped_mask, cv2.MORPH_CLOSE, np.ones((5, 5), np.uint8))
+    holes = 1.0 - clipped_mask.sum() / max(int(closed.sum()), 1)
+    glare = clipped if holes < 0.03 else 0.0
+
+    reasons = []
+    if sharpness < QUALITY_MIN_SHARPNESS:
+        reasons.append("blurry")
+    if brightness < QUALITY_MIN_BRIGHTNESS:
+        reasons.append("underexposed")
+    if clipped > QUALITY_MAX_CLIPPED:
+        reasons.append("overexposed")
+    if glare > QUALITY_MAX_GLARE:
+        reasons.append("glare")
+    return {
+        "ok": not reasons,
+        "reasons": reasons,
+        "sharpness": round(sharpness, 1),
+        "brightness": round(brightness, 1),
+        "glare": round(glare, 3),
+    }
+
+
+class QualityGate:
+    def __init__(self, enabled: bool = QUALITY_GATE_ENABLED):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._counts = {"checked": 0, "passed": 0, "rejected": 0, "burst_frames_skipped": 0,
+                        "burst_frames_rejected": 0}
+        self._reasons: Dict[str, int] = {}
+        self._score_cpu_s = 0.0
+        self._ocr_runs = 0
+        self._ocr_cpu_s = 0.0
+
+    @timed("quality_gate")
+    def check(self, image) -> Dict:
+        """Score image and count the verdict. With the gate disabled every image passes."""
+        started = time.process_time()
+        score = score_image(image)
+        if not self.enabled:
+            score = dict(score, ok=True)
+        with self._lock:
+            self._score_cpu_s += time.process_time() - started
+            self._counts["checked"] += 1
+            if score["ok"]:
+                self._counts["passed"] += 1
+            else:
+                self._counts["rejected"] += 1
+                for reason in score["reasons"]:
+                    self._reasons[reason] = self._reasons.get(reason, 0) + 1
+        return score
+
+    def best_of(self, frames: Sequence) -> Tuple[Optional[int], List[Dict]]:
+        """Index of the sharpest acceptable frame (None if all fail) and every frame's score."""
+        scores = [self.check(f) for f in frames]
+        passing = [i for i, s in enumerate(scores) if s["ok"]]
+        best = max(passing, key=lambda i: scores[i]["sharpness"]) if passing else None
+        with self._lock:
+            self._counts["burst_frames_skipped"] += max(0, len(passing) - 1)
+            # A burst yields at most one OCR run, so its rejected frames saved nothing
+            self._counts["burst_frames_rejected"] += len(frames) - len(passing)
+        return best, scores
+
+    def record_ocr(self, cpu_seconds: float) -> None:
+        """Feed the CPU time of a real preprocess+OCR run so savings can be estimated."""
+        with self._lock:
+            self._ocr_runs += 1
+            self._ocr_cpu_s += cpu_seconds
+
+    def stats(self) -> Dict:
+        with self._lock:
+            avg_ocr = self._ocr_cpu_s / self._ocr_runs if self._ocr_runs else 0.0
+            avoided = (self._counts["rejected"] - self._counts["burst_frames_rejected"]
+                       + self._counts["burst_frames_skipped"])
+            return dict(
+                self._counts,
+                enabled=self.enabled,
+                rejected_by_reason=dict(self._reasons),
+                ocr_runs=self._ocr_runs,
+                avg_ocr_cpu_s=round(avg_ocr, 3),
+                scoring_cpu_s=round(self._score_cpu_s, 3),
+                est_cpu_saved_s=round(avoided * avg_ocr - self._score_cpu_s, 3),
+            )
+
+
+quality_gate = QualityGate()
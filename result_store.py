@@ -0,0 +1,135 @@
+"""Server-side store for OCR/check results, keyed by a short result id.
+
+check_product used to put the whole results dict (raw OCR text included) in
+Flask's cookie session, so every later request carried a multi-KB signed
+cookie and long texts silently overflowed browser limits. Results now live in
+the ocr_results table (zlib-compressed JSON) with a small in-process LRU in
+front; the session keeps only the id, and reports can be regenerated from any
+stored id via /reports/<id>.
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from metrics import timed
+
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "256"))
+RESULT_MAX_AGE_DAYS = int(os.environ.get("RESULT_MAX_AGE_DAYS", "90"))
+
+_ANY_USER = object()
+
+
+class ResultStore:
+    def __init__(self, db_path: str, cache_size: int = RESULT_CACHE_SIZE):
+        self.db_path = db_path
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS ocr_results (
+                    id TEXT PRIMARY KEY,
+                    created_at TEXT NOT NULL,
+                    user TEXT,
+                    source TEXT,
+                    product_id INTEGER,
+                    product TEXT,
+                    compliance_score INTEGER,
+                    body BLOB NOT NULL
+                )''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_created ON ocr_results(created_at)")
+
+    def _remember(self, result_id: str, user: Optional[str], results: Dict) -> None:
+        with self._lock:
+            self._cache[result_id] = (user, results)
+            self._cache.move_to_end(result_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    @timed("result_store")
+    def save(self, results: Dict, user: Optional[str] = None, source: Optional[str] = None) -> str:
+        """Persist results and return its new id (11 URL-safe characters)."""
+        result_id = secrets.token_urlsafe(8)
+        body = zlib.compress(json.dumps(results, default=str).encode("utf-8"))
+        data = results.get("data") or {}
+        with self._connect() as conn:
+            conn.execute('''INSERT INTO ocr_results
+                            (id, created_at, user, source, product_id, product, compliance_score, body)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (result_id, datetime.now().isoformat(), user, source, results.get("product_id"),
+                          data.get("product"), results.get("compliance_score"), body))
+        self._remember(result_id, user, results)
+        return result_id
+
+    def get(self, result_id: Optional[str], user: Any = _ANY_USER) -> Optional[Dict]:
+        """Stored results by id; pass user to only return results saved by that user."""
+        if not result_id:
+            return None
+        with self._lock:
+            entry = self._cache.get(result_id)
+            if entry is not None:
+                self._cache.move_to_end(result_id)
+        if entry is None:
+            with self._connect() as conn:
+                row = conn.execute("SELECT user, body FROM ocr_results WHERE id = ?", (result_id,)).fetchone()
+            if row is None:
+                return None
+            entry = (row["user"], json.loads(zlib.decompress(row["body"]).decode("utf-8")))
+            self._remember(result_id, *entry)
+        owner, results = entry
+        if user is not _ANY_USER and owner != user:
+            return None
+        return results
+
+    def recent(self, limit: int = 50, user: Optional[str] = None) -> List[Dict]:
+        """Newest results first, without the stored body."""
+        query = "SELECT id, created_at, user, source, product_id, product, compliance_score FROM ocr_results"
+        params: List = []
+        if user:
+            query += " WHERE user = ?"
+            params.append(user)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(r) for r in conn.execute(query, params)]
+
+    def prune(self, max_age_days: int = RESULT_MAX_AGE_DAYS) -> int:
+        cutoff = (datetime.now() - timedelta(days=max_age_days)).isoformat()
+        with self._connect() as conn:
+            removed = conn.execute("DELETE FROM ocr_results WHERE created_at < ?", (cutoff,)).rowcount
+        with self._lock:
+            self._cache.clear()
+        return removed
+
+
+_store: Optional[ResultStore] = None
+_store_lock = threading.Lock()
+
+
+def get_result_store(db_path: str = "compliance.db") -> ResultStore:
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultStore(db_path)
+            _store.prune()
+        return _store
@@ -0,0 +1,132 @@
+"""Persistent index of scraped products for incremental crawls.
+
+Tracks, per product URL, when it was last seen and a hash of its content, so
+recurring scrapes can skip product pages that are still fresh and only upsert
+rows that actually changed. Price changes are appended to a compact history table.
+"""
+import hashlib
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from urllib.parse import urlsplit, urlunsplit
+
+
+SCRAPE_INDEX_DB = os.environ.get("SCRAPE_INDEX_DB", os.path.join("data", "scrape_index.db"))
+# Product pages seen more recently than this are not re-fetched
+SCRAPE_FRESH_AGE = float(os.environ.get("SCRAPE_FRESH_AGE", str(6 * 3600)))
+
+HASHED_FIELDS = ("name", "price", "details", "image_url")
+
+
+def canonical_url(link: str) -> str:
+    """Product URL without query string or fragment, so tracking params don't split keys."""
+    if not link:
+        return ""
+    parts = urlsplit(link)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+
+
+def row_key(row: Dict[str, str]) -> str:
+    return canonical_url(row.get("product_link", "")) or (row.get("name") or "").strip()
+
+
+def content_hash(row: Dict[str, str]) -> str:
+    joined = "\x1f".join((row.get(k) or "").strip() for k in HASHED_FIELDS)
+    return hashlib.sha1(joined.encode("utf-8")).hexdigest()
+
+
+class ScrapeIndex:
+    def __init__(self, db_path: str = SCRAPE_INDEX_DB):
+        self.db_path = db_path
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS seen_products (
+                    product_key TEXT PRIMARY KEY,
+                    last_seen REAL NOT NULL,
+                    content_hash TEXT NOT NULL,
+                    price TEXT
+                );
+                CREATE TABLE IF NOT EXISTS price_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_key TEXT NOT NULL,
+                    price TEXT NOT NULL,
+                    seen_at TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_price_history_key ON price_history(product_key, seen_at);
+            ''')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def fresh_keys(self, links: Iterable[str], max_age: float = SCRAPE_FRESH_AGE) -> Set[str]:
+        """Canonical keys among links scraped less than max_age seconds ago, in one query."""
+        keys = list({canonical_url(link) for link in links if link})
+        if max_age <= 0 or not keys:
+            return set()
+        cutoff = time.time() - max_age
+        fresh: Set[str] = set()
+        with self._connect() as conn:
+            # Stay well under SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                fresh.update(k for (k,) in conn.execute(
+                    f"SELECT product_key FROM seen_products WHERE product_key IN ({marks}) AND last_seen > ?",
+                    (*chunk, cutoff)))
+        return fresh
+
+    def record(self, rows: Iterable[Dict[str, str]]) -> List[Dict[str, str]]:
+        """Mark rows as seen now; return only the new or changed ones."""
+        changed: List[Dict[str, str]] = []
+        now = time.time()
+        now_iso = datetime.now().isoformat()
+        with self._connect() as conn:
+            for row in rows:
+                key = row_key(row)
+                if not key:
+                    continue
+                digest = content_hash(row)
+                price = (row.get("price") or "").strip()
+                prev = conn.execute("SELECT content_hash, price FROM seen_products WHERE product_key = ?",
+                                    (key,)).fetchone()
+                conn.execute('''INSERT INTO seen_products (product_key, last_seen, content_hash, price)
+                                VALUES (?, ?, ?, ?)
+                                ON CONFLICT(product_key) DO UPDATE SET
+                                    last_seen = excluded.last_seen,
+                                    content_hash = excluded.content_hash,
+                                    price = excluded.price''',
+                             (key, now, digest, price))
+                if price and (prev is None or prev[1] != price):
+                    conn.execute("INSERT INTO price_history (product_key, price, seen_at) VALUES (?, ?, ?)",
+                                 (key, price, now_iso))
+                if prev is None or prev[0] != digest:
+                    changed.append(row)
+        return changed
+
+    def price_history(self, link: str) -> List[Dict[str, str]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT price, seen_at FROM price_history WHERE product_key = ? ORDER BY seen_at",
+                                (canonical_url(link) or link,)).fetchall()
+        return [{"price": p, "seen_at": t} for p, t in rows]
+
+
+_index: Optional[ScrapeIndex] = None
+
+
+def get_scrape_index() -> ScrapeIndex:
+    global _index
+    if _index is None:
+        _index = ScrapeIndex()
+    return _index
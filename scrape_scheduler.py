@@ -0,0 +1,253 @@
+"""Background scrape jobs with persisted state and recurring per-category schedules.
+
+Routes submit a job and get its id back immediately; a bounded thread pool runs
+the Playwright crawl. Job state, progress counts and errors live in the
+scrape_jobs table so /scrape_jobs/<id> can report them from any worker. A job
+for a category that is already queued or running is coalesced into that job.
+
+Recurring schedules come from SCRAPE_SCHEDULES ("protein=21600,mobile=43200",
+seconds) and are stored in scrape_schedules so next-run times survive restarts.
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+
+SCRAPED_CSV_PATH = os.path.join("data", "scraped_info.csv")
+
+log = logging.getLogger(__name__)
+
+
+def _parse_schedules(spec: str) -> Dict[str, float]:
+    schedules = {}
+    for part in (spec or "").split(","):
+        if "=" in part:
+            cat, interval = part.split("=", 1)
+            try:
+                schedules[cat.strip().lower()] = float(interval)
+            except ValueError:
+                log.warning("Ignoring bad schedule entry: %r", part)
+    return schedules
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class ScrapeScheduler:
+    def __init__(self, db_path: str, max_workers: int = 2, schedules: Optional[Dict[str, float]] = None,
+                 tick_seconds: float = 30.0):
+        self.db_path = db_path
+        self.tick_seconds = tick_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape-job")
+        self._submit_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._ticker: Optional[threading.Thread] = None
+        self._init_db()
+        for category, interval in (schedules or {}).items():
+            self.set_schedule(category, interval)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _init_db(self) -> None:
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS scrape_jobs (
+                    id TEXT PRIMARY KEY,
+                    category TEXT NOT NULL,
+                    max_pages INTEGER NOT NULL,
+                    trigger TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    started_at TEXT,
+                    finished_at TEXT,
+                    scraped INTEGER DEFAULT 0,
+                    written INTEGER DEFAULT 0,
+                    error TEXT,
+                    preview TEXT,
+                    owner_pid INTEGER
+                );
+                CREATE INDEX IF NOT EXISTS idx_scrape_jobs_category_status ON scrape_jobs(category, status);
+                CREATE TABLE IF NOT EXISTS scrape_schedules (
+                    category TEXT PRIMARY KEY,
+                    interval_s REAL NOT NULL,
+                    max_pages INTEGER NOT NULL DEFAULT 1,
+                    next_run REAL NOT NULL
+                );
+            ''')
+            # Jobs left active by a process that no longer exists will never finish
+            stale = [r["id"] for r in conn.execute(
+                "SELECT id, owner_pid FROM scrape_jobs WHERE status IN ('queued', 'running')")
+                if not _pid_alive(r["owner_pid"])]
+            conn.executemany("UPDATE scrape_jobs SET status = 'failed', error = 'interrupted by restart', "
+                             "finished_at = ? WHERE id = ?", [(datetime.now().isoformat(), i) for i in stale])
+
+    # -- jobs ------------------------------------------------------------
+    def submit(self, category: str, max_pages: int = 1, trigger: str = "manual") -> str:
+        """Queue a crawl of category and return its job id (an existing active job's id if any)."""
+        category = (category or "").strip().lower()
+        with self._submit_lock, self._connect() as conn:
+            active = conn.execute(
+                "SELECT id FROM scrape_jobs WHERE category = ? AND status IN ('queued', 'running') "
+                "ORDER BY created_at DESC LIMIT 1", (category,)).fetchone()
+            if active:
+                return active["id"]
+            job_id = uuid.uuid4().hex[:12]
+            conn.execute('''INSERT INTO scrape_jobs (id, category, max_pages, trigger, status, created_at, owner_pid)
+                            VALUES (?, ?, ?, ?, 'queued', ?, ?)''',
+                         (job_id, category, max_pages, trigger, datetime.now().isoformat(), os.getpid()))
+        self._executor.submit(self._run, job_id, category, max_pages)
+        return job_id
+
+    def _update(self, job_id: str, **fields) -> None:
+        cols = ", ".join(f"{k} = ?" for k in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE scrape_jobs SET {cols} WHERE id = ?", (*fields.values(), job_id))
+
+    def _run(self, job_id: str, category: str, max_pages: int) -> None:
+        from flipkart_playwright_scraper import scrape_category_sync
+        from flipkart_scraper import upsert_scraped_csv
+        from scrape_index import get_scrape_index
+        from scrape_store import get_scrape_store
+
+        self._update(job_id, status="running", started_at=datetime.now().isoformat())
+        index = get_scrape_index()
+        changed: List[Dict[str, str]] = []
+        progress = {"scraped": 0, "flushed_at": 0.0}
+
+        def record(row: Dict[str, str]) -> None:
+            changed.extend(index.record([row]))
+            progress["scraped"] += 1
+            # Throttle progress writes to about one per second
+            if time.monotonic() - progress["flushed_at"] >= 1.0:
+                progress["flushed_at"] = time.monotonic()
+                self._update(job_id, scraped=progress["scraped"])
+
+        # on_row runs on the shared browser event loop; keep its SQLite writes on one writer thread
+        writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"scrape-rows-{job_id}")
+        pending: List[Future] = []
+
+        def on_row(row: Dict[str, str]) -> None:
+            pending.append(writer.submit(record, row))
+
+        try:
+            try:
+                items = scrape_category_sync(category, max_pages=max_pages, on_row=on_row)
+            finally:
+                writer.shutdown(wait=True)
+            for future in pending:
+                future.result()
+            # Every row becomes a snapshot (price history); the CSV keeps only the latest view
+            get_scrape_store().write_rows(items)
+            _, written = upsert_scraped_csv(changed, SCRAPED_CSV_PATH)
+            preview = [{k: it.get(k, "") for k in ("name", "price", "product_link")} for it in items[:5]]
+            self._update(job_id, status="succeeded", finished_at=datetime.now().isoformat(),
+                         scraped=len(items), written=written, preview=json.dumps(preview))
+        except Exception as e:
+            traceback.print_exc()
+            self._update(job_id, status="failed", finished_at=datetime.now().isoformat(),
+                         scraped=progress["scraped"], error=str(e) or e.__class__.__name__)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM scrape_jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job["preview"] = json.loads(job["preview"]) if job.get("preview") else []
+        return job
+
+    def recent(self, limit: int = 20) -> List[Dict]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id, category, trigger, status, created_at, finished_at, scraped, written, error "
+                                "FROM scrape_jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    # -- recurring schedules ----------------------------------------------
+    def set_schedule(self, category: str, interval_s: float, max_pages: int = 1) -> None:
+        with self._connect() as conn:
+            conn.execute('''INSERT INTO scrape_schedules (category, interval_s, max_pages, next_run)
+                            VALUES (?, ?, ?, ?)
+                            ON CONFLICT(category) DO UPDATE SET
+                                interval_s = excluded.interval_s, max_pages = excluded.max_pages''',
+                         (category.lower(), interval_s, max_pages, time.time() + interval_s))
+
+    def run_due(self) -> List[str]:
+        """Submit every schedule whose next_run has passed; returns the job ids.
+
+        Every worker process runs a ticker, so each due row is claimed with a
+        conditional UPDATE and only the process whose UPDATE hit the row submits it.
+        """
+        now = time.time()
+        claimed = []
+        with self._connect() as conn:
+            due = conn.execute("SELECT * FROM scrape_schedules WHERE next_run <= ?", (now,)).fetchall()
+            for row in due:
+                cur = conn.execute("UPDATE scrape_schedules SET next_run = ? WHERE category = ? AND next_run <= ?",
+                                   (now + row["interval_s"], row["category"], now))
+                # Commit each claim so other tickers see it (and wait on the lock) straight away
+                conn.commit()
+                if cur.rowcount == 1:
+                    claimed.append(row)
+        return [self.submit(row["category"], row["max_pages"], trigger="schedule") for row in claimed]
+
+    def _tick_loop(self) -> None:
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self.run_due()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self) -> "ScrapeScheduler":
+        if self._ticker is None:
+            self._ticker = threading.Thread(target=self._tick_loop, name="scrape-scheduler", daemon=True)
+            self._ticker.start()
+        return self
+
+    def shutdown(self, wait: bool = False) -> None:
+        self._stop.set()
+        self._executor.shutdown(wait=wait)
+
+
+_scheduler: Optional[ScrapeScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler(db_path: str = "compliance.db") -> ScrapeScheduler:
+    """Process-wide scheduler; recurring schedules tick unless SCRAPE_SCHEDULER=0."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ScrapeScheduler(
+                db_path,
+                max_workers=int(os.environ.get("SCRAPE_MAX_JOBS", "2")),
+                schedules=_parse_schedules(os.environ.get("SCRAPE_SCHEDULES", "")),
+            )
+            if os.environ.get("SCRAPE_SCHEDULER", "1") != "0":
+                _scheduler.start()
+        return _scheduler
@@ -0,0 +1,200 @@
+"""Column-oriented SQLite store for scraped product snapshots.
+
+Layout (data/scraped_products.db):
+    dictionary  repeated strings (category, source, time filter) stored once, referenced by id
+    products    one row per product URL with its latest name / image
+    details     product page text, zlib-compressed and deduplicated by hash
+    snapshots   one narrow row per product per scrape, clustered on
+                (category_id, scrape_date, product_id, scraped_at)
+
+Because snapshots is a WITHOUT ROWID table keyed by category and date, queries
+over a category/date range read only that slice, and the bulky details text
+lives in its own table so price analytics never touch it.
+
+    python scrape_store.py import data/scraped_info.csv
+"""
+import csv
+import hashlib
+import os
+import re
+import sqlite3
+import sys
+import threading
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from scrape_index import canonical_url
+
+
+SCRAPE_STORE_DB = os.environ.get("SCRAPE_STORE_DB", os.path.join("data", "scraped_products.db"))
+
+
+def parse_price(text: str) -> Optional[float]:
+    """'₹12,999' -> 12999.0; None when no number is present."""
+    match = re.search(r"\d[\d,]*(?:\.\d+)?", text or "")
+    return float(match.group(0).replace(",", "")) if match else None
+
+
+class ScrapeStore:
+    def __init__(self, db_path: str = SCRAPE_STORE_DB):
+        self.db_path = db_path
+        self._dict_cache: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if os.path.dirname(db_path):
+            os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS dictionary (
+                    id INTEGER PRIMARY KEY,
+                    value TEXT NOT NULL UNIQUE
+                );
+                CREATE TABLE IF NOT EXISTS products (
+                    id INTEGER PRIMARY KEY,
+                    product_link TEXT NOT NULL UNIQUE,
+                    name TEXT,
+                    image_url TEXT
+                );
+                CREATE TABLE IF NOT EXISTS details (
+                    id INTEGER PRIMARY KEY,
+                    sha1 TEXT NOT NULL UNIQUE,
+                    body BLOB NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS snapshots (
+                    category_id INTEGER NOT NULL,
+                    scrape_date TEXT NOT NULL,
+                    product_id INTEGER NOT NULL,
+                    scraped_at TEXT NOT NULL,
+                    source_id INTEGER,
+                    time_filter_id INTEGER,
+                    price REAL,
+                    price_text TEXT,
+                    details_id INTEGER,
+                    PRIMARY KEY (category_id, scrape_date, product_id, scraped_at)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_snapshots_product ON snapshots(product_id, scraped_at);
+            ''')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    # -- writes ------------------------------------------------------------
+    def _dict_id(self, conn: sqlite3.Connection, value: str) -> int:
+        value = value or ""
+        if value not in self._dict_cache:
+            conn.execute("INSERT OR IGNORE INTO dictionary (value) VALUES (?)", (value,))
+            self._dict_cache[value] = conn.execute("SELECT id FROM dictionary WHERE value = ?", (value,)).fetchone()[0]
+        return self._dict_cache[value]
+
+    def _details_id(self, conn: sqlite3.Connection, text: str) -> Optional[int]:
+        if not text:
+            return None
+        digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+        conn.execute("INSERT OR IGNORE INTO details (sha1, body) VALUES (?, ?)",
+                     (digest, zlib.compress(text.encode("utf-8"), 6)))
+        return conn.execute("SELECT id FROM details WHERE sha1 = ?", (digest,)).fetchone()[0]
+
+    def _product_id(self, conn: sqlite3.Connection, row: Dict[str, str]) -> int:
+        link = canonical_url(row.get("product_link", "")) or "name:" + (row.get("name") or "").strip()
+        conn.execute('''INSERT INTO products (product_link, name, image_url) VALUES (?, ?, ?)
+                        ON CONFLICT(product_link) DO UPDATE SET
+                            name = COALESCE(NULLIF(excluded.name, ''), products.name),
+                            image_url = COALESCE(NULLIF(excluded.image_url, ''), products.image_url)''',
+                     (link, row.get("name") or "", row.get("image_url") or ""))
+        return conn.execute("SELECT id FROM products WHERE product_link = ?", (link,)).fetchone()[0]
+
+    def write_rows(self, rows: Iterable[Dict[str, str]]) -> int:
+        """Append one snapshot per row; returns the number written."""
+        written = 0
+        with self._lock, self._connect() as conn:
+            for row in rows:
+                if not (row.get("product_link") or row.get("name")):
+                    continue
+                scraped_at = row.get("scraped_at") or datetime.now().isoformat()
+                conn.execute('''INSERT OR REPLACE INTO snapshots
+                                (category_id, scrape_date, product_id, scraped_at, source_id, time_filter_id,
+                                 price, price_text, details_id)
+                                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                             (self._dict_id(conn, (row.get("category") or "").lower()), scraped_at[:10],
+                              self._product_id(conn, row), scraped_at,
+                              self._dict_id(conn, row.get("source") or ""),
+                              self._dict_id(conn, row.get("time_filter") or ""),
+                              parse_price(row.get("price", "")), row.get("price") or "",
+                              self._details_id(conn, row.get("details") or "")))
+                written += 1
+        return written
+
+    # -- queries -----------------------------------------------------------
+    def latest_snapshot(self, category: Optional[str] = None, with_details: bool = False) -> List[Dict]:
+        """Most recent snapshot of every product (optionally one category)."""
+        params: List = []
+        where = ""
+        if category:
+            where = "WHERE s.category_id = (SELECT id FROM dictionary WHERE value = ?)"
+            params.append(category.lower())
+        query = f'''
+            SELECT p.product_link, p.name, p.image_url, c.value AS category, s.scraped_at,
+                   s.price, s.price_text, s.details_id
+            FROM (
+                SELECT s.*, ROW_NUMBER() OVER (PARTITION BY s.product_id ORDER BY s.scraped_at DESC) AS rn
+                FROM snapshots s {where}
+            ) s
+            JOIN products p ON p.id = s.product_id
+            JOIN dictionary c ON c.id = s.category_id
+            WHERE s.rn = 1
+            ORDER BY p.name
+        '''
+        with self._connect() as conn:
+            rows = [dict(r) for r in conn.execute(query, params)]
+            if with_details:
+                for r in rows:
+                    r["details"] = self._load_details(conn, r["details_id"])
+        for r in rows:
+            r.pop("details_id", None)
+        return rows
+
+    def price_history(self, product_link: str) -> List[Dict]:
+        """Every (scraped_at, price) for one product, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute('''
+                SELECT s.scraped_at, s.price, s.price_text
+                FROM snapshots s JOIN products p ON p.id = s.product_id
+                WHERE p.product_link = ?
+                ORDER BY s.scraped_at''', (canonical_url(product_link) or product_link,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def _load_details(self, conn: sqlite3.Connection, details_id: Optional[int]) -> str:
+        if details_id is None:
+            return ""
+        row = conn.execute("SELECT body FROM details WHERE id = ?", (details_id,)).fetchone()
+        return zlib.decompress(row[0]).decode("utf-8") if row else ""
+
+    def import_csv(self, csv_path: str) -> int:
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            return self.write_rows(csv.DictReader(f))
+
+
+_store: Optional[ScrapeStore] = None
+
+
+def get_scrape_store() -> ScrapeStore:
+    global _store
+    if _store is None:
+        _store = ScrapeStore()
+    return _store
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 3 and sys.argv[1] == "import":
+        print(f"Imported {get_scrape_store().import_csv(sys.argv[2])} rows into {SCRAPE_STORE_DB}")
+    else:
+        print("usage: python scrape_store.py import <scraped_info.csv>")
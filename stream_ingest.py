@@ -0,0 +1,274 @@
+"""Background MJPEG ingestion from the ESP32-CAM with change detection.
+
+The worker reads the camera's multipart MJPEG stream continuously but only
+decodes frames at sample_fps, at 1/8 scale in greyscale, then shrinks them to a
+64x48 thumbnail. Mean absolute difference between consecutive thumbnails tells
+whether something is moving; once the scene has been still for settle_frames
+and differs from both the empty background and the last processed scene, the
+full-resolution JPEG is handed to process_fn (the OCR/rule pipeline) on a
+separate thread. With a quality gate, the next burst frames after the trigger
+are scored too and only the sharpest acceptable one is processed. Frames
+arriving while the pipeline is busy are dropped.
+
+    python esp32_standin_server.py --port 8081 &
+    ESP32_STREAM_URL=http://127.0.0.1:8081/stream ESP32_INGEST=1 python app.py
+"""
+import logging
+import queue
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import requests
+
+log = logging.getLogger(__name__)
+
+SOI, EOI = b"\xff\xd8", b"\xff\xd9"
+MAX_FRAME_BYTES = 8 * 1024 * 1024
+
+
+def iter_mjpeg_frames(url: str, timeout: float = 10.0, chunk_size: int = 16384) -> Iterator[bytes]:
+    """Yield each JPEG in an MJPEG (multipart/x-mixed-replace) stream by scanning for SOI/EOI markers."""
+    with requests.get(url, stream=True, timeout=(5, timeout), headers={"User-Agent": "Mozilla/5.0"}) as resp:
+        resp.raise_for_status()
+        buffer = bytearray()
+        for chunk in resp.iter_content(chunk_size=chunk_size):
+            buffer += chunk
+            while True:
+                start = buffer.find(SOI)
+                if start < 0:
+                    del buffer[:-1]
+                    break
+                end = buffer.find(EOI, start + 2)
+                if end < 0:
+                    if start:
+                        del buffer[:start]
+                    if len(buffer) > MAX_FRAME_BYTES:
+                        buffer.clear()
+                    break
+                yield bytes(buffer[start:end + 2])
+                del buffer[:end + 2]
+
+
+def thumbnail(jpeg: bytes, size=(64, 48)) -> Optional[np.ndarray]:
+    """Cheap greyscale thumbnail: libjpeg decodes at 1/8 scale, then an area resize."""
+    img = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_REDUCED_GRAYSCALE_8)
+    if img is None:
+        return None
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA).astype(np.float32)
+
+
+def _diff(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(np.abs(a - b)))
+
+
+class ChangeDetector:
+    """Decides, per sampled thumbnail, whether a newly placed product has just settled.
+
+    Thresholds are mean grey-level differences (0-255) between 64x48 thumbnails.
+    """
+
+    def __init__(self, motion_threshold: float = 6.0, settle_threshold: float = 2.5,
+                 change_threshold: float = 12.0, settle_frames: int = 3):
+        self.motion_threshold = motion_threshold
+        self.settle_threshold = settle_threshold
+        self.change_threshold = change_threshold
+        self.settle_frames = settle_frames
+        self.reset()
+
+    def reset(self) -> None:
+        self.background: Optional[np.ndarray] = None
+        self.last_processed: Optional[np.ndarray] = None
+        self._before_trigger: Optional[np.ndarray] = None
+        self._prev: Optional[np.ndarray] = None
+        self._moving = False
+        self._still = 0
+
+    def update(self, thumb: np.ndarray) -> bool:
+        """Feed one thumbnail; True when this frame should go to the pipeline."""
+        if self._prev is None:
+            self._prev = self.background = thumb
+            return False
+        motion = _diff(thumb, self._prev)
+        self._prev = thumb
+        if motion > self.motion_threshold:
+            self._moving = True
+            self._still = 0
+            return False
+        self._still = self._still + 1 if motion <= self.settle_threshold else 0
+        if not self._moving:
+            # Follow slow lighting drift while the empty scene is idle
+            if self.last_processed is None and _diff(thumb, self.background) < self.change_threshold:
+                self.background = 0.95 * self.background + 0.05 * thumb
+            return False
+        if self._still < self.settle_frames:
+            return False
+        self._moving = False
+        if _diff(thumb, self.background) < self.change_threshold:
+            # Product removed; scene is back to empty
+            self.last_processed = None
+            return False
+        if self.last_processed is not None and _diff(thumb, self.last_processed) < self.change_threshold:
+            return False
+        self._before_trigger, self.last_processed = self.last_processed, thumb
+        return True
+
+    def retry(self) -> None:
+        """Undo the last trigger (no frame was usable) so the next settled frames trigger again."""
+        self.last_processed = self._before_trigger
+        self._moving = True
+        self._still = 0
+
+
+class StreamIngestWorker:
+    def __init__(self, stream_url: str, process_fn: Callable[[bytes, Optional[Dict]], Dict], sample_fps: float = 4.0,
+                 detector: Optional[ChangeDetector] = None, reconnect_max: float = 10.0,
+                 burst: int = 1, gate=None):
+        self.stream_url = stream_url
+        self.process_fn = process_fn
+        self.burst = max(1, burst)
+        self.gate = gate
+        self.sample_fps = sample_fps
+        self.detector = detector or ChangeDetector()
+        self.reconnect_max = reconnect_max
+        self._jobs: "queue.Queue[Tuple[bytes, Optional[Dict]]]" = queue.Queue(maxsize=1)
+        self._stop = threading.Event()
+        self._threads = []
+        self._lock = threading.Lock()
+        self._stats = {
+            "frames_seen": 0,       # every JPEG read off the stream
+            "frames_decoded": 0,    # sampled and thumbnailed
+            "frames_dropped": 0,    # skipped by the sample rate or because the pipeline was busy
+            "triggers": 0,          # settled new scenes detected
+            "frames_rejected": 0,   # burst frames discarded because none passed the quality gate
+            "frames_processed": 0,  # sent through the pipeline
+            "errors": 0,
+            "reconnects": 0,
+        }
+        self.connected = False
+        self.last_result: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._lock:
+            self._stats[key] += n
+
+    # -- threads -----------------------------------------------------------
+    def _read_loop(self) -> None:
+        delay = 0.5
+        interval = 1.0 / self.sample_fps if self.sample_fps > 0 else 0.0
+        while not self._stop.is_set():
+            try:
+                next_sample = 0.0
+                burst_frames: List[bytes] = []
+                for jpeg in iter_mjpeg_frames(self.stream_url):
+                    self.connected = True
+                    delay = 0.5
+                    self._count("frames_seen")
+                    if self._stop.is_set():
+                        return
+                    if burst_frames:
+                        # Collecting consecutive frames after a trigger, not rate limited
+                        burst_frames.append(jpeg)
+                        if len(burst_frames) >= self.burst:
+                            self._submit_burst(burst_frames)
+                            burst_frames = []
+                        continue
+                    now = time.monotonic()
+                    if now < next_sample:
+                        self._count("frames_dropped")
+                        continue
+                    next_sample = now + interval
+                    thumb = thumbnail(jpeg)
+                    if thumb is None:
+                        self._count("errors")
+                        continue
+                    self._count("frames_decoded")
+                    if self.detector.update(thumb):
+                        self._count("triggers")
+                        if self.gate is not None and self.burst > 1:
+                            burst_frames = [jpeg]
+                        else:
+                            self._submit_burst([jpeg])
+            except Exception as e:
+                self.last_error = f"stream: {e}"
+                self._count("errors")
+            self.connected = False
+            if self._stop.wait(delay):
+                return
+            self._count("reconnects")
+            delay = min(delay * 2, self.reconnect_max)
+
+    def _submit_burst(self, frames: List[bytes]) -> None:
+        quality = None
+        if self.gate is not None:
+            best, scores = self.gate.best_of(frames)
+            if best is None:
+                # Nothing sharp enough: keep the product pending instead of marking it processed
+                self._count("frames_rejected", len(frames))
+                self.detector.retry()
+                return
+            frames, quality = [frames[best]], scores[best]
+        try:
+            self._jobs.put_nowait((frames[0], quality))
+        except queue.Full:
+            self._count("frames_dropped")
+
+    def _process_loop(self) -> None:
+        while not self._stop.is_set():
+            try:
+                jpeg, quality = self._jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self.last_result = self.process_fn(jpeg, quality)
+                self._count("frames_processed")
+            except Exception as e:
+                traceback.print_exc()
+                self.last_error = f"pipeline: {e}"
+                self._count("errors")
+
+    def start(self) -> "StreamIngestWorker":
+        if self.running:
+            return self
+        self._stop.clear()
+        self.detector.reset()
+        self.started_at = time.time()
+        self._threads = [
+            threading.Thread(target=self._read_loop, name="mjpeg-reader", daemon=True),
+            threading.Thread(target=self._process_loop, name="mjpeg-pipeline", daemon=True),
+        ]
+        for t in self._threads:
+            t.start()
+        log.info("Stream ingest started: %s @ %s fps", self.stream_url, self.sample_fps)
+        return self
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+        self.connected = False
+
+    @property
+    def running(self) -> bool:
+        return any(t.is_alive() for t in self._threads)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        stats.update({
+            "running": self.running,
+            "connected": self.connected,
+            "stream_url": self.stream_url,
+            "sample_fps": self.sample_fps,
+            "stream_fps": round(stats["frames_seen"] / elapsed, 2) if elapsed else 0.0,
+            "last_error": self.last_error,
+            "last_result": self.last_result,
+        })
+        return stats